@@ -10,9 +10,14 @@ Tipos cubiertos:
 2. Bearer Token (JWT / OAuth2 estándar)
 3. API Key en Cabeceras (Headers)
 4. API Key en Parámetros (Query Params)
+
+Para conectores completos, los mismos cuatro estilos existen como estrategias reutilizables
+en `conector_base` (AutenticacionBasica, AutenticacionBearer, ApiKeyCabecera, ApiKeyParametro),
+que se pasan a un `BaseConnector`.
 """
 
 from utils_requests import realizar_peticion_segura
+from tokens_oauth2 import resolver_token
 import base64
 
 # --- 1. Autenticación Básica ---
@@ -42,9 +47,14 @@ def template_auth_basic(url, usuario, password):
 def template_auth_bearer(url, token):
     """
     Estándar para la mayoría de APIs modernas (Stripe, GitHub, etc).
+    
+    `token` puede ser el token en texto o un proveedor OAuth2 (ver `tokens_oauth2`), que
+    entrega siempre un token vigente y lo renueva antes de que caduque:
+        proveedor = proveedor_oauth2(URL_TOKEN, CLIENT_ID, CLIENT_SECRET, scope="api.read")
+        template_auth_bearer(url, proveedor)
     """
     headers = {
-        "Authorization": f"Bearer {token}",
+        "Authorization": f"Bearer {resolver_token(token)}",
         "Content-Type": "application/json"
     }
     
@@ -0,0 +1,316 @@
+"""
+Benchmark de la Capa HTTP contra un Servidor Local
+==================================================
+
+Mide el rendimiento de `realizar_peticion_segura` y de los conectores de Meta y Google Ads
+sin credenciales ni red: levanta `servidor_stub.py` en un proceso aparte y lanza contra él
+cada combinación de escenario (latencia, errores, ráfagas de 429, payloads grandes),
+objetivo y nivel de concurrencia.
+
+Para cada combinación se informa de peticiones/segundo, latencia p50/p99 (de la llamada
+completa, reintentos incluidos), éxitos, reintentos y pico de memoria (RSS). Cada
+combinación se ejecuta por defecto en un proceso nuevo, de modo que el pico de RSS es
+el de esa combinación y no el acumulado de las anteriores.
+
+Los resultados se guardan en JSON para comparar versiones:
+    python benchmark_http.py --concurrencias 1,8,32 --salida resultados.json
+    python benchmark_http.py --salida nuevos.json --comparar resultados.json
+
+Notas:
+- El limitador del host local no frena las peticiones (`--tasa` para fijar un límite),
+  ya que el objetivo es medir la capa HTTP y no la cuota de un proveedor.
+- Los conectores usan sus valores reales de reintentos (espera inicial de 2 s), por lo que
+  en el escenario 'errores' su latencia refleja el backoff; `utils` usa una espera de 0.05 s.
+"""
+
+import argparse
+import io
+import json
+import logging
+import multiprocessing
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+try:
+    import resource  # Solo disponible en sistemas Unix
+except ImportError:
+    resource = None
+
+from servidor_stub import ConfiguracionStub, ServidorStub
+
+ESCENARIOS: Dict[str, ConfiguracionStub] = {
+    "base": ConfiguracionStub(latencia=0.002),
+    "latencia": ConfiguracionStub(latencia=0.05, jitter=0.05),
+    "errores": ConfiguracionStub(latencia=0.002, tasa_errores=0.05),
+    "rafagas_429": ConfiguracionStub(latencia=0.002, periodo_429=100, rafaga_429=5, retry_after="0.2"),
+    "payload_grande": ConfiguracionStub(latencia=0.002, tamano_payload=5000),
+}
+
+# --- Objetivos: cada uno recibe la URL del escenario y devuelve una función llamar(i) -> éxito ---
+
+def _objetivo_utils(url_escenario: str) -> Callable[[int], bool]:
+    from utils_requests import realizar_peticion_segura
+
+    url = f"{url_escenario}/eco"
+    # Un parámetro distinto por llamada para que el single-flight no agrupe peticiones
+    return lambda i: bool(realizar_peticion_segura("GET", url, params={"i": i}, espera_inicial=0.05))
+
+
+def _objetivo_meta_info(url_escenario: str) -> Callable[[int], bool]:
+    from meta_graph_api import MetaGraphConnector
+
+    conector = MetaGraphConnector("TOKEN_BENCHMARK")
+    conector.BASE_URL = f"{url_escenario}/v19.0"
+    return lambda i: conector.obtener_info_pagina(str(i)) is not None
+
+
+def _objetivo_meta_posts(url_escenario: str) -> Callable[[int], bool]:
+    from meta_graph_api import MetaGraphConnector
+
+    conector = MetaGraphConnector("TOKEN_BENCHMARK")
+    conector.BASE_URL = f"{url_escenario}/v19.0"
+    return lambda i: len(conector.obtener_posts_pagina(str(i))) > 0
+
+
+def _objetivo_meta_posts_streaming(url_escenario: str) -> Callable[[int], bool]:
+    from meta_graph_api import MetaGraphConnector
+
+    conector = MetaGraphConnector("TOKEN_BENCHMARK")
+    conector.BASE_URL = f"{url_escenario}/v19.0"
+    return lambda i: sum(1 for _ in conector.obtener_posts_pagina(str(i), streaming=True)) > 0
+
+
+def _objetivo_google_ads(url_escenario: str) -> Callable[[int], bool]:
+    from google_ads_api import GoogleAdsRestConnector
+
+    conector = GoogleAdsRestConnector("DEV_TOKEN_BENCHMARK", "1234567890", "TOKEN_BENCHMARK")
+    conector.BASE_URL = f"{url_escenario}/{conector.API_VERSION}"
+    return lambda i: conector.buscar_campanas() is not None
+
+
+OBJETIVOS: Dict[str, Callable[[str], Callable[[int], bool]]] = {
+    "utils": _objetivo_utils,
+    "meta_info": _objetivo_meta_info,
+    "meta_posts": _objetivo_meta_posts,
+    "meta_posts_streaming": _objetivo_meta_posts_streaming,
+    "google_ads": _objetivo_google_ads,
+}
+
+
+# --- Medición ---
+
+def rss_pico_mb() -> Optional[float]:
+    """Pico de memoria residente del proceso actual en MB (None si no se puede medir)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, int(round(p / 100 * len(valores))) - 1))
+    return valores[indice]
+
+
+def ejecutar_caso(url_base: str, escenario: str, objetivo: str, concurrencia: int,
+                  peticiones: int, tasa: Optional[float] = None) -> dict:
+    """
+    Ejecuta una combinación escenario/objetivo/concurrencia y devuelve sus métricas.
+    Reinicia el estado compartido del proceso (sesiones, limitador, circuito y métricas)
+    para que cada caso parta de cero.
+    """
+    from circuit_breaker import circuitos
+    from limitador import limitadores
+    from metricas import registro_metricas
+    from sesiones_http import configurar_sesiones
+
+    host = urlsplit(url_base).hostname
+    configurar_sesiones(tamano_pool=concurrencia)
+    limitadores.configurar(host, tasa=tasa, tasa_maxima=tasa)
+    circuitos.configurar(host)
+    registro_metricas.reiniciar()
+
+    llamar = OBJETIVOS[objetivo](f"{url_base}/{escenario}")
+
+    def _medir(i: int):
+        inicio = time.perf_counter()
+        try:
+            exito = llamar(i)
+        except Exception:
+            exito = False
+        return time.perf_counter() - inicio, exito
+
+    latencias = []
+    exitos = 0
+    # Los conectores imprimen una línea por llamada y los 429/500 simulados generan avisos en
+    # el log: ambos se silencian durante la medición
+    logging.disable(logging.CRITICAL)
+    with redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            for segundos, exito in pool.map(_medir, range(peticiones)):
+                latencias.append(segundos)
+                exitos += bool(exito)
+        duracion = time.perf_counter() - inicio
+    logging.disable(logging.NOTSET)
+
+    latencias.sort()
+    return {
+        "escenario": escenario,
+        "objetivo": objetivo,
+        "concurrencia": concurrencia,
+        "peticiones": peticiones,
+        "exitos": exitos,
+        "fallos": peticiones - exitos,
+        "reintentos": int(registro_metricas.total("reintentos_total")),
+        "segundos": round(duracion, 3),
+        "peticiones_por_segundo": round(peticiones / duracion, 1) if duracion else 0.0,
+        "latencia_p50_ms": round(percentil(latencias, 50) * 1000, 2),
+        "latencia_p99_ms": round(percentil(latencias, 99) * 1000, 2),
+        "latencia_max_ms": round(latencias[-1] * 1000, 2) if latencias else 0.0,
+        "rss_pico_mb": rss_pico_mb(),
+    }
+
+
+def _servir(escenarios: Dict[str, ConfiguracionStub], cola, evento_fin):
+    """Cuerpo del proceso del servidor stub: publica su URL y espera la orden de parar."""
+    with ServidorStub(escenarios) as servidor:
+        cola.put(servidor.url_base)
+        evento_fin.wait()
+
+
+def version_codigo() -> Optional[str]:
+    """Commit actual del repositorio (para etiquetar los resultados), si git está disponible."""
+    try:
+        salida = subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, timeout=10
+        )
+        return salida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def ejecutar_benchmark(
+    escenarios: List[str],
+    objetivos: List[str],
+    concurrencias: List[int],
+    peticiones: int = 200,
+    aislar: bool = True,
+    tasa: Optional[float] = None
+) -> dict:
+    """
+    Ejecuta todas las combinaciones y devuelve el informe completo (serializable a JSON).
+
+    Args:
+        escenarios (list): Nombres de ESCENARIOS a ejecutar.
+        objetivos (list): Nombres de OBJETIVOS a ejecutar.
+        concurrencias (list): Niveles de concurrencia (hilos cliente).
+        peticiones (int): Llamadas por combinación.
+        aislar (bool): Ejecutar cada combinación en un proceso nuevo (RSS por combinación).
+        tasa (float, opcional): Límite de peticiones/segundo del limitador del host local.
+    """
+    contexto = multiprocessing.get_context("spawn")
+    cola = contexto.Queue()
+    evento_fin = contexto.Event()
+    proceso_servidor = contexto.Process(
+        target=_servir, args=({n: ESCENARIOS[n] for n in escenarios}, cola, evento_fin), daemon=True
+    )
+    proceso_servidor.start()
+    url_base = cola.get(timeout=30)
+
+    resultados = []
+    try:
+        for escenario in escenarios:
+            for objetivo in objetivos:
+                for concurrencia in concurrencias:
+                    argumentos = (url_base, escenario, objetivo, concurrencia, peticiones, tasa)
+                    if aislar:
+                        with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+                            resultado = pool.submit(ejecutar_caso, *argumentos).result()
+                    else:
+                        resultado = ejecutar_caso(*argumentos)
+                    resultados.append(resultado)
+                    print(
+                        f"{escenario:<15} {objetivo:<21} c={concurrencia:<4} "
+                        f"{resultado['peticiones_por_segundo']:>9.1f} req/s  "
+                        f"p50={resultado['latencia_p50_ms']:>8.2f} ms  p99={resultado['latencia_p99_ms']:>8.2f} ms  "
+                        f"fallos={resultado['fallos']:<4} rss={resultado['rss_pico_mb']} MB"
+                    )
+    finally:
+        evento_fin.set()
+        proceso_servidor.join(timeout=10)
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "version": version_codigo(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "parametros": {
+            "peticiones": peticiones,
+            "aislar": aislar,
+            "tasa": tasa,
+            "escenarios": {n: vars(ESCENARIOS[n]) for n in escenarios},
+        },
+        "resultados": resultados,
+    }
+
+
+def comparar(anterior: dict, actual: dict):
+    """Imprime la variación de req/s y p99 entre dos informes para las combinaciones comunes."""
+    def _indexar(informe):
+        return {(r["escenario"], r["objetivo"], r["concurrencia"]): r for r in informe["resultados"]}
+
+    previos = _indexar(anterior)
+    print(f"\nComparación con {anterior.get('version')} ({anterior.get('fecha')}):")
+    for clave, resultado in _indexar(actual).items():
+        previo = previos.get(clave)
+        if previo is None:
+            continue
+        variacion_rps = (resultado["peticiones_por_segundo"] / previo["peticiones_por_segundo"] - 1) * 100 \
+            if previo["peticiones_por_segundo"] else 0.0
+        variacion_p99 = (resultado["latencia_p99_ms"] / previo["latencia_p99_ms"] - 1) * 100 \
+            if previo["latencia_p99_ms"] else 0.0
+        escenario, objetivo, concurrencia = clave
+        print(f"{escenario:<15} {objetivo:<21} c={concurrencia:<4} req/s {variacion_rps:+7.1f}%   p99 {variacion_p99:+7.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la capa HTTP contra un servidor stub local.")
+    parser.add_argument("--escenarios", default=",".join(ESCENARIOS), help="Lista separada por comas.")
+    parser.add_argument("--objetivos", default=",".join(OBJETIVOS), help="Lista separada por comas.")
+    parser.add_argument("--concurrencias", default="1,8,32", help="Niveles de concurrencia, p.ej. 1,8,32.")
+    parser.add_argument("--peticiones", type=int, default=200, help="Llamadas por combinación.")
+    parser.add_argument("--tasa", type=float, default=None, help="Límite de req/s del limitador (por defecto sin límite).")
+    parser.add_argument("--sin-aislar", action="store_true", help="Ejecutar todo en un único proceso.")
+    parser.add_argument("--salida", default=None, help="Fichero JSON de resultados.")
+    parser.add_argument("--comparar", default=None, help="Informe JSON anterior con el que comparar.")
+    args = parser.parse_args()
+
+    informe = ejecutar_benchmark(
+        escenarios=args.escenarios.split(","),
+        objetivos=args.objetivos.split(","),
+        concurrencias=[int(c) for c in args.concurrencias.split(",")],
+        peticiones=args.peticiones,
+        aislar=not args.sin_aislar,
+        tasa=args.tasa,
+    )
+
+    salida = args.salida or f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(json.load(f), informe)
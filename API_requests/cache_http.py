@@ -0,0 +1,272 @@
+"""
+Caché HTTP con Revalidación Condicional (ETag / Last-Modified)
+==============================================================
+
+Caché opcional para las peticiones GET de `realizar_peticion_segura`, con dos niveles:
+1. Memoria: LRU de tamaño fijo, sin coste de E/S.
+2. Disco (opcional): un fichero JSON por entrada, sobrevive entre ejecuciones.
+
+Cada entrada tiene un TTL que puede variar por endpoint. Mientras está fresca se sirve sin
+tocar la red. Cuando caduca se revalida con `If-None-Match` / `If-Modified-Since`: si el
+servidor responde 304 se reutiliza el cuerpo guardado y solo viajan las cabeceras.
+
+Los parámetros con credenciales (tokens, API keys...) y las cabeceras de autenticación no
+aparecen en claro en la clave, pero sí una huella suya: dos credenciales distintas nunca
+comparten entrada, de modo que una respuesta no se sirve a quien no la pidió.
+
+Uso típico:
+    cache = CacheHTTP(directorio=".cache_http", ttls={"api.openweathermap.org/*": 600})
+    respuesta = realizar_peticion_segura("GET", url, params=params, cache=cache)
+    print(cache.estadisticas())
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from fnmatch import fnmatch
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Parámetros de query con credenciales: se guardan solo como huella en la clave
+PARAMETROS_VOLATILES = frozenset({"access_token", "appsecret_proof", "appid", "api_key", "key"})
+
+# Cabeceras que identifican a quien pide (en minúsculas): forman parte de la clave como huella
+CABECERAS_CREDENCIALES = frozenset({
+    "authorization", "proxy-authorization", "cookie", "x-api-key", "api-key",
+    "ocp-apim-subscription-key", "developer-token", "login-customer-id"
+})
+
+
+class CacheHTTP:
+    """Caché LRU en memoria + disco con TTL por endpoint y revalidación condicional."""
+
+    def __init__(
+        self,
+        capacidad_memoria: int = 256,
+        directorio: Optional[str] = None,
+        ttl_por_defecto: float = 300,
+        ttls: Optional[Dict[str, float]] = None,
+        parametros_volatiles: Iterable[str] = PARAMETROS_VOLATILES,
+        cabeceras_credenciales: Iterable[str] = CABECERAS_CREDENCIALES
+    ):
+        """
+        Args:
+            capacidad_memoria (int): Número máximo de respuestas en el nivel de memoria.
+            directorio (str, opcional): Carpeta del nivel en disco. Si es None solo se usa memoria.
+            ttl_por_defecto (float): Segundos de frescura si ningún patrón de `ttls` coincide.
+            ttls (dict, opcional): Patrones 'host/ruta' (estilo fnmatch) -> segundos de TTL.
+                Ejemplo: {"graph.facebook.com/*/posts": 60, "api.openweathermap.org/*": 600}
+            parametros_volatiles (iterable): Parámetros de query con credenciales: en la clave solo
+                entra una huella de su valor.
+            cabeceras_credenciales (iterable): Cabeceras que identifican a quien pide (sin
+                distinguir mayúsculas); también entran en la clave como huella.
+        """
+        self.capacidad_memoria = capacidad_memoria
+        self.directorio = directorio
+        self.ttl_por_defecto = ttl_por_defecto
+        self.ttls = ttls or {}
+        self.parametros_volatiles = frozenset(parametros_volatiles)
+        self.cabeceras_credenciales = frozenset(c.lower() for c in cabeceras_credenciales)
+
+        self._memoria: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._contadores = {"aciertos_memoria": 0, "aciertos_disco": 0, "fallos": 0, "revalidaciones_304": 0, "guardadas": 0}
+
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+    # --- Claves y TTL ---
+
+    def clave(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> str:
+        """
+        Clave estable para una URL + parámetros + credenciales. Los parámetros volátiles y las
+        cabeceras de credenciales entran solo como huella (nunca en claro).
+        """
+        partes = urlsplit(url)
+        pares = parse_qsl(partes.query, keep_blank_values=True)
+        pares += [(k, str(v)) for k, v in (params or {}).items()]
+        visibles = sorted((k, v) for k, v in pares if k not in self.parametros_volatiles)
+        credenciales = sorted((k, v) for k, v in pares if k in self.parametros_volatiles)
+        credenciales += sorted(
+            (k.lower(), str(v)) for k, v in (headers or {}).items() if k.lower() in self.cabeceras_credenciales
+        )
+        huella_credenciales = hashlib.sha256(json.dumps(credenciales).encode("utf-8")).hexdigest()
+        base = f"{partes.scheme}://{partes.netloc}{partes.path}"
+        return hashlib.sha256(f"{base}?{visibles}#{huella_credenciales}".encode("utf-8")).hexdigest()
+
+    def url_sin_credenciales(self, url: str) -> str:
+        """URL sin los parámetros volátiles: es la que se guarda (y se escribe en disco) con la entrada."""
+        partes = urlsplit(url)
+        pares = [(k, v) for k, v in parse_qsl(partes.query, keep_blank_values=True) if k not in self.parametros_volatiles]
+        return urlunsplit(partes._replace(query=urlencode(pares)))
+
+    def ttl_para(self, url: str) -> float:
+        """TTL aplicable a la URL según el primer patrón de `ttls` que coincida."""
+        partes = urlsplit(url)
+        objetivo = f"{partes.hostname}{partes.path}"
+        for patron, ttl in self.ttls.items():
+            if fnmatch(objetivo, patron):
+                return ttl
+        return self.ttl_por_defecto
+
+    # --- Lectura ---
+
+    def obtener(self, clave: str) -> Optional[dict]:
+        """
+        Busca una entrada (fresca o caducada) en memoria y, si no está, en disco.
+        No actualiza los contadores: eso lo hace `registrar_acierto` / `registrar_fallo`.
+        """
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is not None:
+                self._memoria.move_to_end(clave)
+                return entrada
+
+        entrada = self._leer_disco(clave)
+        if entrada is not None:
+            # Promocionamos a memoria; la copia devuelta recuerda su origen para las métricas
+            self._guardar_memoria(clave, entrada)
+            entrada = dict(entrada, _origen="disco")
+        return entrada
+
+    @staticmethod
+    def es_fresca(entrada: dict) -> bool:
+        return time.time() < entrada["expira"]
+
+    @staticmethod
+    def cabeceras_revalidacion(entrada: dict) -> Dict[str, str]:
+        """Cabeceras condicionales para revalidar una entrada caducada."""
+        cabeceras = {}
+        if entrada.get("etag"):
+            cabeceras["If-None-Match"] = entrada["etag"]
+        if entrada.get("last_modified"):
+            cabeceras["If-Modified-Since"] = entrada["last_modified"]
+        return cabeceras
+
+    @staticmethod
+    def a_respuesta(entrada: dict) -> requests.Response:
+        """Reconstruye un `requests.Response` a partir de una entrada de la caché."""
+        respuesta = requests.Response()
+        respuesta.status_code = entrada["status_code"]
+        respuesta.reason = "OK"
+        respuesta.url = entrada["url"]
+        respuesta.headers = CaseInsensitiveDict(entrada["headers"])
+        respuesta.encoding = entrada.get("encoding")
+        respuesta._content = entrada["contenido"]
+        return respuesta
+
+    # --- Escritura ---
+
+    def guardar(self, clave: str, respuesta: requests.Response) -> dict:
+        """Almacena una respuesta 200 en ambos niveles y devuelve la entrada creada."""
+        entrada = {
+            "url": self.url_sin_credenciales(respuesta.url),
+            "status_code": respuesta.status_code,
+            "headers": dict(respuesta.headers),
+            "encoding": respuesta.encoding,
+            "contenido": respuesta.content,
+            "etag": respuesta.headers.get("ETag"),
+            "last_modified": respuesta.headers.get("Last-Modified"),
+            "expira": time.time() + self.ttl_para(respuesta.url),
+        }
+        self._guardar_memoria(clave, entrada)
+        self._escribir_disco(clave, entrada)
+        with self._lock:
+            self._contadores["guardadas"] += 1
+        return entrada
+
+    def refrescar(self, clave: str, entrada: dict, respuesta_304: requests.Response) -> dict:
+        """Renueva el TTL de una entrada tras un 304 Not Modified."""
+        entrada = dict(entrada)
+        entrada["expira"] = time.time() + self.ttl_para(entrada["url"])
+        entrada["etag"] = respuesta_304.headers.get("ETag", entrada.get("etag"))
+        entrada["last_modified"] = respuesta_304.headers.get("Last-Modified", entrada.get("last_modified"))
+        entrada.pop("_origen", None)
+        self._guardar_memoria(clave, entrada)
+        self._escribir_disco(clave, entrada)
+        with self._lock:
+            self._contadores["revalidaciones_304"] += 1
+        return entrada
+
+    def _guardar_memoria(self, clave: str, entrada: dict):
+        with self._lock:
+            self._memoria[clave] = entrada
+            self._memoria.move_to_end(clave)
+            while len(self._memoria) > self.capacidad_memoria:
+                self._memoria.popitem(last=False)
+
+    # --- Nivel en disco ---
+
+    def _ruta_disco(self, clave: str) -> str:
+        return os.path.join(self.directorio, f"{clave}.json")
+
+    def _leer_disco(self, clave: str) -> Optional[dict]:
+        if not self.directorio:
+            return None
+        try:
+            with open(self._ruta_disco(clave), "r", encoding="utf-8") as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            return None
+        entrada["contenido"] = base64.b64decode(entrada["contenido"])
+        return entrada
+
+    def _escribir_disco(self, clave: str, entrada: dict):
+        if not self.directorio:
+            return
+        serializable = {k: v for k, v in entrada.items() if not k.startswith("_")}
+        serializable["contenido"] = base64.b64encode(entrada["contenido"]).decode("ascii")
+        ruta = self._ruta_disco(clave)
+        temporal = f"{ruta}.{threading.get_ident()}.tmp"
+        # Escritura atómica: nunca queda un JSON a medias si el proceso se interrumpe
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(serializable, f)
+        os.replace(temporal, ruta)
+
+    # --- Métricas ---
+
+    def registrar_acierto(self, entrada: dict):
+        with self._lock:
+            origen = "aciertos_disco" if entrada.get("_origen") == "disco" else "aciertos_memoria"
+            self._contadores[origen] += 1
+
+    def registrar_fallo(self):
+        with self._lock:
+            self._contadores["fallos"] += 1
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """
+        Contadores de uso para ajustar TTLs y capacidad.
+
+        Returns:
+            dict: aciertos_memoria, aciertos_disco, fallos (peticiones a red sin entrada fresca),
+            revalidaciones_304, guardadas, ratio_aciertos y entradas_memoria.
+        """
+        with self._lock:
+            estadisticas = dict(self._contadores)
+            estadisticas["entradas_memoria"] = len(self._memoria)
+        aciertos = estadisticas["aciertos_memoria"] + estadisticas["aciertos_disco"]
+        total = aciertos + estadisticas["fallos"]
+        estadisticas["ratio_aciertos"] = aciertos / total if total else 0.0
+        return estadisticas
+
+    def vaciar(self):
+        """Elimina todas las entradas de memoria y disco (los contadores se mantienen)."""
+        with self._lock:
+            self._memoria.clear()
+        if self.directorio:
+            for nombre in os.listdir(self.directorio):
+                if nombre.endswith(".json"):
+                    os.remove(os.path.join(self.directorio, nombre))
@@ -0,0 +1,246 @@
+"""
+Circuit Breaker por Host
+========================
+
+Cuando un servicio (Graph, Google Ads...) se degrada, seguir reintentando contra él solo
+bloquea hilos que podrían estar atendiendo a hosts sanos. Este módulo implementa un
+circuit breaker por host con tres estados:
+
+- CERRADO: funcionamiento normal. Se registra el resultado de cada petición en una ventana
+  deslizante (por número de peticiones y por antigüedad en segundos).
+- ABIERTO: la tasa de fallos de la ventana superó el umbral. Las peticiones se rechazan al
+  instante devolviendo `CIRCUITO_ABIERTO`, sin tocar la red ni dormir en backoffs.
+- SEMIABIERTO: pasado `tiempo_apertura`, se deja pasar un número limitado de peticiones de
+  sonda. Si tienen éxito el circuito se cierra; si fallan vuelve a abrirse.
+
+Los cambios de estado se registran en el log y se notifican a los callbacks suscritos
+(`al_cambiar_estado`), además de acumularse en `estadisticas()`.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+
+class _ResultadoCircuitoAbierto:
+    """
+    Resultado que devuelve `realizar_peticion_segura` cuando el circuito del host está abierto.
+    Es falso en contexto booleano (como None), por lo que el código que hace `if respuesta:`
+    sigue funcionando, pero puede distinguirse con `respuesta is CIRCUITO_ABIERTO`.
+    """
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return "CIRCUITO_ABIERTO"
+
+
+CIRCUITO_ABIERTO = _ResultadoCircuitoAbierto()
+
+
+class CircuitBreaker:
+    """Circuit breaker thread-safe basado en la tasa de fallos de una ventana deslizante."""
+
+    def __init__(
+        self,
+        nombre: str,
+        umbral_fallos: float = 0.5,
+        ventana: int = 20,
+        ventana_segundos: float = 60.0,
+        minimo_peticiones: int = 5,
+        tiempo_apertura: float = 30.0,
+        sondas_semiabierto: int = 1
+    ):
+        """
+        Args:
+            nombre (str): Identificador del circuito (normalmente el host).
+            umbral_fallos (float): Proporción de fallos (0-1) en la ventana que abre el circuito.
+            ventana (int): Número máximo de resultados recientes considerados.
+            ventana_segundos (float): Antigüedad máxima de los resultados considerados.
+            minimo_peticiones (int): Resultados necesarios en la ventana antes de evaluar el umbral.
+            tiempo_apertura (float): Segundos en ABIERTO antes de pasar a SEMIABIERTO y sondear.
+            sondas_semiabierto (int): Peticiones simultáneas permitidas en SEMIABIERTO.
+        """
+        self.nombre = nombre
+        self.umbral_fallos = umbral_fallos
+        self.ventana_segundos = ventana_segundos
+        self.minimo_peticiones = minimo_peticiones
+        self.tiempo_apertura = tiempo_apertura
+        self.sondas_semiabierto = sondas_semiabierto
+
+        self._resultados = deque(maxlen=ventana)  # (timestamp, exito)
+        self._estado = CERRADO
+        self._abierto_desde = 0.0
+        self._sondas_en_curso = 0
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[str, str, str], None]] = []
+        self._contadores = {"rechazadas": 0, "aperturas": 0, "cierres": 0, "semiaperturas": 0}
+
+    @property
+    def estado(self) -> str:
+        with self._lock:
+            return self._estado
+
+    def al_cambiar_estado(self, callback: Callable[[str, str, str], None]):
+        """Suscribe `callback(nombre, estado_anterior, estado_nuevo)` a las transiciones."""
+        self._callbacks.append(callback)
+
+    def _transicion(self, nuevo: str) -> Optional[tuple]:
+        """Cambia de estado (con el lock tomado). Devuelve la transición para notificarla fuera del lock."""
+        anterior = self._estado
+        if anterior == nuevo:
+            return None
+        self._estado = nuevo
+        if nuevo == ABIERTO:
+            self._abierto_desde = time.monotonic()
+            self._contadores["aperturas"] += 1
+        elif nuevo == SEMIABIERTO:
+            self._sondas_en_curso = 0
+            self._contadores["semiaperturas"] += 1
+        else:
+            self._resultados.clear()
+            self._contadores["cierres"] += 1
+        return anterior, nuevo
+
+    def _notificar(self, transicion: Optional[tuple]):
+        if transicion is None:
+            return
+        anterior, nuevo = transicion
+        nivel = logging.WARNING if nuevo == ABIERTO else logging.INFO
+        logger.log(nivel, "Circuito '%s': %s -> %s", self.nombre, anterior, nuevo)
+        for callback in self._callbacks:
+            try:
+                callback(self.nombre, anterior, nuevo)
+            except Exception as err:
+                logger.error("Error en callback de circuito '%s': %s", self.nombre, err)
+
+    def permitir(self) -> bool:
+        """
+        Indica si se puede enviar una petición ahora mismo.
+        En SEMIABIERTO reserva una de las plazas de sonda.
+        """
+        transicion = None
+        with self._lock:
+            if self._estado == ABIERTO:
+                if time.monotonic() - self._abierto_desde >= self.tiempo_apertura:
+                    transicion = self._transicion(SEMIABIERTO)
+                else:
+                    self._contadores["rechazadas"] += 1
+                    return False
+
+            if self._estado == SEMIABIERTO:
+                if self._sondas_en_curso >= self.sondas_semiabierto:
+                    self._contadores["rechazadas"] += 1
+                    permitido = False
+                else:
+                    self._sondas_en_curso += 1
+                    permitido = True
+            else:
+                permitido = True
+
+        self._notificar(transicion)
+        return permitido
+
+    def cancelar_permiso(self):
+        """Devuelve un permiso concedido por `permitir` cuando finalmente no se envía la petición."""
+        with self._lock:
+            if self._estado == SEMIABIERTO:
+                self._sondas_en_curso = max(0, self._sondas_en_curso - 1)
+
+    def registrar_resultado(self, exito: bool):
+        """Registra el resultado de una petición y actualiza el estado si corresponde."""
+        transicion = None
+        with self._lock:
+            if self._estado == SEMIABIERTO:
+                self._sondas_en_curso = max(0, self._sondas_en_curso - 1)
+                transicion = self._transicion(CERRADO if exito else ABIERTO)
+            elif self._estado == CERRADO:
+                ahora = time.monotonic()
+                self._resultados.append((ahora, exito))
+                recientes = [ok for marca, ok in self._resultados if ahora - marca <= self.ventana_segundos]
+                if len(recientes) >= self.minimo_peticiones:
+                    tasa_fallos = recientes.count(False) / len(recientes)
+                    if tasa_fallos >= self.umbral_fallos:
+                        transicion = self._transicion(ABIERTO)
+        self._notificar(transicion)
+
+    def estadisticas(self) -> Dict[str, object]:
+        """Estado actual y contadores de rechazos y transiciones."""
+        with self._lock:
+            estadisticas = dict(self._contadores)
+            estadisticas["estado"] = self._estado
+        return estadisticas
+
+
+class RegistroCircuitos:
+    """Registro thread-safe de circuit breakers, uno por host."""
+
+    def __init__(self, **opciones_por_defecto):
+        self.opciones_por_defecto = opciones_por_defecto
+        self._configuraciones: Dict[str, dict] = {}
+        self._circuitos: Dict[str, CircuitBreaker] = {}
+        self._callbacks: List[Callable[[str, str, str], None]] = []
+        self._lock = threading.Lock()
+
+    def configurar(self, host: str, **opciones):
+        """
+        Define los parámetros del circuito de un host (ver CircuitBreaker).
+        Ejemplo: circuitos.configurar("googleads.googleapis.com", umbral_fallos=0.3, tiempo_apertura=60)
+        """
+        with self._lock:
+            self._configuraciones[host] = opciones
+            self._circuitos.pop(host, None)
+
+    def al_cambiar_estado(self, callback: Callable[[str, str, str], None]):
+        """Suscribe un callback a las transiciones de todos los circuitos (actuales y futuros)."""
+        with self._lock:
+            self._callbacks.append(callback)
+            for circuito in self._circuitos.values():
+                circuito.al_cambiar_estado(callback)
+
+    def obtener(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            circuito = self._circuitos.get(host)
+            if circuito is None:
+                opciones = {**self.opciones_por_defecto, **self._configuraciones.get(host, {})}
+                circuito = CircuitBreaker(host, **opciones)
+                for callback in self._callbacks:
+                    circuito.al_cambiar_estado(callback)
+                self._circuitos[host] = circuito
+            return circuito
+
+    def estadisticas(self) -> Dict[str, Dict[str, object]]:
+        """Estadísticas de todos los circuitos, por host."""
+        with self._lock:
+            circuitos = dict(self._circuitos)
+        return {host: circuito.estadisticas() for host, circuito in circuitos.items()}
+
+
+# Registro compartido por todo el proceso (lo usa realizar_peticion_segura)
+circuitos = RegistroCircuitos()
+
+
+def obtener_circuito(url: str) -> CircuitBreaker:
+    """Devuelve el circuit breaker compartido del host de la URL."""
+    return circuitos.obtener(urlsplit(url).hostname or url)
+
+
+if __name__ == "__main__":
+    circuito = CircuitBreaker("demo", minimo_peticiones=3, tiempo_apertura=0.5)
+    for _ in range(3):
+        circuito.registrar_resultado(False)
+    print("Tras 3 fallos:", circuito.estado, "- permitir:", circuito.permitir())
+    time.sleep(0.6)
+    print("Tras el tiempo de apertura, permitir (sonda):", circuito.permitir(), "-", circuito.estado)
+    circuito.registrar_resultado(True)
+    print("Sonda con éxito:", circuito.estado, circuito.estadisticas())
@@ -0,0 +1,450 @@
+"""
+Base Declarativa para Conectores de APIs
+========================================
+
+Los conectores (Meta, Google Ads, clima...) repetían lo mismo: montar la URL, añadir las
+credenciales, desempaquetar la respuesta y seguir la paginación. `BaseConnector` reúne esa
+parte común; cada conector solo declara cómo es su API:
+
+    class MiConector(BaseConnector):
+        BASE_URL = "https://api.ejemplo.com/v1"
+        PAGINACION = PaginacionNextLink(ruta_elementos="items", ruta_enlace="links.next")
+        CABECERAS = {"Accept": "application/json"}
+        LIMITE_TASA = {"tasa": 5, "tasa_maxima": 5}  # Opciones de LimitadorTokenBucket
+
+        def __init__(self, api_key):
+            super().__init__(ApiKeyCabecera(api_key, "X-API-KEY"))
+
+y hereda:
+- Las cuatro formas de autenticación de `api_templates` como estrategias reutilizables
+  (cabeceras y parámetros calculados una sola vez; también aceptan un proveedor de tokens
+  con `obtener_token()`, ver `tokens_oauth2`).
+- Paginación en streaming (`paginar`): cursor, pageToken o enlace "next", con la página
+  siguiente descargándose en segundo plano mientras se procesa la actual.
+- Límite de peticiones declarado por la clase (no pisa la configuración del usuario).
+- Todo lo que ya aporta `realizar_peticion_segura`: sesiones keep-alive, reintentos,
+  circuit breaker, caché, single-flight y métricas; más las variantes concurrentes
+  (`en_paralelo`, `en_paralelo_async`) y en streaming de JSON (`stream`).
+"""
+
+import abc
+import base64
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from utils_requests import realizar_peticion_segura
+from peticiones_concurrentes import (
+    realizar_peticion_async, realizar_peticiones_concurrentes, realizar_peticiones_en_hilos
+)
+from limitador import LimitadorTokenBucket, limitadores
+from tokens_oauth2 import resolver_token_async
+
+logger = logging.getLogger(__name__)
+
+
+def _extraer(datos: Any, ruta: str) -> Any:
+    """Valor en la ruta con puntos ('paging.cursors.after') de un JSON, o None si no existe."""
+    if isinstance(datos, dict) and ruta in datos:
+        return datos[ruta]  # Claves que ya contienen puntos, como '@odata.nextLink'
+    for clave in ruta.split("."):
+        if not isinstance(datos, dict):
+            return None
+        datos = datos.get(clave)
+    return datos
+
+
+def dividir_en_lotes(elementos: List[Any], tamano: int) -> List[List[Any]]:
+    """Parte una lista en bloques de como mucho `tamano` elementos (para APIs batch o multi-ID)."""
+    return [elementos[i:i + tamano] for i in range(0, len(elementos), tamano)]
+
+
+# --- Estrategias de autenticación ---
+
+class Autenticacion:
+    """Estrategia de autenticación: cabeceras y parámetros que se añaden a cada petición."""
+
+    def cabeceras(self) -> Dict[str, str]:
+        return {}
+
+    def parametros(self) -> Dict[str, str]:
+        return {}
+
+    async def cabeceras_async(self) -> Dict[str, str]:
+        return self.cabeceras()
+
+    async def parametros_async(self) -> Dict[str, str]:
+        return self.parametros()
+
+    def invalidar(self):
+        """Se llama cuando el servidor rechaza la credencial (401)."""
+
+
+class SinAutenticacion(Autenticacion):
+    """APIs públicas."""
+
+
+class AutenticacionBasica(Autenticacion):
+    """Auth Básica (usuario/contraseña en la cabecera Authorization)."""
+
+    def __init__(self, usuario: str, password: str):
+        token_b64 = base64.b64encode(f"{usuario}:{password}".encode()).decode()
+        self._cabeceras = {"Authorization": f"Basic {token_b64}"}
+
+    def cabeceras(self) -> Dict[str, str]:
+        return self._cabeceras
+
+
+class _AutenticacionConCredencial(Autenticacion, abc.ABC):
+    """
+    Base de las estrategias con una credencial que puede ser un texto fijo (el resultado se
+    calcula una sola vez) o un proveedor con `obtener_token()` (se le pide en cada petición).
+    """
+
+    EN_CABECERA = True
+
+    def __init__(self, credencial: Any):
+        self.credencial = credencial
+        self._fijo = None if hasattr(credencial, "obtener_token") else self._formatear(credencial)
+
+    @abc.abstractmethod
+    def _formatear(self, valor: str) -> Dict[str, str]:
+        """Cabeceras o parámetros que corresponden al valor de la credencial."""
+
+    def _valores(self) -> Dict[str, str]:
+        return self._fijo or self._formatear(self.credencial.obtener_token())
+
+    async def _valores_async(self) -> Dict[str, str]:
+        return self._fijo or self._formatear(await resolver_token_async(self.credencial))
+
+    def cabeceras(self) -> Dict[str, str]:
+        return self._valores() if self.EN_CABECERA else {}
+
+    def parametros(self) -> Dict[str, str]:
+        return {} if self.EN_CABECERA else self._valores()
+
+    async def cabeceras_async(self) -> Dict[str, str]:
+        return await self._valores_async() if self.EN_CABECERA else {}
+
+    async def parametros_async(self) -> Dict[str, str]:
+        return {} if self.EN_CABECERA else await self._valores_async()
+
+    def invalidar(self):
+        # Un proveedor descarta su token para pedir uno nuevo; un texto fijo no se puede renovar
+        if hasattr(self.credencial, "invalidar"):
+            self.credencial.invalidar()
+
+
+class AutenticacionBearer(_AutenticacionConCredencial):
+    """Bearer Token (OAuth2 / JWT). Acepta un token o un proveedor de tokens."""
+
+    def _formatear(self, valor: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {valor}"}
+
+
+class ApiKeyCabecera(_AutenticacionConCredencial):
+    """API Key en una cabecera (X-API-KEY, api-key...)."""
+
+    def __init__(self, api_key: Any, nombre: str = "X-API-KEY"):
+        self.nombre = nombre
+        super().__init__(api_key)
+
+    def _formatear(self, valor: str) -> Dict[str, str]:
+        return {self.nombre: valor}
+
+
+class ApiKeyParametro(_AutenticacionConCredencial):
+    """API Key (o token) en un parámetro de la URL (key, appid, access_token...)."""
+
+    EN_CABECERA = False
+
+    def __init__(self, api_key: Any, nombre: str = "key"):
+        self.nombre = nombre
+        super().__init__(api_key)
+
+    def _formatear(self, valor: str) -> Dict[str, str]:
+        return {self.nombre: valor}
+
+
+# --- Estilos de paginación ---
+
+class Paginacion:
+    """Estilo de paginación: dónde están los elementos de una página y cómo pedir la siguiente."""
+
+    def __init__(self, ruta_elementos: str = "data"):
+        self.ruta_elementos = ruta_elementos
+
+    def elementos(self, datos: Any) -> list:
+        return (datos if not self.ruta_elementos else _extraer(datos, self.ruta_elementos)) or []
+
+    def siguiente(self, peticion: Dict[str, Any], datos: Any) -> Optional[Dict[str, Any]]:
+        """Petición de la página siguiente a partir de la actual y su respuesta (None si no hay más)."""
+        return None
+
+
+class SinPaginacion(Paginacion):
+    """Respuestas de una sola página."""
+
+
+class PaginacionCursor(Paginacion):
+    """Cursor opaco que se envía como parámetro de la URL (p.ej. Graph: `paging.cursors.after`)."""
+
+    def __init__(self, ruta_elementos: str = "data", ruta_cursor: str = "paging.cursors.after", parametro: str = "after"):
+        super().__init__(ruta_elementos)
+        self.ruta_cursor = ruta_cursor
+        self.parametro = parametro
+
+    def siguiente(self, peticion, datos):
+        cursor = _extraer(datos, self.ruta_cursor)
+        if not cursor:
+            return None
+        return {**peticion, "params": {**(peticion.get("params") or {}), self.parametro: cursor}}
+
+
+class PaginacionPageToken(Paginacion):
+    """Token de página en el cuerpo JSON o en los parámetros (p.ej. Google: `nextPageToken`)."""
+
+    def __init__(
+        self,
+        ruta_elementos: str = "results",
+        ruta_token: str = "nextPageToken",
+        parametro: str = "pageToken",
+        en_cuerpo: bool = True
+    ):
+        super().__init__(ruta_elementos)
+        self.ruta_token = ruta_token
+        self.parametro = parametro
+        self.en_cuerpo = en_cuerpo
+
+    def siguiente(self, peticion, datos):
+        token = _extraer(datos, self.ruta_token)
+        if not token:
+            return None
+        if self.en_cuerpo:
+            return {**peticion, "json_data": {**(peticion.get("json_data") or {}), self.parametro: token}}
+        return {**peticion, "params": {**(peticion.get("params") or {}), self.parametro: token}}
+
+
+class PaginacionNextLink(Paginacion):
+    """URL completa de la página siguiente (Graph de Meta: `paging.next`; Microsoft: `@odata.nextLink`)."""
+
+    def __init__(self, ruta_elementos: str = "value", ruta_enlace: str = "@odata.nextLink"):
+        super().__init__(ruta_elementos)
+        self.ruta_enlace = ruta_enlace
+
+    def siguiente(self, peticion, datos):
+        enlace = _extraer(datos, self.ruta_enlace)
+        if not enlace:
+            return None
+        # El enlace ya incluye los parámetros (filtros, campos y cursor)
+        return {**peticion, "metodo": "GET", "url": enlace, "params": None, "json_data": None, "data": None}
+
+
+# --- Conector base ---
+
+class BaseConnector:
+    """Base de los conectores: URL, autenticación, paginación y límites declarados por la clase."""
+
+    BASE_URL: str = ""
+    PAGINACION: Paginacion = SinPaginacion()
+    CABECERAS: Dict[str, str] = {}
+    LIMITE_TASA: Optional[Dict[str, float]] = None  # Opciones de LimitadorTokenBucket para el host
+
+    def __init__(self, autenticacion: Optional[Autenticacion] = None, cabeceras: Optional[Dict[str, str]] = None, cache=None):
+        """
+        Args:
+            autenticacion (Autenticacion, opcional): Estrategia de autenticación (por defecto, ninguna).
+            cabeceras (dict, opcional): Cabeceras fijas de esta instancia (se suman a CABECERAS).
+            cache (CacheHTTP, opcional): Caché para las peticiones GET.
+        """
+        self.autenticacion = autenticacion or SinAutenticacion()
+        self.cabeceras = {**self.CABECERAS, **(cabeceras or {})}
+        self.cache = cache
+        if self.LIMITE_TASA:
+            limitadores.configurar_por_defecto(urlsplit(self.BASE_URL).hostname or self.BASE_URL, **self.LIMITE_TASA)
+
+    def url(self, ruta: str = "") -> str:
+        """URL absoluta de una ruta relativa a BASE_URL (las URLs absolutas se dejan tal cual)."""
+        if ruta.startswith(("http://", "https://")):
+            return ruta
+        ruta = ruta.lstrip("/")
+        return f"{self.BASE_URL}/{ruta}" if ruta else self.BASE_URL
+
+    # --- Construcción de peticiones ---
+
+    @staticmethod
+    def _autenticar(peticion: Dict[str, Any], cabeceras: Dict[str, str], parametros: Dict[str, str]) -> Dict[str, Any]:
+        peticion["headers"] = {**(peticion.get("headers") or {}), **cabeceras}
+        if parametros:
+            # Las URLs "next" ya traen la credencial en la query: no se duplica, pero se sustituye
+            # por la vigente (el token puede haberse renovado desde la página anterior)
+            partes = urlsplit(peticion["url"])
+            query = parse_qsl(partes.query, keep_blank_values=True)
+            en_url = dict(query)
+            if any(clave in en_url and en_url[clave] != valor for clave, valor in parametros.items()):
+                query = [(clave, parametros.get(clave, valor)) for clave, valor in query]
+                peticion["url"] = urlunsplit(partes._replace(query=urlencode(query)))
+            nuevos = {clave: valor for clave, valor in parametros.items() if clave not in en_url}
+            if nuevos:
+                peticion["params"] = {**(peticion.get("params") or {}), **nuevos}
+        return peticion
+
+    def _peticion_base(self, metodo: str, ruta: str, headers: Optional[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+        peticion = {"metodo": metodo.upper(), "url": self.url(ruta), "headers": {**self.cabeceras, **(headers or {})}}
+        if hasattr(getattr(self.autenticacion, "credencial", None), "invalidar"):
+            # Ante un 401 el proveedor descarta su token y la siguiente petición pide otro
+            peticion["al_no_autorizado"] = self.autenticacion.invalidar
+        peticion.update((clave, valor) for clave, valor in kwargs.items() if valor is not None)
+        if peticion["metodo"] == "GET" and self.cache is not None:
+            peticion.setdefault("cache", self.cache)
+        return peticion
+
+    def construir_peticion(self, metodo: str, ruta: str = "", headers: Optional[Dict[str, str]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Argumentos de `realizar_peticion_segura` (o de las funciones concurrentes) para una
+        ruta del conector, con las cabeceras fijas, la autenticación y la caché ya aplicadas.
+        """
+        peticion = self._peticion_base(metodo, ruta, headers, **kwargs)
+        return self._autenticar(peticion, self.autenticacion.cabeceras(), self.autenticacion.parametros())
+
+    async def construir_peticion_async(self, metodo: str, ruta: str = "", headers: Optional[Dict[str, str]] = None, **kwargs) -> Dict[str, Any]:
+        """Versión asyncio de `construir_peticion` (si hay que renovar el token no bloquea el bucle)."""
+        peticion = self._peticion_base(metodo, ruta, headers, **kwargs)
+        return self._autenticar(
+            peticion, await self.autenticacion.cabeceras_async(), await self.autenticacion.parametros_async()
+        )
+
+    # --- Ejecución ---
+
+    def peticion(self, metodo: str, ruta: str = "", limitador: Optional[LimitadorTokenBucket] = None, **kwargs) -> Optional[requests.Response]:
+        """
+        Ejecuta una petición a una ruta del conector.
+
+        Args:
+            limitador (LimitadorTokenBucket, opcional): Limitador adicional al del host del que
+                se toma un token antes de enviar (p.ej. una cuota por cliente o por token).
+            **kwargs: Resto de argumentos de `construir_peticion` / `realizar_peticion_segura`.
+
+        Returns:
+            requests.Response o None si falló (igual que `realizar_peticion_segura`).
+        """
+        if limitador is not None:
+            limitador.adquirir()
+        return realizar_peticion_segura(**self.construir_peticion(metodo, ruta, **kwargs))
+
+    async def peticion_async(self, metodo: str, ruta: str = "", **kwargs) -> Optional[requests.Response]:
+        """Versión asyncio de `peticion`."""
+        return await realizar_peticion_async(**await self.construir_peticion_async(metodo, ruta, **kwargs))
+
+    def en_paralelo(self, peticiones: List[Dict[str, Any]], max_concurrencia: int = 10) -> Iterator[Tuple[int, Optional[requests.Response]]]:
+        """Ejecuta peticiones de `construir_peticion` en hilos. Yields (indice, respuesta) según terminan."""
+        return realizar_peticiones_en_hilos(peticiones, max_concurrencia)
+
+    def en_paralelo_async(self, peticiones: List[Dict[str, Any]], max_concurrencia: int = 10) -> AsyncIterator[Tuple[int, Optional[requests.Response]]]:
+        """Versión asyncio de `en_paralelo`."""
+        return realizar_peticiones_concurrentes(peticiones, max_concurrencia)
+
+    def paginar(
+        self,
+        metodo: str,
+        ruta: str = "",
+        paginacion: Optional[Paginacion] = None,
+        limitador: Optional[LimitadorTokenBucket] = None,
+        estricto: bool = False,
+        prefetch: bool = True,
+        **kwargs
+    ) -> Iterator[Any]:
+        """
+        Generador que recorre todas las páginas de una consulta y entrega sus elementos uno a uno.
+
+        Con `prefetch` la página siguiente se descarga en segundo plano mientras el llamador
+        procesa la actual; en memoria hay como mucho dos páginas. Si el llamador abandona el
+        generador, la descarga pendiente se cancela.
+
+        Args:
+            paginacion (Paginacion, opcional): Estilo de paginación (por defecto PAGINACION).
+            limitador (LimitadorTokenBucket, opcional): Limitador adicional, consultado en cada página.
+            estricto (bool): Si es True, una página que no se puede descargar lanza ConnectionError
+                en lugar de terminar el recorrido en silencio.
+            **kwargs: Argumentos de `construir_peticion` de la primera página.
+        """
+        paginacion = paginacion or self.PAGINACION
+        peticion = self.construir_peticion(metodo, ruta, **kwargs)
+
+        def _descargar(p: Dict[str, Any]):
+            if limitador is not None:
+                limitador.adquirir()
+            # Se autentica justo antes de enviar: en recorridos largos el token puede haberse
+            # renovado, y los enlaces "next" traen en la query el que estaba vigente al pedirlos
+            p = self._autenticar(dict(p), self.autenticacion.cabeceras(), self.autenticacion.parametros())
+            return realizar_peticion_segura(**p)
+
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch-paginas")
+        siguiente = executor.submit(_descargar, peticion)
+
+        try:
+            while siguiente is not None:
+                respuesta = siguiente.result()
+                if not respuesta:
+                    if estricto:
+                        raise ConnectionError(f"No se pudo obtener una página de {peticion['url']}")
+                    logger.warning(f"No se pudo obtener una página de {peticion['url']}; se detiene la paginación.")
+                    return
+
+                datos = respuesta.json()
+                elementos = paginacion.elementos(datos)
+                proxima = paginacion.siguiente(peticion, datos) if elementos else None
+                siguiente = None
+                if proxima is not None:
+                    peticion = {clave: valor for clave, valor in proxima.items() if valor is not None}
+                    if prefetch:
+                        siguiente = executor.submit(_descargar, peticion)
+
+                yield from elementos
+
+                if proxima is not None and not prefetch:
+                    siguiente = executor.submit(_descargar, peticion)
+        finally:
+            if siguiente is not None:
+                siguiente.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stream(
+        self,
+        metodo: str,
+        ruta: str,
+        ruta_stream: str,
+        limitador: Optional[LimitadorTokenBucket] = None,
+        estricto: bool = False,
+        **kwargs
+    ) -> Iterator[Any]:
+        """
+        Generador de los elementos de un array JSON grande, decodificados según llegan de la red
+        (ver `ruta_stream` en `realizar_peticion_segura`). La memoria no depende del tamaño de
+        la respuesta.
+
+        Args:
+            ruta_stream (str): Ruta del array dentro del JSON ('data.*', '*.results.*'...).
+            limitador (LimitadorTokenBucket, opcional): Limitador adicional al del host.
+            estricto (bool): Si es True, una petición fallida lanza ConnectionError en lugar de
+                terminar sin elementos.
+        """
+        if limitador is not None:
+            limitador.adquirir()
+        peticion = self.construir_peticion(metodo, ruta, **kwargs)
+        peticion.pop("cache", None)
+        elementos = realizar_peticion_segura(**peticion, ruta_stream=ruta_stream)
+        if not elementos:
+            if estricto:
+                raise ConnectionError(f"No se pudo obtener {peticion['url']}")
+            logger.warning(f"No se pudo obtener {peticion['url']}.")
+            return
+
+        try:
+            yield from elementos
+        finally:
+            # Si el llamador deja de iterar, se cierra la respuesta y la conexión vuelve al pool
+            elementos.close()
@@ -12,42 +12,112 @@ Documentación: https://developers.google.com/google-ads/api/rest/overview
 Notas Importantes:
 - Google Ads usa GAQL (Google Ads Query Language) para las consultas.
 - Se necesita un Developer Token, Client ID, Client Secret y un Refresh Token.
+- En JSON, los campos int64 (IDs, métricas de recuento, importes en micros) llegan como texto
+  y las claves en camelCase; `tipar_fila` los devuelve con los nombres y tipos de GAQL.
 """
 
-from utils_requests import realizar_peticion_segura
+from conector_base import AutenticacionBearer, BaseConnector, PaginacionPageToken
+from limitador import LimitadorTokenBucket, limitadores
 import json
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
-class GoogleAdsRestConnector:
+_ENTERO = re.compile(r"^-?\d+$")
+_MAYUSCULA = re.compile(r"(?<!^)(?=[A-Z])")
+
+
+def campos_select(gaql: str) -> list:
+    """Devuelve la lista de campos del SELECT de una consulta GAQL, en orden."""
+    coincidencia = re.search(r"\bSELECT\b(.*?)\bFROM\b", gaql, re.IGNORECASE | re.DOTALL)
+    if not coincidencia:
+        return []
+    return [campo.strip() for campo in coincidencia.group(1).split(",") if campo.strip()]
+
+
+def tipar_fila(fila: dict, prefijo: str = "") -> dict:
+    """
+    Aplana una fila de la API REST a {campo_gaql: valor}, p.ej. {"metrics.cost_micros": 1250000}.
+    
+    Las claves se pasan de camelCase a snake_case (como se escriben en GAQL) y los valores
+    int64 que la API envía como texto se convierten a int en los IDs, los importes en micros
+    y las métricas. El resto de valores se dejan tal cual (las fechas siguen en formato ISO).
+    """
+    plana = {}
+    for clave, valor in fila.items():
+        campo, es_int64 = _campo_gaql(prefijo, clave)
+        if isinstance(valor, dict):
+            plana.update(tipar_fila(valor, campo + "."))
+            continue
+        if es_int64 and isinstance(valor, str) and _ENTERO.match(valor):
+            valor = int(valor)
+        plana[campo] = valor
+    return plana
+
+
+def limitador_developer_token(developer_token: str, qps: float = None) -> LimitadorTokenBucket:
+    """
+    Limitador compartido de un developer token (su cuota es global para todas las cuentas).
+    Si se indica `qps` se configura la primera vez o si cambia, sin reponer los tokens ya
+    gastados por otros ejecutores del mismo token; si no, se usa la configuración existente.
+    """
+    clave = f"google-ads-developer-token:{developer_token}"
+    if qps:
+        limitadores.ajustar(clave, tasa=qps, tasa_maxima=qps)
+    return limitadores.obtener(clave)
+
+
+@lru_cache(maxsize=4096)
+def _campo_gaql(prefijo: str, clave: str) -> tuple:
+    """(nombre GAQL, si es un campo int64) de una clave JSON. Se cachea: se repite en cada fila."""
+    campo = prefijo + _MAYUSCULA.sub("_", clave).lower()
+    return campo, campo.startswith("metrics.") or campo.endswith(".id") or campo.endswith("_micros")
+
+
+class GoogleAdsRestConnector(BaseConnector):
     """Clase para simular conexiones REST a Google Ads."""
     
     # La URL base cambia según la versión de la API
     API_VERSION = "v15" 
     BASE_URL = f"https://googleads.googleapis.com/{API_VERSION}"
+    PAGINACION = PaginacionPageToken(ruta_elementos="results", ruta_token="nextPageToken", parametro="pageToken")
+    CABECERAS = {"Content-Type": "application/json"}
     
-    def __init__(self, developer_token: str, customer_id: str, access_token: str):
+    def __init__(self, developer_token: str, customer_id: str, access_token: str, login_customer_id: str = None):
         """
         Args:
             developer_token (str): Token de desarrollador de Google Ads.
             customer_id (str): ID de la cuenta de Google Ads (sin guiones).
-            access_token (str): Token OAuth2 temporal (Bearer token).
+            access_token (str | ProveedorTokenOAuth2): Token OAuth2 temporal (Bearer token), o un
+                proveedor (ver `tokens_oauth2`) que lo renueva antes de que caduque.
+            login_customer_id (str, opcional): ID de la cuenta de administrador (MCC) a través
+                de la que se accede. Por defecto, la propia cuenta.
         """
         self.customer_id = customer_id.replace("-", "") # Aseguramos formato limpio
+        login_customer_id = (login_customer_id or self.customer_id).replace("-", "")
+        self.access_token = access_token
         
-        # Headers obligatorios para todas las peticiones
-        self.headers = {
-            "developer-token": developer_token,
-            "login-customer-id": self.customer_id, # Requerido si gestionas cuentas
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
+        # Headers obligatorios para todas las peticiones (el token lo añade la autenticación)
+        super().__init__(
+            AutenticacionBearer(access_token),
+            cabeceras={
+                "developer-token": developer_token,
+                "login-customer-id": login_customer_id, # Requerido si gestionas cuentas
+            }
+        )
 
-    def buscar_campanas(self):
+    @property
+    def headers(self) -> dict:
+        """Headers de la petición con el token vigente (se renueva solo si se usa un proveedor)."""
+        return {**self.cabeceras, **self.autenticacion.cabeceras()}
+
+    def _consulta_buscar_campanas(self) -> dict:
         """
-        Ejemplo de cómo buscar campañas usando GAQL.
+        Cuerpo de la búsqueda de campañas.
         POST /customers/{customer_id}/googleAds:search
         """
-        endpoint = f"{self.BASE_URL}/customers/{self.customer_id}/googleAds:search"
-        
         # Consulta GAQL: Selecciona ID y Nombre de campañas activas
         query = """
             SELECT 
@@ -65,20 +135,230 @@ class GoogleAdsRestConnector:
             "query": query
         }
         
+        return payload
+
+    def buscar_campanas(self, streaming: bool = False):
+        """
+        Ejemplo de cómo buscar campañas usando GAQL.
+        POST /customers/{customer_id}/googleAds:search
+        
+        Si `streaming` es True devuelve un generador con las filas de 'results' decodificadas
+        una a una según llegan, en lugar del JSON completo.
+        """
         print(f"Enviando consulta GAQL a la cuenta {self.customer_id}...")
         
-        respuesta = realizar_peticion_segura(
-            metodo="POST",
-            url=endpoint,
-            headers=self.headers,
-            json_data=payload
+        ruta = f"customers/{self.customer_id}/googleAds:search"
+        if streaming:
+            return self.stream("POST", ruta, "results.*", json_data=self._consulta_buscar_campanas())
+        
+        respuesta = self.peticion("POST", ruta, json_data=self._consulta_buscar_campanas())
+        
+        if respuesta:
+            return respuesta.json()
+        return None
+
+    async def buscar_campanas_async(self):
+        """
+        Versión asíncrona de `buscar_campanas`.
+        Útil para consultar varias cuentas a la vez:
+            await asyncio.gather(*(c.buscar_campanas_async() for c in conectores))
+        """
+        # El token se obtiene sin bloquear el bucle de eventos si hay que renovarlo
+        respuesta = await self.peticion_async(
+            "POST", f"customers/{self.customer_id}/googleAds:search", json_data=self._consulta_buscar_campanas()
         )
         
         if respuesta:
             return respuesta.json()
         return None
 
+    def search(self, gaql: str, limitador: LimitadorTokenBucket = None):
+        """
+        Ejecuta una consulta GAQL con `googleAds:search` recorriendo todas sus páginas.
+        POST /customers/{customer_id}/googleAds:search  (siguiendo `nextPageToken`)
+        
+        La página siguiente se pide en segundo plano mientras se procesan las filas de la actual.
+        
+        Args:
+            gaql (str): Consulta GAQL.
+            limitador (LimitadorTokenBucket, opcional): Limitador adicional del que se toma un
+                token antes de pedir cada página (p.ej. la cuota del developer token).
+        
+        Yields:
+            dict: Cada fila aplanada y tipada con `tipar_fila`.
+        
+        Raises:
+            ConnectionError: Si una página no se puede obtener (las filas anteriores ya se entregaron).
+        """
+        filas = self.paginar(
+            "POST", f"customers/{self.customer_id}/googleAds:search",
+            json_data={"query": gaql}, limitador=limitador, estricto=True
+        )
+        for fila in filas:
+            yield tipar_fila(fila)
+
+    def search_stream(self, gaql: str, limitador: LimitadorTokenBucket = None, estricto: bool = False):
+        """
+        Ejecuta una consulta GAQL con `googleAds:searchStream` y entrega las filas una a una.
+        POST /customers/{customer_id}/googleAds:searchStream
+        
+        La respuesta es un array JSON de lotes ({"results": [...]}) que llega en chunks. Se
+        decodifica de forma incremental, por lo que la memoria usada no depende del número de
+        filas del informe y el proceso puede empezar antes de que termine la descarga.
+        
+        Args:
+            gaql (str): Consulta GAQL (sin LIMIT: searchStream no pagina).
+            limitador (LimitadorTokenBucket, opcional): Limitador adicional del que se toma un
+                token antes de la petición (p.ej. la cuota del developer token).
+            estricto (bool): Si es True, una petición fallida lanza ConnectionError en lugar de
+                terminar sin filas (para distinguir "sin datos" de "error").
+        
+        Yields:
+            dict: Cada fila aplanada y tipada con `tipar_fila`, p.ej.
+                {"campaign.id": 123, "campaign.name": "...", "metrics.clicks": 10, "segments.date": "2024-01-01"}
+        """
+        filas = self.stream(
+            "POST", f"customers/{self.customer_id}/googleAds:searchStream", "*.results.*",
+            json_data={"query": gaql}, limitador=limitador, estricto=estricto
+        )
+        for fila in filas:
+            yield tipar_fila(fila)
+
+    def search_stream_columnar(self, gaql: str, motor: str = "numpy", tamano_bloque: int = 65536):
+        """
+        Ejecuta `search_stream` y materializa las filas por columnas según llegan.
+        
+        Args:
+            gaql (str): Consulta GAQL. Sus columnas (y tipos) salen del SELECT.
+            motor (str): 'numpy' o 'arrow' (ver resultados_columnares.ConstructorColumnar).
+            tamano_bloque (int): Filas por bloque columnar.
+        
+        Returns:
+            ConstructorColumnar: Con las columnas del SELECT más 'customer_id', listo para
+            `a_numpy()`, `a_arrow()`, `agregar(...)` o `exportar_parquet(...)`.
+        """
+        from resultados_columnares import ConstructorColumnar
+        
+        constructor = ConstructorColumnar.desde_gaql(
+            gaql, extra=["customer_id"], motor=motor, tamano_bloque=tamano_bloque
+        )
+        for fila in self.search_stream(gaql):
+            fila["customer_id"] = self.customer_id
+            constructor.anadir(fila)
+        return constructor
+
+class EjecutorMultiCuenta:
+    """
+    Ejecuta una misma consulta GAQL en muchas cuentas de un MCC en paralelo.
+    
+    Cada cuenta se consulta en un hilo de un pool acotado (paginando con `pageToken`) y sus
+    filas se van mezclando en un único flujo, etiquetadas con `customer_id`. El tiempo total
+    depende de la cuenta más lenta y no del número de cuentas. Las peticiones de todas las
+    cuentas comparten el limitador del developer token, cuya cuota es global.
+    """
+    
+    def __init__(
+        self,
+        developer_token: str,
+        login_customer_id: str,
+        access_token: str,
+        max_concurrencia: int = 10,
+        qps_developer_token: float = None,
+        tamano_cola: int = 10000
+    ):
+        """
+        Args:
+            developer_token (str): Token de desarrollador de Google Ads.
+            login_customer_id (str): ID de la cuenta de administrador (MCC).
+            access_token (str | ProveedorTokenOAuth2): Token OAuth2 (Bearer token) o proveedor
+                que lo renueva; con muchas cuentas conviene el proveedor, compartido por todas.
+            max_concurrencia (int): Cuentas consultadas a la vez.
+            qps_developer_token (float, opcional): Peticiones/segundo máximas del developer token.
+                Si se omite se usa la configuración existente en `limitadores` para ese token.
+            tamano_cola (int): Filas en espera como máximo; si el consumidor va más lento,
+                los hilos se detienen hasta que haya sitio (memoria acotada).
+        """
+        self.developer_token = developer_token
+        self.login_customer_id = login_customer_id
+        self.access_token = access_token
+        self.max_concurrencia = max_concurrencia
+        self.tamano_cola = tamano_cola
+        
+        self.limitador = limitador_developer_token(developer_token, qps_developer_token)
+        
+        self.errores = {} # customer_id -> mensaje de la última ejecución
+    
+    def _conector(self, customer_id: str) -> GoogleAdsRestConnector:
+        return GoogleAdsRestConnector(
+            self.developer_token, customer_id, self.access_token, login_customer_id=self.login_customer_id
+        )
+    
+    def ejecutar(self, gaql: str, customer_ids: list):
+        """
+        Lanza la consulta en todas las cuentas y entrega las filas según llegan.
+        
+        Las cuentas que fallan no interrumpen al resto: su error queda en `self.errores`.
+        
+        Args:
+            gaql (str): Consulta GAQL.
+            customer_ids (list): Cuentas a consultar.
+        
+        Yields:
+            dict: Cada fila tipada (ver `tipar_fila`) con la clave adicional 'customer_id'.
+        """
+        customer_ids = list(dict.fromkeys(c.replace("-", "") for c in customer_ids))
+        self.errores = {}
+        cola = queue.Queue(maxsize=self.tamano_cola)
+        parar = threading.Event()
+        fin = object()
+        
+        def _poner(elemento) -> bool:
+            # put con espera acotada para poder abandonar si el consumidor ha dejado de leer
+            while not parar.is_set():
+                try:
+                    cola.put(elemento, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def _consultar_cuenta(customer_id: str):
+            try:
+                for fila in self._conector(customer_id).search(gaql, limitador=self.limitador):
+                    fila["customer_id"] = customer_id
+                    if not _poner(fila):
+                        return
+            except Exception as error:
+                self.errores[customer_id] = str(error)
+            finally:
+                _poner(fin)
+        
+        print(f"Consultando {len(customer_ids)} cuentas con hasta {self.max_concurrencia} en paralelo...")
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrencia, thread_name_prefix="google-ads-cuenta")
+        for customer_id in customer_ids:
+            executor.submit(_consultar_cuenta, customer_id)
+        
+        pendientes = len(customer_ids)
+        try:
+            while pendientes:
+                elemento = cola.get()
+                if elemento is fin:
+                    pendientes -= 1
+                else:
+                    yield elemento
+        finally:
+            parar.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        if self.errores:
+            print(f"{len(self.errores)} cuentas con errores: {', '.join(self.errores)}")
+
 if __name__ == "__main__":
+    import logging
+    # Los módulos de utilidades no configuran el logging: lo hacemos aquí para ver avisos y errores
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
     # --- ZONA DE MOCK/PRUEBA ---
     # En un entorno real, gestionarías el Refresh Token para obtener el Access Token
     
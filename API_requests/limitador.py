@@ -0,0 +1,324 @@
+"""
+Limitador de Peticiones por Host (Token Bucket Adaptativo)
+==========================================================
+
+Este módulo implementa un limitador de tipo "token bucket" compartido por host. Antes de
+enviar cada petición se adquiere un token; si no hay tokens disponibles se espera justo lo
+necesario para que se repongan.
+
+Solo se frenan los hosts con un límite declarado (`limitadores.configurar(...)` o el
+`LIMITE_TASA` de un conector). El resto tienen un limitador sin tasa que deja pasar todas
+las peticiones y únicamente aplica las pausas que pida el proveedor (`Retry-After`).
+
+La tasa no es fija: se adapta con la información que devuelve el proveedor.
+- `Retry-After` (429/503): se pausa el host durante el tiempo indicado.
+- `X-App-Usage` / `X-Business-Use-Case-Usage` (Meta): si el uso se acerca al límite se
+  reduce la tasa; si queda margen se aumenta poco a poco. Si Meta indica
+  `estimated_time_to_regain_access`, se pausa el host ese tiempo.
+- Sin cabeceras de uso: incremento aditivo en cada éxito y reducción a la mitad en cada 429
+  (AIMD), de modo que bajo carga sostenida se trabaja cerca del techo del proveedor.
+
+Es seguro entre hilos (`adquirir`) y desde corrutinas (`adquirir_async`).
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+def leer_retry_after(respuesta: requests.Response) -> Optional[float]:
+    """
+    Interpreta la cabecera Retry-After (segundos o fecha HTTP).
+
+    Returns:
+        float: Segundos a esperar, o None si la cabecera no existe o no es válida.
+    """
+    valor = respuesta.headers.get("Retry-After")
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = parsedate_to_datetime(valor)
+        return max(0.0, fecha.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def leer_uso_meta(respuesta: requests.Response) -> Tuple[Optional[float], float]:
+    """
+    Extrae el uso de cuota de las cabeceras de Meta Graph API.
+
+    Returns:
+        tuple: (uso_maximo, segundos_hasta_recuperar)
+            - uso_maximo (float o None): mayor porcentaje de uso reportado (0-100).
+            - segundos_hasta_recuperar (float): 0 si no hay bloqueo activo.
+    """
+    usos = []
+    espera = 0.0
+
+    cabecera_app = respuesta.headers.get("X-App-Usage")
+    if cabecera_app:
+        try:
+            datos = json.loads(cabecera_app)
+            usos.extend(float(v) for v in datos.values() if isinstance(v, (int, float)))
+        except ValueError:
+            logger.debug("Cabecera X-App-Usage no válida: %s", cabecera_app)
+
+    cabecera_buc = respuesta.headers.get("X-Business-Use-Case-Usage")
+    if cabecera_buc:
+        try:
+            # Formato: {"<business_id>": [{"type": ..., "call_count": ..., "estimated_time_to_regain_access": min}]}
+            for entradas in json.loads(cabecera_buc).values():
+                for entrada in entradas:
+                    for campo in ("call_count", "total_cputime", "total_time"):
+                        if isinstance(entrada.get(campo), (int, float)):
+                            usos.append(float(entrada[campo]))
+                    minutos = entrada.get("estimated_time_to_regain_access") or 0
+                    espera = max(espera, float(minutos) * 60)
+        except (ValueError, AttributeError):
+            logger.debug("Cabecera X-Business-Use-Case-Usage no válida: %s", cabecera_buc)
+
+    return (max(usos) if usos else None), espera
+
+
+class LimitadorTokenBucket:
+    """Token bucket thread-safe con tasa adaptativa."""
+
+    def __init__(
+        self,
+        tasa: Optional[float] = 10.0,
+        capacidad: Optional[float] = None,
+        tasa_minima: float = 0.2,
+        tasa_maxima: Optional[float] = None,
+        uso_objetivo: float = 80.0,
+        incremento: float = 0.5
+    ):
+        """
+        Args:
+            tasa (float, opcional): Peticiones por segundo iniciales. None = sin límite: no se
+                frena ninguna petición ni se adapta la tasa, pero se respetan las pausas.
+            capacidad (float, opcional): Ráfaga máxima de tokens acumulables (por defecto = tasa).
+            tasa_minima (float): Suelo de la tasa al reducirla.
+            tasa_maxima (float, opcional): Techo de la tasa al aumentarla (por defecto 10 x tasa).
+            uso_objetivo (float): Porcentaje de uso reportado por el proveedor a partir del cual se frena.
+            incremento (float): Peticiones/segundo que se suman tras cada respuesta con margen.
+        """
+        self.tasa = tasa
+        self.capacidad = capacidad if capacidad is not None else max(1.0, tasa or 1.0)
+        self.tasa_minima = tasa_minima
+        if tasa_maxima is None and tasa is not None:
+            tasa_maxima = tasa * 10
+        self.tasa_maxima = tasa_maxima
+        self.uso_objetivo = uso_objetivo
+        self.incremento = incremento
+
+        self._tokens = self.capacidad
+        self._ultima_recarga = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def _reservar(self) -> float:
+        """Intenta tomar un token. Devuelve 0 si lo consigue o los segundos que hay que esperar."""
+        with self._lock:
+            ahora = time.monotonic()
+            if ahora < self._pausa_hasta:
+                return self._pausa_hasta - ahora
+            if self.tasa is None:
+                return 0.0
+
+            self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultima_recarga) * self.tasa)
+            self._ultima_recarga = ahora
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.tasa
+
+    def adquirir(self, tiempo_maximo: Optional[float] = None) -> bool:
+        """
+        Bloquea el hilo actual hasta disponer de un token.
+
+        Args:
+            tiempo_maximo (float, opcional): Segundos máximos de espera. Si el token no estará
+                disponible antes, se devuelve False sin esperar en vano.
+
+        Returns:
+            bool: True si se obtuvo el token.
+        """
+        limite = None if tiempo_maximo is None else time.monotonic() + tiempo_maximo
+        espera = self._reservar()
+        while espera > 0:
+            if limite is not None and time.monotonic() + espera > limite:
+                return False
+            time.sleep(espera)
+            espera = self._reservar()
+        return True
+
+    async def adquirir_async(self):
+        """Igual que `adquirir` pero cediendo el control al event loop mientras espera."""
+        espera = self._reservar()
+        while espera > 0:
+            await asyncio.sleep(espera)
+            espera = self._reservar()
+
+    def pausar(self, segundos: float):
+        """Detiene el envío de peticiones al host durante `segundos` y vacía el cubo."""
+        with self._lock:
+            self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+            self._tokens = 0.0
+            self._ultima_recarga = self._pausa_hasta
+
+    def reconfigurar(self, **opciones):
+        """
+        Cambia los parámetros del limitador (mismos argumentos que el constructor) sin reponer
+        el cubo: los tokens ya gastados y las pausas en curso se conservan.
+        """
+        nuevo = LimitadorTokenBucket(**opciones)
+        with self._lock:
+            ahora = time.monotonic()
+            # Se contabiliza lo repuesto hasta ahora con la tasa anterior antes de cambiarla
+            if ahora > self._ultima_recarga and self.tasa is not None:
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultima_recarga) * self.tasa)
+                self._ultima_recarga = ahora
+            self.tasa = nuevo.tasa
+            self.capacidad = nuevo.capacidad
+            self.tasa_minima = nuevo.tasa_minima
+            self.tasa_maxima = nuevo.tasa_maxima
+            self.uso_objetivo = nuevo.uso_objetivo
+            self.incremento = nuevo.incremento
+            self._tokens = min(self._tokens, self.capacidad)
+
+    def _ajustar_tasa(self, factor: float = 1.0, incremento: float = 0.0) -> Optional[float]:
+        """Cambia la tasa a `tasa * factor + incremento` (leída y escrita bajo el lock) y la devuelve."""
+        with self._lock:
+            if self.tasa is not None:
+                self.tasa = min(self.tasa_maxima, max(self.tasa_minima, self.tasa * factor + incremento))
+            return self.tasa
+
+    def actualizar_desde_respuesta(self, respuesta: requests.Response, espera_por_defecto: float = 1.0):
+        """
+        Adapta la tasa según el código de estado y las cabeceras de la respuesta.
+
+        Args:
+            respuesta (requests.Response): Respuesta recibida del host.
+            espera_por_defecto (float): Pausa a aplicar ante un 429 sin cabecera Retry-After.
+        """
+        uso, espera_meta = leer_uso_meta(respuesta)
+
+        # Meta señala el bloqueo con 400 + cabeceras de uso al 100%, no siempre con 429
+        if respuesta.status_code == 429 or espera_meta > 0 or (uso is not None and uso >= 100):
+            retry_after = leer_retry_after(respuesta)
+            pausa = max(espera_meta, retry_after if retry_after is not None else espera_por_defecto)
+            tasa = self._ajustar_tasa(factor=0.5)
+            self.pausar(pausa)
+            logger.warning(
+                "Límite de peticiones alcanzado en el host. Pausa de %.1fs, nueva tasa %s req/s",
+                pausa, "sin límite" if tasa is None else f"{tasa:.2f}"
+            )
+            return
+
+        if respuesta.status_code == 503:
+            retry_after = leer_retry_after(respuesta)
+            if retry_after is not None:
+                self.pausar(retry_after)
+            return
+
+        if respuesta.status_code >= 400:
+            return
+
+        if uso is not None and uso >= self.uso_objetivo:
+            # Frenamos en proporción a lo que nos hemos pasado del objetivo
+            self._ajustar_tasa(factor=self.uso_objetivo / max(uso, 1.0))
+        else:
+            self._ajustar_tasa(incremento=self.incremento)
+
+
+class RegistroLimitadores:
+    """Registro thread-safe de limitadores, uno por clave (normalmente el host)."""
+
+    def __init__(self, tasa_por_defecto: Optional[float] = None):
+        """
+        Args:
+            tasa_por_defecto (float, opcional): Tasa de las claves sin configuración propia. Con
+                None (por defecto) esas claves no se frenan; solo respetan las pausas del proveedor.
+        """
+        self.tasa_por_defecto = tasa_por_defecto
+        self._configuraciones: Dict[str, dict] = {}
+        self._limitadores: Dict[str, LimitadorTokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def configurar(self, clave: str, **opciones):
+        """
+        Define los parámetros del limitador de una clave (ver LimitadorTokenBucket).
+        Ejemplo: registro.configurar("graph.facebook.com", tasa=50, tasa_maxima=200)
+        """
+        with self._lock:
+            self._configuraciones[clave] = opciones
+            self._limitadores[clave] = LimitadorTokenBucket(**opciones)
+
+    def configurar_por_defecto(self, clave: str, **opciones):
+        """
+        Como `configurar`, pero solo si la clave no tiene ya una configuración propia. Lo usan
+        los conectores para declarar los límites conocidos de su API sin pisar los del usuario.
+        """
+        with self._lock:
+            if clave in self._configuraciones:
+                return
+            self._configuraciones[clave] = opciones
+            self._limitadores[clave] = LimitadorTokenBucket(**opciones)
+
+    def ajustar(self, clave: str, **opciones):
+        """
+        Como `configurar`, pero sin efecto si la clave ya tiene exactamente esas opciones, y si
+        cambian se reconfigura el limitador existente conservando los tokens ya gastados.
+        Es la forma de fijar una cuota desde código que se ejecuta repetidamente: `configurar`
+        crearía cada vez un cubo lleno y permitiría una ráfaga por encima de la cuota.
+        """
+        with self._lock:
+            if self._configuraciones.get(clave) == opciones:
+                return
+            self._configuraciones[clave] = opciones
+            limitador = self._limitadores.get(clave)
+            if limitador is None:
+                self._limitadores[clave] = LimitadorTokenBucket(**opciones)
+                return
+        limitador.reconfigurar(**opciones)
+
+    def obtener(self, clave: str) -> LimitadorTokenBucket:
+        """Devuelve el limitador de la clave, creándolo con la configuración por defecto si no existe."""
+        with self._lock:
+            limitador = self._limitadores.get(clave)
+            if limitador is None:
+                opciones = self._configuraciones.get(clave, {"tasa": self.tasa_por_defecto})
+                limitador = LimitadorTokenBucket(**opciones)
+                self._limitadores[clave] = limitador
+            return limitador
+
+
+# Registro compartido por todo el proceso (lo usa realizar_peticion_segura)
+limitadores = RegistroLimitadores()
+
+
+def obtener_limitador(url: str) -> LimitadorTokenBucket:
+    """Devuelve el limitador compartido del host de la URL."""
+    return limitadores.obtener(urlsplit(url).hostname or url)
+
+
+if __name__ == "__main__":
+    limitador = LimitadorTokenBucket(tasa=5, capacidad=1)
+    inicio = time.perf_counter()
+    for _ in range(10):
+        limitador.adquirir()
+    print(f"10 tokens a 5 req/s en {time.perf_counter() - inicio:.2f}s (esperado ~1.8s)")
@@ -13,41 +13,72 @@ Requisitos previos:
 """
 
 from utils_requests import realizar_peticion_segura # Importamos nuestra utilidad
+from cache_http import CacheHTTP
+from conector_base import ApiKeyParametro, BaseConnector, PaginacionNextLink, dividir_en_lotes
+from sincronizacion import AlmacenEstado, EscritorDataset, huella
+from tokens_oauth2 import resolver_token
 import json
+from datetime import datetime, timezone
+from urllib.parse import urlencode
 
-class MetaGraphConnector:
+
+def _a_timestamp(valor):
+    """
+    Convierte un límite temporal a timestamp Unix (float).
+    Acepta datetime, números (timestamp) o cadenas ISO 8601 / formato de Graph ('2024-01-01T00:00:00+0000').
+    """
+    if valor is None or isinstance(valor, (int, float)):
+        return valor
+    if isinstance(valor, str):
+        try:
+            valor = datetime.strptime(valor, "%Y-%m-%dT%H:%M:%S%z")
+        except ValueError:
+            valor = datetime.fromisoformat(valor)
+    return valor.timestamp()
+
+
+class MetaGraphConnector(BaseConnector):
     """Clase para encapsular la lógica de conexión con Meta."""
     
     BASE_URL = "https://graph.facebook.com/v19.0" # Comprueba siempre la versión más reciente
+    # Las aristas (posts, comments...) se paginan con la URL completa de `paging.next`
+    PAGINACION = PaginacionNextLink(ruta_elementos="data", ruta_enlace="paging.next")
     
-    def __init__(self, access_token: str):
+    CAMPOS_INFO_PAGINA = "id,name,username,followers_count,verification_status"
+    MAXIMO_LOTE = 50 # Límite de sub-peticiones por llamada batch (y de IDs por consulta ?ids=)
+    CAMPOS_POSTS = "id,message,created_time,type,permalink_url"
+    
+    def __init__(self, access_token: str, cache: CacheHTTP = None):
         """
         Inicializa el conector.
         
         Args:
-            access_token (str): Token de acceso válido obtenido desde Meta Developers.
+            access_token (str | ProveedorTokenOAuth2): Token de acceso válido obtenido desde Meta
+                Developers, o un proveedor con `obtener_token()` que lo renueva (ver `tokens_oauth2`).
+            cache (CacheHTTP, opcional): Caché para las consultas GET (info de página, posts).
         """
-        self.access_token = access_token
+        # Graph acepta el token como parámetro `access_token` en cualquier método
+        super().__init__(ApiKeyParametro(access_token, "access_token"), cache=cache)
+
+    @property
+    def access_token(self) -> str:
+        """Token vigente (si se pasó un proveedor, se le pide en cada petición)."""
+        return resolver_token(self.autenticacion.credencial)
     
+    def _peticion_info_pagina(self, page_id: str) -> dict:
+        """
+        Construye la petición (argumentos de realizar_peticion_segura) para la info de una página.
+        """
+        # Parámetros que queremos recibir (fields)
+        return self.construir_peticion("GET", page_id, params={"fields": self.CAMPOS_INFO_PAGINA})
+
     def obtener_info_pagina(self, page_id: str):
         """
         Obtiene información básica de una página de Facebook.
         """
-        endpoint = f"{self.BASE_URL}/{page_id}"
-        
-        # Parámetros que queremos recibir (fields)
-        parametros = {
-            "access_token": self.access_token,
-            "fields": "id,name,username,followers_count,verification_status"
-        }
-        
         print(f"Consultando información para la página: {page_id}")
         
-        respuesta = realizar_peticion_segura(
-            metodo="GET",
-            url=endpoint,
-            params=parametros
-        )
+        respuesta = realizar_peticion_segura(**self._peticion_info_pagina(page_id))
         
         if respuesta:
             data = respuesta.json()
@@ -56,21 +87,150 @@ class MetaGraphConnector:
             print("No se pudo obtener la información de la página.")
             return None
 
-    def obtener_posts_pagina(self, page_id: str, limite: int = 5):
+    async def obtener_info_pagina_async(self, page_id: str):
         """
-        Obtiene los últimos posts publicados en la página.
+        Versión asíncrona de `obtener_info_pagina`.
+        Permite lanzar varias consultas a la vez con asyncio.gather.
+        """
+        respuesta = await self.peticion_async("GET", page_id, params={"fields": self.CAMPOS_INFO_PAGINA})
+        
+        if respuesta:
+            return respuesta.json()
+        return None
+
+    async def iterar_info_paginas_async(self, page_ids: list, max_concurrencia: int = 10):
         """
-        endpoint = f"{self.BASE_URL}/{page_id}/posts"
+        Consulta la información de muchas páginas en paralelo.
+        
+        Yields:
+            tuple: (page_id, info) según van terminando las peticiones. `info` es None si falló.
+        """
+        peticiones = [self._peticion_info_pagina(page_id) for page_id in page_ids]
+        
+        async for indice, respuesta in self.en_paralelo_async(peticiones, max_concurrencia):
+            yield page_ids[indice], (respuesta.json() if respuesta else None)
+
+    def _peticion_multi_id(self, page_ids: list, fields: str) -> dict:
+        """
+        Petición de búsqueda múltiple: GET /?ids=a,b,c devuelve {id: objeto} en una sola llamada.
+        Es la opción más barata, pero si un solo ID no es válido falla la consulta entera.
+        """
+        return self.construir_peticion("GET", "", params={"ids": ",".join(page_ids), "fields": fields})
+
+    def _peticion_batch(self, page_ids: list, fields: str) -> dict:
+        """
+        Petición batch: POST con el parámetro `batch` (hasta 50 sub-peticiones). Cada
+        sub-petición tiene su propio código y cuerpo, por lo que los errores son por elemento.
+        """
+        lote = [
+            {"method": "GET", "relative_url": f"{page_id}?{urlencode({'fields': fields})}"}
+            for page_id in page_ids
+        ]
+        datos = {
+            "batch": json.dumps(lote),
+            "include_headers": "false"
+        }
+        return self.construir_peticion("POST", "", data=datos)
+
+    @staticmethod
+    def _desempaquetar_batch(page_ids: list, respuesta) -> dict:
+        """
+        Convierte la respuesta de una llamada batch en {page_id: info}. Los elementos con error
+        se devuelven como {"error": {...}} (igual que los devuelve Graph) y los que Meta no llegó
+        a procesar (null en la respuesta) con un error de código 0.
+        """
+        try:
+            elementos = respuesta.json() if respuesta else None
+        except ValueError:
+            elementos = None
+        if not isinstance(elementos, list):
+            error = {"error": {"message": "La llamada batch falló", "code": 0}}
+            return {page_id: error for page_id in page_ids}
+
+        resultados = {}
+        for page_id, elemento in zip(page_ids, elementos):
+            if not elemento:
+                resultados[page_id] = {"error": {"message": "Sin respuesta en el lote (timeout)", "code": 0}}
+                continue
+            try:
+                cuerpo = json.loads(elemento.get("body") or "null")
+            except ValueError:
+                cuerpo = None
+            if elemento.get("code") == 200 and isinstance(cuerpo, dict):
+                resultados[page_id] = cuerpo
+            elif isinstance(cuerpo, dict) and "error" in cuerpo:
+                resultados[page_id] = cuerpo
+            else:
+                resultados[page_id] = {"error": {"message": f"HTTP {elemento.get('code')}", "code": elemento.get("code")}}
+        return resultados
+
+    def obtener_info_paginas(
+        self,
+        page_ids: list,
+        fields: str = None,
+        max_concurrencia: int = 4,
+        usar_multi_id: bool = True
+    ) -> dict:
+        """
+        Obtiene la información de muchas páginas con pocas llamadas HTTP.
+        
+        Los IDs se agrupan en bloques de 50 que se envían en paralelo. Cada bloque se intenta
+        primero como búsqueda `?ids=` (una llamada GET, cacheable); si falla (p.ej. porque uno
+        de los IDs no existe) se repite como llamada `batch`, que aísla el error en su elemento.
+        
+        Args:
+            page_ids (list): IDs o nombres de usuario de las páginas.
+            fields (str, opcional): Campos a pedir (por defecto CAMPOS_INFO_PAGINA).
+            max_concurrencia (int): Bloques en vuelo simultáneamente.
+            usar_multi_id (bool): Si es False se usa directamente la llamada batch.
         
+        Returns:
+            dict: {page_id: info}. Las páginas que fallan aparecen como {"error": {...}}.
+        """
+        fields = fields or self.CAMPOS_INFO_PAGINA
+        page_ids = list(dict.fromkeys(str(page_id) for page_id in page_ids))
+        bloques = dividir_en_lotes(page_ids, self.MAXIMO_LOTE)
+        
+        print(f"Consultando información de {len(page_ids)} páginas en {len(bloques)} bloques")
+        
+        resultados = {}
+        pendientes = bloques
+        
+        if usar_multi_id:
+            peticiones = [self._peticion_multi_id(bloque, fields) for bloque in bloques]
+            pendientes = []
+            for indice, respuesta in self.en_paralelo(peticiones, max_concurrencia):
+                datos = respuesta.json() if respuesta else None
+                if isinstance(datos, dict) and all(page_id in datos for page_id in bloques[indice]):
+                    resultados.update((page_id, datos[page_id]) for page_id in bloques[indice])
+                else:
+                    pendientes.append(bloques[indice])
+        
+        peticiones = [self._peticion_batch(bloque, fields) for bloque in pendientes]
+        for indice, respuesta in self.en_paralelo(peticiones, max_concurrencia):
+            resultados.update(self._desempaquetar_batch(pendientes[indice], respuesta))
+        
+        # Mismo orden que la lista de entrada
+        return {page_id: resultados[page_id] for page_id in page_ids}
+
+    def obtener_posts_pagina(self, page_id: str, limite: int = 5, streaming: bool = False):
+        """
+        Obtiene los últimos posts publicados en la página.
+        
+        Si `streaming` es True devuelve un generador que decodifica los posts uno a uno según
+        llegan de la red, útil con límites altos o muchos campos (memoria constante).
+        """
         parametros = {
-            "access_token": self.access_token,
-            "fields": "id,message,created_time,type,permalink_url",
+            "fields": self.CAMPOS_POSTS,
             "limit": limite
         }
         
         print(f"Consultando últimos {limite} posts para la página: {page_id}")
         
-        respuesta = realizar_peticion_segura("GET", endpoint, params=parametros)
+        if streaming:
+            return self.stream("GET", f"{page_id}/posts", "data.*", params=parametros)
+        
+        respuesta = self.peticion("GET", f"{page_id}/posts", params=parametros)
         
         if respuesta:
             data = respuesta.json()
@@ -79,7 +239,127 @@ class MetaGraphConnector:
         else:
             return []
 
+    def iterar_posts(self, page_id: str, desde=None, hasta=None, tamano_pagina: int = 100, estricto: bool = False):
+        """
+        Generador que recorre todo el historial de posts de la página siguiendo `paging.next`.
+        
+        Mientras el llamador procesa una página, la siguiente se descarga en segundo plano, de
+        modo que el tiempo de red se solapa con el de proceso (ver `BaseConnector.paginar`). En
+        memoria solo hay como mucho dos páginas a la vez, sea cual sea la longitud del historial.
+        
+        Args:
+            page_id (str): ID de la página.
+            desde (datetime | float | str, opcional): Solo posts publicados a partir de este momento.
+            hasta (datetime | float | str, opcional): Solo posts publicados hasta este momento.
+            tamano_pagina (int): Posts por petición (parámetro `limit` de Graph).
+            estricto (bool): Si es True, una página que no se puede descargar lanza ConnectionError
+                en lugar de terminar el recorrido en silencio (útil para saber si se completó).
+        
+        Yields:
+            dict: Cada post, del más reciente al más antiguo.
+        """
+        limite_inferior = _a_timestamp(desde)
+        limite_superior = _a_timestamp(hasta)
+        
+        parametros = {
+            "fields": self.CAMPOS_POSTS,
+            "limit": tamano_pagina
+        }
+        # Graph filtra por since/until, pero además cortamos nosotros: los posts llegan del más
+        # reciente al más antiguo, así que el primero anterior a `desde` marca el final
+        if limite_inferior is not None:
+            parametros["since"] = int(limite_inferior)
+        if limite_superior is not None:
+            parametros["until"] = int(limite_superior)
+        
+        # Al salir del bucle antes de tiempo, el generador de páginas cancela el prefetch pendiente
+        for post in self.paginar("GET", f"{page_id}/posts", params=parametros, estricto=estricto):
+            publicado = _a_timestamp(post.get("created_time"))
+            if publicado is not None:
+                if limite_superior is not None and publicado > limite_superior:
+                    continue
+                if limite_inferior is not None and publicado < limite_inferior:
+                    return
+            yield post
+
+    def sincronizar_posts(
+        self,
+        page_id: str,
+        almacen: AlmacenEstado,
+        directorio: str,
+        ventana_revision_horas: float = 72,
+        formato: str = "jsonl"
+    ) -> dict:
+        """
+        Sincronización incremental de los posts de una página.
+        
+        Solo se piden a Graph los posts posteriores a la marca de agua guardada (el último
+        `created_time` visto) menos una ventana de revisión, en la que se vuelven a comprobar
+        los posts recientes por si se han editado. Se escriben en el dataset los posts nuevos y
+        los que han cambiado (comparando su huella con la de la ejecución anterior).
+        
+        La marca solo avanza si el recorrido termina sin errores; si se interrumpe, la siguiente
+        ejecución retoma desde la marca anterior.
+        
+        Args:
+            page_id (str): ID de la página.
+            almacen (AlmacenEstado): Estado local (marcas de agua y huellas).
+            directorio (str): Carpeta del dataset de salida (fichero `posts_<page_id>`).
+            ventana_revision_horas (float): Horas anteriores a la marca que se vuelven a revisar.
+            formato (str): 'jsonl' o 'parquet'.
+        
+        Returns:
+            dict: Resumen con 'nuevos', 'actualizados', 'completado' y la 'marca' resultante.
+        """
+        fuente = "meta_posts"
+        marca = almacen.obtener_marca(fuente, page_id)
+        desde = _a_timestamp(marca) - ventana_revision_horas * 3600 if marca else None
+        huellas_previas = almacen.huellas(fuente, page_id)
+        
+        print(f"Sincronizando posts de {page_id} desde {marca or 'el inicio'}")
+        
+        sincronizado_en = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        columnas = self.CAMPOS_POSTS.split(",") + ["_page_id", "_sincronizado_en"]
+        resumen = {"nuevos": 0, "actualizados": 0, "completado": False, "marca": marca}
+        marca_maxima = _a_timestamp(marca)
+        cambios = []
+        
+        try:
+            with EscritorDataset(directorio, f"posts_{page_id}", formato, columnas) as escritor:
+                for post in self.iterar_posts(page_id, desde=desde, estricto=True):
+                    valor = huella(post)
+                    anterior = huellas_previas.get(post["id"])
+                    if anterior == valor:
+                        continue
+                    
+                    escritor.escribir({**post, "_page_id": page_id, "_sincronizado_en": sincronizado_en})
+                    resumen["actualizados" if anterior else "nuevos"] += 1
+                    
+                    publicado = _a_timestamp(post.get("created_time"))
+                    cambios.append((post["id"], valor, publicado))
+                    if publicado is not None and (marca_maxima is None or publicado > marca_maxima):
+                        marca_maxima = publicado
+                        resumen["marca"] = post["created_time"]
+            resumen["completado"] = True
+        except ConnectionError as error:
+            print(f"Sincronización de {page_id} interrumpida: {error}. La marca de agua no avanza.")
+        finally:
+            # Las huellas de lo ya escrito se guardan siempre, para no repetirlo al reintentar
+            almacen.guardar_huellas(fuente, page_id, cambios)
+        
+        if resumen["completado"] and resumen["marca"]:
+            almacen.guardar_marca(fuente, page_id, resumen["marca"])
+            # Las huellas anteriores a la próxima ventana de revisión ya no se necesitan
+            almacen.podar_huellas(fuente, page_id, marca_maxima - ventana_revision_horas * 3600)
+        
+        print(f"Posts nuevos: {resumen['nuevos']}, actualizados: {resumen['actualizados']}")
+        return resumen
+
 if __name__ == "__main__":
+    import logging
+    # Los módulos de utilidades no configuran el logging: lo hacemos aquí para ver avisos y errores
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
     # --- ZONA DE CONFIGURACIÓN ---
     # PARA PROBAR ESTO NECESITAS UN TOKEN REAL
     # Puedes obtener uno temporal en: https://developers.facebook.com/tools/explorer/
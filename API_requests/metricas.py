@@ -0,0 +1,298 @@
+"""
+Métricas de Peticiones HTTP por Endpoint
+========================================
+
+Registro en memoria de lo que ocurre en `realizar_peticion_segura`, agrupado por host y
+endpoint (ruta con los identificadores normalizados, p.ej. 'graph.facebook.com/v19.0/{id}/posts'):
+
+- Histogramas de latencia por intento (buckets estilo Prometheus).
+- Contadores de peticiones, intentos, reintentos, códigos de estado, errores de red,
+  bytes enviados/recibidos y transiciones de los circuit breakers.
+- Ventana de las últimas N latencias por endpoint para consultar percentiles recientes
+  (p50, p95, p99...). Se usa también para decidir el hedging.
+
+Todo se puede exportar en formato de texto de Prometheus a un fichero local (p.ej. para el
+textfile collector de node_exporter) o enviarse a un Pushgateway, bajo demanda o de forma
+periódica en un hilo de fondo.
+
+Uso típico:
+    from metricas import registro_metricas
+    print(registro_metricas.latencias.percentil("graph.facebook.com/v19.0/{id}/posts", 99))
+    registro_metricas.exportar_a_fichero("/var/lib/node_exporter/api_requests.prom")
+"""
+
+import logging
+import os
+import re
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Segmentos de ruta que son identificadores (IDs de página, customer IDs, GUIDs...)
+_PATRON_ID = re.compile(r"^(?=(?:.*\d){4})[\w.:-]+$")
+
+
+def endpoint_de(url: str) -> str:
+    """
+    Normaliza una URL a su endpoint: host + ruta con los segmentos-identificador como '{id}'.
+
+    Ejemplo:
+        'https://graph.facebook.com/v19.0/1234567/posts?limit=5' -> 'graph.facebook.com/v19.0/{id}/posts'
+    """
+    partes = urlsplit(url)
+    segmentos = []
+    for segmento in partes.path.split("/"):
+        if _PATRON_ID.match(segmento):
+            segmento = "{id}"
+        segmentos.append(segmento)
+    return f"{partes.hostname}{'/'.join(segmentos)}"
+
+
+class RegistroLatencias:
+    """Ventana deslizante de latencias por endpoint con cálculo de percentiles (thread-safe)."""
+
+    def __init__(self, muestras_por_endpoint: int = 512, minimo_muestras: int = 20):
+        """
+        Args:
+            muestras_por_endpoint (int): Tamaño de la ventana de muestras recientes por endpoint.
+            minimo_muestras (int): Muestras necesarias antes de devolver percentiles fiables.
+        """
+        self.muestras_por_endpoint = muestras_por_endpoint
+        self.minimo_muestras = minimo_muestras
+        self._muestras: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, endpoint: str, segundos: float):
+        """Añade una muestra de latencia (en segundos) al endpoint."""
+        with self._lock:
+            muestras = self._muestras.get(endpoint)
+            if muestras is None:
+                muestras = deque(maxlen=self.muestras_por_endpoint)
+                self._muestras[endpoint] = muestras
+            muestras.append(segundos)
+
+    def percentil(self, endpoint: str, p: float) -> Optional[float]:
+        """
+        Percentil `p` (0-100) de las latencias recientes del endpoint.
+
+        Returns:
+            float: Latencia en segundos, o None si aún no hay suficientes muestras.
+        """
+        with self._lock:
+            muestras = self._muestras.get(endpoint)
+            if not muestras or len(muestras) < self.minimo_muestras:
+                return None
+            ordenadas = sorted(muestras)
+        indice = min(len(ordenadas) - 1, int(round(p / 100 * (len(ordenadas) - 1))))
+        return ordenadas[indice]
+
+    def resumen(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """p50, p95 y p99 de cada endpoint con muestras suficientes."""
+        with self._lock:
+            endpoints = list(self._muestras)
+        return {
+            endpoint: {f"p{p}": self.percentil(endpoint, p) for p in (50, 95, 99)}
+            for endpoint in endpoints
+        }
+
+
+# Límites superiores (segundos) de los buckets del histograma de latencia
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PREFIJO = "api_requests"
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(nombres: Tuple[str, ...], valores: Tuple[str, ...]) -> str:
+    return ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores))
+
+
+class RegistroMetricas:
+    """Contadores, histogramas y percentiles de las peticiones HTTP (thread-safe)."""
+
+    # Nombre -> (etiquetas, descripción)
+    CONTADORES = {
+        "peticiones_total": (("host", "endpoint", "metodo"), "Llamadas a realizar_peticion_segura que salen a la red."),
+        "intentos_total": (("host", "endpoint"), "Intentos HTTP enviados (incluye reintentos y hedging)."),
+        "reintentos_total": (("host", "endpoint"), "Intentos repetidos tras un fallo."),
+        "respuestas_total": (("host", "endpoint", "codigo"), "Respuestas recibidas por código de estado."),
+        "errores_total": (("host", "endpoint", "tipo"), "Intentos fallidos sin respuesta (timeout, conexion, otro)."),
+        "bytes_recibidos_total": (("host", "endpoint"), "Bytes del cuerpo de las respuestas."),
+        "bytes_enviados_total": (("host", "endpoint"), "Bytes del cuerpo de las peticiones."),
+        "transiciones_circuito_total": (("host", "estado"), "Cambios de estado de los circuit breakers."),
+    }
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS_LATENCIA):
+        self.buckets = tuple(sorted(buckets))
+        self.latencias = RegistroLatencias()
+        self._contadores: Dict[str, Dict[tuple, float]] = {nombre: {} for nombre in self.CONTADORES}
+        # (host, endpoint) -> [cuentas por bucket..., +Inf, suma]
+        self._histogramas: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        self._hilo_exportacion: Optional[threading.Thread] = None
+        self._detener_exportacion = threading.Event()
+
+    # --- Registro ---
+
+    def incrementar(self, nombre: str, etiquetas: tuple, valor: float = 1):
+        """Suma `valor` al contador `nombre` con las etiquetas dadas (en el orden de CONTADORES)."""
+        with self._lock:
+            serie = self._contadores[nombre]
+            serie[etiquetas] = serie.get(etiquetas, 0) + valor
+
+    def observar_latencia(self, host: str, endpoint: str, segundos: float):
+        """Añade una latencia al histograma del endpoint y a su ventana de percentiles."""
+        with self._lock:
+            histograma = self._histogramas.get((host, endpoint))
+            if histograma is None:
+                histograma = [0] * (len(self.buckets) + 1) + [0.0]
+                self._histogramas[(host, endpoint)] = histograma
+            for i, limite in enumerate(self.buckets):
+                if segundos <= limite:
+                    histograma[i] += 1
+                    break
+            else:
+                histograma[len(self.buckets)] += 1
+            histograma[-1] += segundos
+        self.latencias.registrar(endpoint, segundos)
+
+    def registrar_respuesta(
+        self, url: str, endpoint: str, respuesta: requests.Response, segundos: float, streaming: bool = False
+    ):
+        """Registra un intento que obtuvo respuesta: latencia, código y bytes transferidos."""
+        host = urlsplit(url).hostname or ""
+        self.observar_latencia(host, endpoint, segundos)
+        self.incrementar("intentos_total", (host, endpoint))
+        self.incrementar("respuestas_total", (host, endpoint, str(respuesta.status_code)))
+
+        # En modo streaming el cuerpo aún no se ha leído: usamos Content-Length si existe
+        if streaming:
+            recibidos = int(respuesta.headers.get("Content-Length") or 0)
+        else:
+            recibidos = len(respuesta.content or b"")
+        cuerpo = respuesta.request.body if respuesta.request is not None else None
+        enviados = len(cuerpo.encode("utf-8") if isinstance(cuerpo, str) else (cuerpo or b""))
+        self.incrementar("bytes_recibidos_total", (host, endpoint), recibidos)
+        self.incrementar("bytes_enviados_total", (host, endpoint), enviados)
+
+    def registrar_error(self, url: str, endpoint: str, tipo: str):
+        """Registra un intento sin respuesta ('timeout', 'conexion' u 'otro')."""
+        host = urlsplit(url).hostname or ""
+        self.incrementar("intentos_total", (host, endpoint))
+        self.incrementar("errores_total", (host, endpoint, tipo))
+
+    def registrar_transicion_circuito(self, host: str, anterior: str, nuevo: str):
+        """Callback compatible con `circuit_breaker.RegistroCircuitos.al_cambiar_estado`."""
+        self.incrementar("transiciones_circuito_total", (host, nuevo))
+
+    # --- Consulta ---
+
+    def valor(self, nombre: str, etiquetas: tuple) -> float:
+        """Valor actual de un contador."""
+        with self._lock:
+            return self._contadores[nombre].get(etiquetas, 0)
+
+    def total(self, nombre: str) -> float:
+        """Suma de un contador en todas sus combinaciones de etiquetas."""
+        with self._lock:
+            return sum(self._contadores[nombre].values())
+
+    def reiniciar(self):
+        """Pone a cero todos los contadores, histogramas y ventanas de latencia."""
+        with self._lock:
+            self._contadores = {nombre: {} for nombre in self.CONTADORES}
+            self._histogramas = {}
+        self.latencias = RegistroLatencias(self.latencias.muestras_por_endpoint, self.latencias.minimo_muestras)
+
+    # --- Exportación ---
+
+    def exportar_prometheus(self) -> str:
+        """Devuelve todas las métricas en formato de texto de Prometheus (versión 0.0.4)."""
+        with self._lock:
+            contadores = {nombre: dict(serie) for nombre, serie in self._contadores.items()}
+            histogramas = {clave: list(valores) for clave, valores in self._histogramas.items()}
+
+        lineas = []
+        for nombre, (etiquetas, descripcion) in self.CONTADORES.items():
+            metrica = f"{PREFIJO}_{nombre}"
+            lineas.append(f"# HELP {metrica} {descripcion}")
+            lineas.append(f"# TYPE {metrica} counter")
+            for valores, total in sorted(contadores[nombre].items()):
+                lineas.append(f"{metrica}{{{_etiquetas(etiquetas, valores)}}} {total:g}")
+
+        metrica = f"{PREFIJO}_latencia_segundos"
+        lineas.append(f"# HELP {metrica} Latencia de cada intento HTTP.")
+        lineas.append(f"# TYPE {metrica} histogram")
+        for (host, endpoint), valores in sorted(histogramas.items()):
+            base = _etiquetas(("host", "endpoint"), (host, endpoint))
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets + (float("inf"),), valores[:-1]):
+                acumulado += cuenta
+                le = "+Inf" if limite == float("inf") else f"{limite:g}"
+                lineas.append(f'{metrica}_bucket{{{base},le="{le}"}} {acumulado}')
+            lineas.append(f"{metrica}_sum{{{base}}} {valores[-1]:.6f}")
+            lineas.append(f"{metrica}_count{{{base}}} {acumulado}")
+
+        return "\n".join(lineas) + "\n"
+
+    def exportar_a_fichero(self, ruta: str):
+        """Escribe las métricas en `ruta` de forma atómica (el lector nunca ve un fichero a medias)."""
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(self.exportar_prometheus())
+        os.replace(temporal, ruta)
+
+    def enviar_a_pushgateway(self, url_base: str, job: str = "api_requests", timeout: float = 10):
+        """
+        Envía las métricas a un Prometheus Pushgateway (PUT /metrics/job/<job>).
+        Se usa `requests` directamente para no contaminar las métricas con su propia petición.
+        """
+        respuesta = requests.put(
+            f"{url_base.rstrip('/')}/metrics/job/{job}",
+            data=self.exportar_prometheus().encode("utf-8"),
+            headers={"Content-Type": "text/plain; version=0.0.4"},
+            timeout=timeout
+        )
+        respuesta.raise_for_status()
+
+    def iniciar_exportacion_periodica(
+        self,
+        intervalo: float = 15.0,
+        ruta_fichero: Optional[str] = None,
+        url_pushgateway: Optional[str] = None
+    ):
+        """
+        Lanza un hilo de fondo que exporta las métricas cada `intervalo` segundos al fichero
+        y/o al Pushgateway indicados. Se detiene con `detener_exportacion_periodica`.
+        """
+        if self._hilo_exportacion is not None and self._hilo_exportacion.is_alive():
+            return
+        self._detener_exportacion.clear()
+
+        def _bucle():
+            while not self._detener_exportacion.wait(intervalo):
+                try:
+                    if ruta_fichero:
+                        self.exportar_a_fichero(ruta_fichero)
+                    if url_pushgateway:
+                        self.enviar_a_pushgateway(url_pushgateway)
+                except (OSError, requests.exceptions.RequestException) as err:
+                    logger.warning("No se pudieron exportar las métricas: %s", err)
+
+        self._hilo_exportacion = threading.Thread(target=_bucle, name="exportacion-metricas", daemon=True)
+        self._hilo_exportacion.start()
+
+    def detener_exportacion_periodica(self):
+        self._detener_exportacion.set()
+
+
+# Registro compartido por todo el proceso (lo alimenta realizar_peticion_segura)
+registro_metricas = RegistroMetricas()
@@ -0,0 +1,162 @@
+"""
+Motor de Peticiones Concurrentes (asyncio)
+==========================================
+
+Contraparte asíncrona de `realizar_peticion_segura`. Permite lanzar cientos o miles de
+peticiones a la vez y procesar los resultados en el orden en que van terminando, de modo
+que un fan-out tarda aproximadamente lo que la llamada más lenta y no la suma de todas.
+
+Cada petición se ejecuta con `realizar_peticion_segura` dentro de un pool de hilos, por lo
+que conserva exactamente la misma semántica de reintentos, backoff exponencial, logging y
+manejo de errores (devuelve None si la petición falla), y reutiliza las sesiones keep-alive
+de `sesiones_http.py`. Con `deduplicar=True`, los GET idénticos lanzados a la vez desde varias
+tareas se agrupan en el propio event loop (single-flight), sin ocupar un hilo por cada duplicado.
+
+Uso típico:
+    async for indice, respuesta in realizar_peticiones_concurrentes(peticiones, max_concurrencia=20):
+        ...
+
+Desde código síncrono (sin event loop) se puede usar la variante con hilos:
+    for indice, respuesta in realizar_peticiones_en_hilos(peticiones, max_concurrencia=20):
+        ...
+"""
+
+import asyncio
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+from utils_requests import realizar_peticion_segura
+from single_flight import clave_peticion, grupo_peticiones
+
+
+async def realizar_peticion_async(
+    metodo: str,
+    url: str,
+    executor: Optional[Executor] = None,
+    **kwargs: Any
+) -> Optional[requests.Response]:
+    """
+    Versión awaitable de `realizar_peticion_segura`.
+
+    Args:
+        metodo (str): Método HTTP ('GET', 'POST', ...).
+        url (str): URL endpoint de la API.
+        executor (Executor, opcional): Pool donde ejecutar la petición. Si se omite se usa
+            el executor por defecto del event loop.
+        **kwargs: Resto de argumentos de `realizar_peticion_segura` (headers, params, json_data...).
+
+    Returns:
+        requests.Response o None: Igual que `realizar_peticion_segura`.
+    """
+    loop = asyncio.get_running_loop()
+    llamada = functools.partial(realizar_peticion_segura, metodo, url, **kwargs)
+    
+    es_deduplicable = (
+        metodo.upper() == "GET" and kwargs.get("deduplicar", False)
+        and kwargs.get("data") is None and kwargs.get("json_data") is None
+        and kwargs.get("ruta_stream") is None
+    )
+    if es_deduplicable:
+        # Las opciones de la llamada (reintentos, timeout, presupuesto...) también forman la clave
+        opciones = {
+            clave: valor for clave, valor in kwargs.items()
+            if clave not in ("headers", "params", "cache", "al_no_autorizado")
+        }
+        clave = clave_peticion(metodo, url, kwargs.get("headers"), kwargs.get("params"), opciones)
+        try:
+            return await grupo_peticiones.ejecutar_async(
+                clave, lambda: loop.run_in_executor(executor, llamada), kwargs.get("presupuesto_total")
+            )
+        except TimeoutError:
+            # La llamada compartida no terminó dentro del presupuesto de este seguidor
+            return None
+    return await loop.run_in_executor(executor, llamada)
+
+
+async def realizar_peticiones_concurrentes(
+    lista_peticiones: List[Dict[str, Any]],
+    max_concurrencia: int = 10
+) -> AsyncIterator[Tuple[int, Optional[requests.Response]]]:
+    """
+    Ejecuta una lista de peticiones en paralelo y va entregando los resultados según terminan.
+
+    Cada petición es un diccionario con los argumentos de `realizar_peticion_segura`, por ejemplo:
+        {"metodo": "GET", "url": "https://...", "params": {...}}
+
+    Nota: para aprovechar el keep-alive con concurrencias altas conviene que el pool de
+    conexiones por host (`configurar_sesiones(tamano_pool=...)`) sea >= max_concurrencia.
+
+    Args:
+        lista_peticiones (list): Peticiones a realizar.
+        max_concurrencia (int): Número máximo de peticiones en vuelo simultáneamente.
+
+    Yields:
+        tuple: (indice, respuesta) donde `indice` es la posición de la petición en la lista
+        original y `respuesta` es el `requests.Response` o None si falló.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_concurrencia, thread_name_prefix="peticion")
+
+    async def _ejecutar(indice: int, peticion: Dict[str, Any]):
+        respuesta = await realizar_peticion_async(executor=executor, **peticion)
+        return indice, respuesta
+
+    tareas = [asyncio.ensure_future(_ejecutar(i, peticion)) for i, peticion in enumerate(lista_peticiones)]
+
+    try:
+        for siguiente in asyncio.as_completed(tareas):
+            yield await siguiente
+    finally:
+        # Si el consumidor deja de iterar antes de tiempo, cancelamos lo pendiente
+        for tarea in tareas:
+            tarea.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def realizar_peticiones_en_hilos(
+    lista_peticiones: List[Dict[str, Any]],
+    max_concurrencia: int = 10
+) -> Iterator[Tuple[int, Optional[requests.Response]]]:
+    """
+    Equivalente síncrono de `realizar_peticiones_concurrentes` basado en un pool de hilos.
+    Útil en métodos síncronos de los conectores, donde no hay un event loop disponible.
+
+    Args:
+        lista_peticiones (list): Peticiones a realizar (argumentos de `realizar_peticion_segura`).
+        max_concurrencia (int): Número máximo de peticiones en vuelo simultáneamente.
+
+    Yields:
+        tuple: (indice, respuesta) según van terminando las peticiones.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_concurrencia, thread_name_prefix="peticion")
+    futuros = {
+        executor.submit(realizar_peticion_segura, **peticion): indice
+        for indice, peticion in enumerate(lista_peticiones)
+    }
+
+    try:
+        for futuro in as_completed(futuros):
+            yield futuros[futuro], futuro.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    import logging
+    # Los módulos de utilidades no configuran el logging: lo hacemos aquí para ver avisos y errores
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
+    import time
+
+    async def _demo():
+        # httpbin tarda ~1 segundo en cada llamada: en paralelo el total ronda 1-2 segundos
+        peticiones = [{"metodo": "GET", "url": "https://httpbin.org/delay/1"} for _ in range(5)]
+        inicio = time.perf_counter()
+        async for indice, respuesta in realizar_peticiones_concurrentes(peticiones, max_concurrencia=5):
+            estado = respuesta.status_code if respuesta else "fallo"
+            print(f"Petición {indice} terminada: {estado}")
+        print(f"Tiempo total: {time.perf_counter() - inicio:.2f}s")
+
+    asyncio.run(_demo())
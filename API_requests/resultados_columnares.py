@@ -0,0 +1,241 @@
+"""
+Resultados GAQL en Formato Columnar (NumPy / Arrow)
+===================================================
+
+Las filas de Google Ads llegan como diccionarios anidados (`campaign.id`, `metrics.clicks`...):
+guardarlas tal cual ocupa mucha memoria y agregarlas exige bucles Python fila a fila. Este
+módulo las acumula por columnas según van llegando, en bloques de arrays NumPy o record
+batches de Arrow, con el tipo de cada columna deducido del nombre del campo del SELECT:
+
+- `segments.date` (y demás fechas de `segments`) -> fecha (datetime64[D] / date32)
+- IDs, importes `*_micros` y métricas de recuento     -> int64
+- resto de métricas (ctr, conversions, average_cpc...) -> float64
+- resto de campos (nombres, enums, resource names)    -> texto
+
+Las métricas ausentes se rellenan con 0: la API REST omite los campos con valor por defecto.
+
+NumPy y pyarrow son opcionales: el motor 'numpy' necesita numpy (y permite agregaciones
+vectorizadas) y el motor 'arrow' y la exportación a Parquet necesitan pyarrow.
+
+Uso típico:
+    constructor = ConstructorColumnar.desde_gaql(gaql, extra=["customer_id"])
+    constructor.anadir_filas(filas)
+    totales = constructor.agregar(["campaign.id"], ["metrics.clicks", "metrics.cost_micros"])
+    constructor.exportar_parquet("informes/campanas")
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+ENTERO = "int64"
+DECIMAL = "float64"
+FECHA = "fecha"
+TEXTO = "texto"
+
+# Métricas de recuento (int64 en la API); el resto de métricas son double
+METRICAS_ENTERAS = {
+    "clicks", "impressions", "interactions", "engagements", "video_views", "invalid_clicks",
+    "active_view_impressions", "active_view_measurable_impressions", "gmail_forwards",
+    "gmail_saves", "gmail_secondary_clicks", "phone_calls", "phone_impressions",
+}
+
+_CAMPOS_FECHA = {"segments.date", "segments.week", "segments.month", "segments.quarter", "segments.year"}
+
+
+def tipo_campo(campo: str) -> str:
+    """Tipo columnar (ENTERO, DECIMAL, FECHA o TEXTO) de un campo GAQL, deducido de su nombre."""
+    ultimo = campo.rsplit(".", 1)[-1]
+    if campo in _CAMPOS_FECHA and campo != "segments.year":
+        return FECHA
+    if campo == "segments.year" or ultimo == "id" or ultimo.endswith("_micros"):
+        return ENTERO
+    if campo.startswith("metrics."):
+        return ENTERO if ultimo in METRICAS_ENTERAS else DECIMAL
+    return TEXTO
+
+
+def _requerir(modulo, nombre: str):
+    if modulo is None:
+        raise ImportError(f"Esta operación requiere {nombre} (pip install {nombre})")
+
+
+class ConstructorColumnar:
+    """Acumula filas de GAQL por columnas, en bloques tipados de NumPy o Arrow."""
+
+    def __init__(self, campos: List[str], motor: str = "numpy", tamano_bloque: int = 65536):
+        """
+        Args:
+            campos (list): Columnas a conservar, con nombres GAQL ('campaign.id', 'metrics.clicks'...).
+            motor (str): 'numpy' o 'arrow' (formato de los bloques internos).
+            tamano_bloque (int): Filas acumuladas en listas Python antes de convertirlas a un bloque.
+        """
+        if motor not in ("numpy", "arrow"):
+            raise ValueError(f"Motor no soportado: {motor}")
+        _requerir(np if motor == "numpy" else pa, "numpy" if motor == "numpy" else "pyarrow")
+
+        self.campos = list(campos)
+        self.tipos = {campo: tipo_campo(campo) for campo in self.campos}
+        self.motor = motor
+        self.tamano_bloque = tamano_bloque
+        self.filas = 0
+
+        self._bufer: Dict[str, list] = {campo: [] for campo in self.campos}
+        self._bloques: List[Any] = []  # dict de arrays NumPy o pa.RecordBatch
+
+    @classmethod
+    def desde_gaql(cls, gaql: str, extra: Iterable[str] = (), **opciones) -> "ConstructorColumnar":
+        """Crea el constructor con las columnas del SELECT de la consulta (más las `extra`, p.ej. customer_id)."""
+        from google_ads_api import campos_select
+
+        return cls(campos_select(gaql) + [campo for campo in extra], **opciones)
+
+    # --- Carga ---
+
+    def anadir(self, fila: Dict[str, Any]):
+        """Añade una fila ya tipada (ver `google_ads_api.tipar_fila`)."""
+        for campo in self.campos:
+            self._bufer[campo].append(fila.get(campo))
+        self.filas += 1
+        if len(self._bufer[self.campos[0]]) >= self.tamano_bloque:
+            self._cerrar_bloque()
+
+    def anadir_filas(self, filas: Iterable[Dict[str, Any]]) -> "ConstructorColumnar":
+        """Añade todas las filas de un iterable (p.ej. el generador de `search_stream`)."""
+        for fila in filas:
+            self.anadir(fila)
+        return self
+
+    def _cerrar_bloque(self):
+        if not self.campos or not self._bufer[self.campos[0]]:
+            return
+        if self.motor == "numpy":
+            bloque = {campo: self._a_numpy(campo, valores) for campo, valores in self._bufer.items()}
+        else:
+            bloque = pa.RecordBatch.from_arrays(
+                [self._a_arrow(campo, valores) for campo, valores in self._bufer.items()], names=self.campos
+            )
+        self._bloques.append(bloque)
+        self._bufer = {campo: [] for campo in self.campos}
+
+    def _a_numpy(self, campo: str, valores: list):
+        tipo = self.tipos[campo]
+        if tipo == ENTERO:
+            return np.array([v or 0 for v in valores], dtype=np.int64)
+        if tipo == DECIMAL:
+            return np.array([v or 0.0 for v in valores], dtype=np.float64)
+        if tipo == FECHA:
+            return np.array(valores, dtype="datetime64[D]")
+        return np.array(valores, dtype=object)
+
+    def _a_arrow(self, campo: str, valores: list):
+        tipo = self.tipos[campo]
+        if tipo == ENTERO:
+            return pa.array([v or 0 for v in valores], type=pa.int64())
+        if tipo == DECIMAL:
+            return pa.array([v or 0.0 for v in valores], type=pa.float64())
+        if tipo == FECHA:
+            return pa.array(valores, type=pa.string()).cast(pa.date32())
+        return pa.array(valores, type=pa.string())
+
+    # --- Salida ---
+
+    def esquema_arrow(self):
+        """Esquema Arrow de las columnas."""
+        _requerir(pa, "pyarrow")
+        tipos = {ENTERO: pa.int64(), DECIMAL: pa.float64(), FECHA: pa.date32(), TEXTO: pa.string()}
+        return pa.schema([(campo, tipos[self.tipos[campo]]) for campo in self.campos])
+
+    def a_numpy(self) -> Dict[str, Any]:
+        """Devuelve {campo: np.ndarray} con todas las filas."""
+        _requerir(np, "numpy")
+        self._cerrar_bloque()
+        if not self._bloques:
+            return {campo: self._a_numpy(campo, []) for campo in self.campos}
+        if self.motor == "arrow":
+            tabla = self.a_arrow()
+            columnas = {campo: tabla.column(campo).to_numpy(zero_copy_only=False) for campo in self.campos}
+            for campo in self.campos:
+                if self.tipos[campo] == FECHA:
+                    columnas[campo] = columnas[campo].astype("datetime64[D]")
+            return columnas
+        return {campo: np.concatenate([bloque[campo] for bloque in self._bloques]) for campo in self.campos}
+
+    def a_arrow(self):
+        """Devuelve una pa.Table con todas las filas."""
+        _requerir(pa, "pyarrow")
+        self._cerrar_bloque()
+        if self.motor == "arrow":
+            return pa.Table.from_batches(self._bloques, schema=self.esquema_arrow())
+        lotes = [
+            pa.RecordBatch.from_arrays(
+                [pa.array(bloque[campo], type=tipo.type) for campo, tipo in zip(self.campos, self.esquema_arrow())],
+                names=self.campos
+            )
+            for bloque in self._bloques
+        ]
+        return pa.Table.from_batches(lotes, schema=self.esquema_arrow())
+
+    def exportar_parquet(self, directorio: str, particiones: Optional[List[str]] = None):
+        """
+        Escribe las filas como dataset Parquet particionado (estilo Hive: `fecha=.../customer_id=...`).
+
+        Args:
+            directorio (str): Carpeta raíz del dataset.
+            particiones (list, opcional): Columnas de partición. Por defecto 'segments.date' y
+                'customer_id' si están entre las columnas. Los nombres de carpeta usan 'fecha' en
+                lugar de 'segments.date'.
+        """
+        _requerir(pq, "pyarrow")
+        tabla = self.a_arrow()
+        if particiones is None:
+            particiones = [campo for campo in ("segments.date", "customer_id") if campo in self.campos]
+
+        # Nombres de carpeta legibles y sin puntos: segments.date -> fecha
+        nombres = {campo: "fecha" if campo == "segments.date" else re.sub(r"\W", "_", campo) for campo in particiones}
+        tabla = tabla.rename_columns([nombres.get(nombre, nombre) for nombre in tabla.column_names])
+        pq.write_to_dataset(tabla, root_path=directorio, partition_cols=list(nombres.values()) or None)
+
+    # --- Agregaciones vectorizadas ---
+
+    def agregar(self, por: List[str], metricas: List[str]) -> Dict[str, Any]:
+        """
+        Suma `metricas` agrupando por las columnas `por`, sin bucles Python por fila.
+
+        Returns:
+            dict: {columna: np.ndarray} con una entrada por grupo (claves y sumas).
+        """
+        columnas = self.a_numpy()
+        if not self.filas:
+            return {campo: columnas[campo] for campo in por + metricas}
+
+        # Cada combinación de claves se traduce a un código entero de grupo (re-comprimido tras
+        # cada columna para que el producto de cardinalidades no desborde int64)
+        codigos = np.zeros(self.filas, dtype=np.int64)
+        for campo in por:
+            clave = columnas[campo]
+            if clave.dtype == object:
+                clave = np.where(clave == None, "", clave)  # noqa: E711 (comparación elemento a elemento)
+            unicos, inverso = np.unique(clave, return_inverse=True)
+            codigos = np.unique(codigos * len(unicos) + inverso, return_inverse=True)[1]
+        grupos, primera_fila, grupo_de_fila = np.unique(codigos, return_index=True, return_inverse=True)
+
+        resultado = {campo: columnas[campo][primera_fila] for campo in por}
+        for campo in metricas:
+            valores = columnas[campo]
+            sumas = np.zeros(len(grupos), dtype=valores.dtype)
+            np.add.at(sumas, grupo_de_fila, valores)
+            resultado[campo] = sumas
+        return resultado
+
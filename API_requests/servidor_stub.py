@@ -0,0 +1,362 @@
+"""
+Servidor HTTP Local de Pruebas (Stub)
+=====================================
+
+Servidor mínimo que imita las respuestas de Meta Graph API y Google Ads REST para poder
+ejercitar y medir `utils_requests` sin credenciales ni acceso a red.
+
+Cada escenario se sirve bajo su propio prefijo de ruta (`/<escenario>/...`) y define el
+comportamiento del servidor:
+- latencia: segundos de espera por respuesta (más un jitter aleatorio opcional).
+- tasa_errores: proporción de respuestas 500.
+- ráfagas de 429: cada `periodo_429` peticiones, las `rafaga_429` siguientes reciben 429
+  con la cabecera Retry-After indicada.
+- tamano_payload: número de elementos de los arrays 'data' / 'results'.
+- posts_por_pagina: si es > 0, '/posts' sirve un historial de `tamano_payload` posts (uno
+  por hora hacia atrás) paginado con cursores `after` y `paging.next`, filtrable con
+  `since` / `until` como en Graph.
+- filas_por_pagina: si es > 0, 'googleAds:search' pagina sus `tamano_payload` filas con
+  `pageToken` / `nextPageToken`.
+- expiracion_token: duración (segundos) de los tokens que emite '/token'.
+- exigir_token: si es True, el resto de rutas responden 401 salvo que lleven un token
+  emitido por '/token' y aún vigente (cabecera `Authorization: Bearer` o `access_token`).
+
+Rutas servidas dentro de cada escenario:
+    GET  /<escenario>/<version>/<page_id>                         -> info de página (Meta)
+    GET  /<escenario>/<version>/<page_id>/posts                   -> {"data": [...], "paging": {}}
+    POST /<escenario>/<version>/customers/<id>/googleAds:search   -> {"results": [...]}
+    POST /<escenario>/<version>/customers/<id>/googleAds:searchStream -> [{"results": [...]}, ...]
+    GET  /<escenario>/<version>/?ids=a,b                          -> {"a": {...}, "b": {...}} (Meta multi-ID)
+    POST /<escenario>/<version>  (batch=[...])                    -> [{"code": 200, "body": "..."}] (Meta batch)
+    GET  /<escenario>/eco                                         -> {"ruta": ..., "params": {...}}
+    GET  /<escenario>/weather?q=... | ?lat=...&lon=...            -> clima actual (OpenWeatherMap)
+    POST /<escenario>/token  (grant_type, client_id...)           -> {"access_token": ..., "expires_in": ...} (OAuth2)
+
+Los IDs de página que empiezan por 'error' responden con un error de Graph (código 100), lo
+que permite probar el manejo de errores por elemento.
+
+Uso:
+    with ServidorStub({"rapido": ConfiguracionStub(), "lento": ConfiguracionStub(latencia=0.2)}) as servidor:
+        url = servidor.url_base + "/lento/eco"
+"""
+
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+
+@dataclass
+class ConfiguracionStub:
+    """Comportamiento del servidor para un escenario."""
+
+    latencia: float = 0.0
+    jitter: float = 0.0
+    tasa_errores: float = 0.0
+    periodo_429: int = 0
+    rafaga_429: int = 0
+    retry_after: str = "1"
+    tamano_payload: int = 10
+    posts_por_pagina: int = 0
+    filas_por_pagina: int = 0
+    expiracion_token: int = 3600
+    exigir_token: bool = False
+
+
+class _EstadoEscenario:
+    """Contador de peticiones de un escenario (para decidir las ráfagas de 429)."""
+
+    def __init__(self, configuracion: ConfiguracionStub):
+        self.configuracion = configuracion
+        self.peticiones = 0
+        self.cuerpos: Dict[str, bytes] = {}  # Payloads grandes ya serializados, por tipo de ruta
+        self.tokens: Dict[str, float] = {}  # Tokens emitidos -> instante de caducidad
+        self._lock = threading.Lock()
+
+    def siguiente(self) -> int:
+        with self._lock:
+            self.peticiones += 1
+            return self.peticiones
+
+    def emitir_token(self, client_id: str) -> dict:
+        with self._lock:
+            valor = f"token-{client_id}-{len(self.tokens) + 1}"
+            self.tokens[valor] = time.time() + self.configuracion.expiracion_token
+        return {"access_token": valor, "token_type": "Bearer", "expires_in": self.configuracion.expiracion_token}
+
+    def token_valido(self, autorizacion: str) -> bool:
+        valor = autorizacion[len("Bearer "):] if autorizacion.startswith("Bearer ") else ""
+        return self.tokens.get(valor, 0) > time.time()
+
+
+class _ManejadorStub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, como los servidores reales
+    # Sin Nagle: cabeceras y cuerpo se escriben por separado y el ACK retardado del cliente
+    # añadiría ~40 ms artificiales a cada respuesta
+    disable_nagle_algorithm = True
+    servidor: "ServidorStub" = None
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, codigo: int, cuerpo, cabeceras: Optional[Dict[str, str]] = None):
+        datos = cuerpo if isinstance(cuerpo, bytes) else json.dumps(cuerpo).encode("utf-8")
+        self.send_response(codigo)
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _atender(self):
+        # El cuerpo se lee siempre: además de los parámetros de formulario, deja la conexión
+        # keep-alive lista para la siguiente petición
+        longitud = int(self.headers.get("Content-Length") or 0)
+        cuerpo_peticion = self.rfile.read(longitud).decode("utf-8") if longitud else ""
+
+        partes = urlsplit(self.path)
+        segmentos = [s for s in partes.path.split("/") if s]
+        estado = self.servidor.escenarios.get(segmentos[0]) if segmentos else None
+        if estado is None:
+            self._responder(404, {"error": {"message": f"Escenario desconocido: {partes.path}"}})
+            return
+
+        configuracion = estado.configuracion
+        numero = estado.siguiente()
+        es_token = segmentos[1:] == ["token"]
+
+        # Como Graph, el token también puede llegar en el parámetro access_token
+        autorizacion = self.headers.get("Authorization") or "Bearer " + dict(parse_qsl(partes.query)).get("access_token", "")
+        if configuracion.exigir_token and not es_token and not estado.token_valido(autorizacion):
+            self._responder(401, {"error": {"message": "Invalid or expired access token", "code": 190}})
+            return
+
+        if configuracion.latencia or configuracion.jitter:
+            time.sleep(configuracion.latencia + random.uniform(0, configuracion.jitter))
+
+        if configuracion.periodo_429 and (numero - 1) % configuracion.periodo_429 < configuracion.rafaga_429:
+            self._responder(
+                429, {"error": {"message": "Too many requests", "code": 4}},
+                {"Retry-After": configuracion.retry_after}
+            )
+            return
+
+        if configuracion.tasa_errores and random.random() < configuracion.tasa_errores:
+            self._responder(500, {"error": {"message": "Error simulado"}})
+            return
+
+        params = dict(parse_qsl(partes.query))
+        tipo_contenido = self.headers.get("Content-Type", "")
+        if tipo_contenido.startswith("application/x-www-form-urlencoded"):
+            params.update(parse_qsl(cuerpo_peticion))
+        elif tipo_contenido.startswith("application/json") and cuerpo_peticion:
+            params.update(json.loads(cuerpo_peticion))
+        if es_token:
+            self._responder(*self._token(params, estado))
+            return
+        self._responder(*self._cuerpo(segmentos[1:], params, estado))
+
+    @staticmethod
+    def _token(params: dict, estado: _EstadoEscenario):
+        """(código, cuerpo) del endpoint de tokens, con los errores de RFC 6749."""
+        if params.get("grant_type") not in ("client_credentials", "refresh_token") or not params.get("client_id"):
+            return 400, {"error": "invalid_request", "error_description": "grant_type o client_id no válidos"}
+        if params.get("client_secret") == "invalido":
+            return 401, {"error": "invalid_client", "error_description": "Credenciales de cliente incorrectas"}
+        return 200, estado.emitir_token(params["client_id"])
+
+    @staticmethod
+    def _info_pagina(page_id: str):
+        """(código, cuerpo) de la info de una página; los IDs 'error...' no existen."""
+        if page_id.startswith("error"):
+            return 400, {"error": {"message": f"Unsupported get request. Object with ID '{page_id}' does not exist",
+                                   "type": "GraphMethodException", "code": 100}}
+        return 200, {"id": page_id, "name": f"Página {page_id}", "username": f"pagina{page_id}",
+                     "followers_count": 1000, "verification_status": "not_verified"}
+
+    def _cuerpo(self, segmentos: list, params: dict, estado: _EstadoEscenario):
+        n = estado.configuracion.tamano_payload
+
+        if "batch" in params:
+            respuestas = []
+            for sub in json.loads(params["batch"]):
+                codigo, cuerpo = self._info_pagina(sub["relative_url"].split("?")[0].strip("/"))
+                respuestas.append({"code": codigo, "body": json.dumps(cuerpo)})
+            return 200, respuestas
+
+        if "ids" in params:
+            infos = {page_id: self._info_pagina(page_id) for page_id in params["ids"].split(",")}
+            for codigo, cuerpo in infos.values():
+                if codigo != 200:
+                    return codigo, cuerpo  # Como Graph: un ID inválido hace fallar toda la consulta
+            return 200, {page_id: cuerpo for page_id, (_, cuerpo) in infos.items()}
+
+        # Los arrays se serializan una sola vez por escenario para que el coste de generar
+        # payloads grandes no convierta al propio servidor en el cuello de botella
+        if segmentos and segmentos[-1].endswith(":searchStream"):
+            if "searchStream" not in estado.cuerpos:
+                # Como la API real: lotes de hasta 10.000 filas, int64 como texto y claves camelCase
+                filas = [
+                    {"campaign": {"resourceName": f"customers/1/campaigns/{i % 50}", "id": str(i % 50),
+                                  "name": f"Campaña {i % 50}", "status": "ENABLED"},
+                     "metrics": {"clicks": str(i % 97), "impressions": str(i % 997), "costMicros": str(i * 1000),
+                                 "ctr": round((i % 97) / ((i % 997) or 1), 4)},
+                     "segments": {"date": time.strftime("%Y-%m-%d", time.gmtime(1_700_000_000 - (i % 30) * 86400))}}
+                    for i in range(n)
+                ]
+                lotes = [{"results": filas[i:i + 10000], "fieldMask": "campaign.id,campaign.name,metrics.clicks"}
+                         for i in range(0, n, 10000)]
+                estado.cuerpos["searchStream"] = json.dumps(lotes, ensure_ascii=False).encode("utf-8")
+            return 200, estado.cuerpos["searchStream"]
+
+        if segmentos and segmentos[-1].endswith(":search") and estado.configuracion.filas_por_pagina:
+            inicio = int(params.get("pageToken") or 0)
+            fin = min(n, inicio + estado.configuracion.filas_por_pagina)
+            cuenta = segmentos[-2]
+            pagina = {"results": [
+                {"campaign": {"resourceName": f"customers/{cuenta}/campaigns/{i}", "id": str(i),
+                              "name": f"Campaña {i}", "status": "ENABLED"},
+                 "metrics": {"clicks": str(i % 97)}}
+                for i in range(inicio, fin)
+            ]}
+            if fin < n:
+                pagina["nextPageToken"] = str(fin)
+            return 200, pagina
+
+        if segmentos and segmentos[-1].endswith(":search"):
+            if "search" not in estado.cuerpos:
+                estado.cuerpos["search"] = json.dumps({"results": [
+                    {"campaign": {"resourceName": f"customers/1/campaigns/{i}", "id": str(i),
+                                  "name": f"Campaña {i}", "status": "ENABLED"}}
+                    for i in range(n)
+                ]}).encode("utf-8")
+            return 200, estado.cuerpos["search"]
+
+        if segmentos and segmentos[-1] == "posts" and estado.configuracion.posts_por_pagina:
+            return 200, self._pagina_posts(segmentos, params, estado.configuracion)
+
+        if segmentos and segmentos[-1] == "posts":
+            if "posts" not in estado.cuerpos:
+                estado.cuerpos["posts"] = json.dumps({
+                    "data": [
+                        {"id": f"post_{i}", "message": f"Post número {i} " + "x" * 200,
+                         "created_time": "2024-01-01T00:00:00+0000"}
+                        for i in range(n)
+                    ],
+                    "paging": {}
+                }).encode("utf-8")
+            return 200, estado.cuerpos["posts"]
+
+        if segmentos and segmentos[-1] == "weather":
+            return self._clima(params)
+
+        if segmentos and segmentos[0] == "eco":
+            return 200, {"ruta": "/".join(segmentos), "params": params}
+
+        return self._info_pagina(segmentos[-1] if segmentos else "me")
+
+    @staticmethod
+    def _clima(params: dict):
+        """(código, cuerpo) del clima actual; valores deterministas a partir de la ubicación."""
+        ubicacion = params.get("q") or f"{params.get('lat')},{params.get('lon')}"
+        if ubicacion.startswith("error"):
+            return 404, {"cod": "404", "message": "city not found"}
+        semilla = sum(ubicacion.encode("utf-8"))
+        return 200, {
+            "coord": {"lat": float(params.get("lat", semilla % 90)), "lon": float(params.get("lon", semilla % 180))},
+            "weather": [{"main": "Clear", "description": "cielo claro"}],
+            "main": {"temp": semilla % 35 + 0.5, "feels_like": semilla % 35, "humidity": semilla % 100, "pressure": 1013},
+            "wind": {"speed": semilla % 10 + 0.1},
+            "dt": 1_700_000_000,
+            "name": ubicacion.split(",")[0].title(),
+        }
+
+    def _pagina_posts(self, segmentos: list, params: dict, configuracion: ConfiguracionStub) -> dict:
+        """Una página del historial de posts (del más reciente al más antiguo) con su cursor."""
+        inicio_historial = 1_700_000_000  # Post 0; cada post siguiente es una hora anterior
+        desde = int(params.get("since", 0))
+        hasta = int(params.get("until", inicio_historial))
+        primero = max(0, -(-(inicio_historial - hasta) // 3600))
+        ultimo = min(configuracion.tamano_payload, (inicio_historial - desde) // 3600 + 1)
+
+        posicion = max(primero, int(params.get("after", primero)))
+        fin = min(ultimo, posicion + configuracion.posts_por_pagina)
+        pagina = {
+            "data": [
+                {"id": f"post_{i}", "message": f"Post número {i}",
+                 "created_time": time.strftime("%Y-%m-%dT%H:%M:%S+0000", time.gmtime(inicio_historial - i * 3600))}
+                for i in range(posicion, fin)
+            ],
+            "paging": {"cursors": {"after": str(fin)}}
+        }
+        if fin < ultimo:
+            siguientes = {**params, "after": str(fin)}
+            pagina["paging"]["next"] = f"http://{self.headers['Host']}/{'/'.join([self.path.split('/')[1]] + segmentos)}?{urlencode(siguientes)}"
+        return pagina
+
+    do_GET = _atender
+    do_POST = _atender
+
+
+class ServidorStub:
+    """Servidor HTTP local en un hilo de fondo. Usable como context manager."""
+
+    def __init__(self, escenarios: Dict[str, ConfiguracionStub], host: str = "127.0.0.1", puerto: int = 0):
+        """
+        Args:
+            escenarios (dict): Nombre del escenario -> ConfiguracionStub.
+            host (str): Interfaz de escucha.
+            puerto (int): Puerto de escucha (0 = uno libre cualquiera).
+        """
+        self.escenarios = {nombre: _EstadoEscenario(c) for nombre, c in escenarios.items()}
+        manejador = type("ManejadorStub", (_ManejadorStub,), {"servidor": self})
+        self._servidor = ThreadingHTTPServer((host, puerto), manejador)
+        self._servidor.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url_base(self) -> str:
+        host, puerto = self._servidor.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self) -> "ServidorStub":
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, name="servidor-stub", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self) -> "ServidorStub":
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor stub para pruebas de las utilidades HTTP.")
+    parser.add_argument("--puerto", type=int, default=8080)
+    parser.add_argument("--latencia", type=float, default=0.05)
+    parser.add_argument("--tasa-errores", type=float, default=0.0)
+    args = parser.parse_args()
+
+    servidor = ServidorStub(
+        {"demo": ConfiguracionStub(latencia=args.latencia, tasa_errores=args.tasa_errores)},
+        puerto=args.puerto
+    )
+    servidor.iniciar()
+    print(f"Sirviendo en {servidor.url_base}/demo/ (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        servidor.detener()
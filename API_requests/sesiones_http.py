@@ -0,0 +1,119 @@
+"""
+Gestor de Sesiones HTTP Reutilizables
+=====================================
+
+Este módulo mantiene una `requests.Session` por host (esquema + dominio + puerto) para
+reutilizar las conexiones TCP/TLS entre peticiones (keep-alive) en lugar de abrir una
+conexión nueva en cada llamada.
+
+Cada sesión monta un `HTTPAdapter` con un pool de conexiones de tamaño configurable, por
+lo que varios hilos pueden compartir la misma sesión: urllib3 entrega a cada hilo una
+conexión libre del pool y la devuelve al terminar.
+
+Uso típico:
+    from sesiones_http import obtener_sesion
+    sesion = obtener_sesion("https://graph.facebook.com/v19.0/me")
+    respuesta = sesion.get("https://graph.facebook.com/v19.0/me", timeout=30)
+"""
+
+import threading
+from urllib.parse import urlsplit
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class GestorSesiones:
+    """Registro thread-safe de sesiones `requests.Session`, una por host."""
+
+    def __init__(self, tamano_pool: int = 10, bloquear_pool: bool = False, keep_alive: bool = True):
+        """
+        Args:
+            tamano_pool (int): Conexiones simultáneas que se mantienen abiertas por host.
+            bloquear_pool (bool): Si es True, los hilos esperan a que se libere una conexión
+                cuando el pool está lleno en vez de abrir conexiones extra desechables.
+            keep_alive (bool): Si es False se envía 'Connection: close' y no se reutilizan conexiones.
+        """
+        self.tamano_pool = tamano_pool
+        self.bloquear_pool = bloquear_pool
+        self.keep_alive = keep_alive
+        self._sesiones: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave_host(url: str) -> str:
+        """Devuelve la clave 'esquema://host:puerto' que identifica el pool de una URL."""
+        partes = urlsplit(url)
+        puerto = partes.port or (443 if partes.scheme == "https" else 80)
+        return f"{partes.scheme}://{partes.hostname}:{puerto}"
+
+    def _crear_sesion(self) -> requests.Session:
+        sesion = requests.Session()
+
+        # Un único pool por sesión (la sesión solo habla con un host).
+        # Los reintentos los gestiona realizar_peticion_segura, no urllib3.
+        adaptador = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.tamano_pool,
+            max_retries=0,
+            pool_block=self.bloquear_pool
+        )
+        sesion.mount("https://", adaptador)
+        sesion.mount("http://", adaptador)
+
+        if not self.keep_alive:
+            sesion.headers["Connection"] = "close"
+        return sesion
+
+    def obtener_sesion(self, url: str) -> requests.Session:
+        """
+        Devuelve la sesión asociada al host de la URL, creándola la primera vez.
+
+        Args:
+            url (str): URL completa de la petición.
+
+        Returns:
+            requests.Session: Sesión compartida para ese host.
+        """
+        clave = self.clave_host(url)
+        with self._lock:
+            sesion = self._sesiones.get(clave)
+            if sesion is None:
+                sesion = self._crear_sesion()
+                self._sesiones[clave] = sesion
+            return sesion
+
+    def cerrar(self):
+        """Cierra todas las sesiones y sus conexiones abiertas."""
+        with self._lock:
+            for sesion in self._sesiones.values():
+                sesion.close()
+            self._sesiones.clear()
+
+
+# Gestor compartido por todo el proceso (lo usa realizar_peticion_segura)
+gestor_sesiones = GestorSesiones()
+
+
+def obtener_sesion(url: str) -> requests.Session:
+    """Atajo para obtener la sesión del gestor compartido."""
+    return gestor_sesiones.obtener_sesion(url)
+
+
+def configurar_sesiones(tamano_pool: int = 10, bloquear_pool: bool = False, keep_alive: bool = True):
+    """
+    Cambia la configuración del gestor compartido.
+    Las sesiones existentes se cierran y se recrean con los nuevos valores en la siguiente petición.
+    """
+    with gestor_sesiones._lock:
+        gestor_sesiones.tamano_pool = tamano_pool
+        gestor_sesiones.bloquear_pool = bloquear_pool
+        gestor_sesiones.keep_alive = keep_alive
+    gestor_sesiones.cerrar()
+
+
+if __name__ == "__main__":
+    sesion_a = obtener_sesion("https://httpbin.org/get")
+    sesion_b = obtener_sesion("https://httpbin.org/status/200")
+    print("Misma sesión para el mismo host:", sesion_a is sesion_b)
@@ -0,0 +1,244 @@
+"""
+Sincronización Incremental con Marcas de Agua Persistentes
+==========================================================
+
+Piezas comunes para que las sincronizaciones periódicas (posts de Meta, informes...) solo
+descarguen lo nuevo desde la ejecución anterior:
+
+- `AlmacenEstado`: estado local en SQLite. Guarda por fuente y clave (p.ej. 'meta_posts' /
+  page_id) una marca de agua (el último valor visto) y la huella de los elementos recientes,
+  para detectar cuáles han cambiado al revisar de nuevo una ventana ya sincronizada.
+- Manifiesto de particiones: qué particiones (p.ej. cuenta/fecha de un informe) se han
+  descargado ya y cuándo, para pedir solo las que faltan.
+- `EscritorDataset`: salida incremental a un dataset local, en JSONL (se añade al fichero) o
+  en Parquet (un fichero nuevo por ejecución, requiere `pyarrow`).
+
+La salida es de tipo "al menos una vez": si una ejecución se interrumpe, la siguiente
+puede volver a escribir algunos elementos. Quien consuma el dataset debe quedarse con la
+última versión de cada `id` (que además es como se representan las ediciones).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def huella(registro: Dict[str, Any]) -> str:
+    """Huella estable del contenido de un registro (independiente del orden de las claves)."""
+    texto = json.dumps(registro, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+class AlmacenEstado:
+    """Estado de sincronización en una base de datos SQLite local. Seguro entre hilos."""
+
+    def __init__(self, ruta: str = "estado_sincronizacion.db"):
+        """
+        Args:
+            ruta (str): Fichero SQLite (se crea si no existe).
+        """
+        self.ruta = ruta
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS marcas ("
+                " fuente TEXT NOT NULL, clave TEXT NOT NULL, valor TEXT, actualizado TEXT,"
+                " PRIMARY KEY (fuente, clave))"
+            )
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS huellas ("
+                " fuente TEXT NOT NULL, clave TEXT NOT NULL, elemento TEXT NOT NULL,"
+                " huella TEXT NOT NULL, marca REAL,"
+                " PRIMARY KEY (fuente, clave, elemento))"
+            )
+            self._conexion.execute(
+                "CREATE TABLE IF NOT EXISTS particiones ("
+                " fuente TEXT NOT NULL, clave TEXT NOT NULL, particion TEXT NOT NULL,"
+                " filas INTEGER, actualizado TEXT,"
+                " PRIMARY KEY (fuente, clave, particion))"
+            )
+
+    # --- Marcas de agua ---
+
+    def obtener_marca(self, fuente: str, clave: str) -> Optional[str]:
+        """Devuelve la marca de agua guardada, o None si nunca se ha sincronizado."""
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT valor FROM marcas WHERE fuente = ? AND clave = ?", (fuente, clave)
+            ).fetchone()
+        return fila[0] if fila else None
+
+    def guardar_marca(self, fuente: str, clave: str, valor: str):
+        """Guarda (o sustituye) la marca de agua de una fuente y clave."""
+        actualizado = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO marcas (fuente, clave, valor, actualizado) VALUES (?, ?, ?, ?)",
+                (fuente, clave, valor, actualizado)
+            )
+
+    # --- Huellas de elementos recientes ---
+
+    def huellas(self, fuente: str, clave: str) -> Dict[str, str]:
+        """Devuelve {id_elemento: huella} de los elementos recordados."""
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT elemento, huella FROM huellas WHERE fuente = ? AND clave = ?", (fuente, clave)
+            ).fetchall()
+        return dict(filas)
+
+    def guardar_huellas(self, fuente: str, clave: str, elementos: Iterable[Tuple[str, str, Optional[float]]]):
+        """
+        Guarda huellas de elementos.
+
+        Args:
+            elementos: Tuplas (id_elemento, huella, marca_temporal) donde la marca temporal
+                (timestamp Unix) sirve para olvidarlos con `podar_huellas`.
+        """
+        with self._lock, self._conexion:
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO huellas (fuente, clave, elemento, huella, marca) VALUES (?, ?, ?, ?, ?)",
+                ((fuente, clave, elemento, valor, marca) for elemento, valor, marca in elementos)
+            )
+
+    def podar_huellas(self, fuente: str, clave: str, anteriores_a: float):
+        """Olvida las huellas de elementos con marca temporal anterior a `anteriores_a`."""
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "DELETE FROM huellas WHERE fuente = ? AND clave = ? AND marca < ?", (fuente, clave, anteriores_a)
+            )
+
+    # --- Manifiesto de particiones ---
+
+    def particiones(self, fuente: str, clave: str) -> Dict[str, int]:
+        """Devuelve {particion: filas} de las particiones ya descargadas."""
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT particion, filas FROM particiones WHERE fuente = ? AND clave = ?", (fuente, clave)
+            ).fetchall()
+        return dict(filas)
+
+    def registrar_particiones(self, fuente: str, clave: str, particiones: Dict[str, int]):
+        """Marca como descargadas las particiones dadas ({particion: filas}) en una sola transacción."""
+        actualizado = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self._lock, self._conexion:
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO particiones (fuente, clave, particion, filas, actualizado) VALUES (?, ?, ?, ?, ?)",
+                ((fuente, clave, particion, filas, actualizado) for particion, filas in particiones.items())
+            )
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
+
+
+class EscritorDataset:
+    """
+    Escribe registros de forma incremental en un dataset local. Usable como context manager.
+
+    - 'jsonl': añade una línea por registro a `<directorio>/<nombre>.jsonl`.
+    - 'parquet': crea `<directorio>/<nombre>/part-<fecha>.parquet` por ejecución, escribiendo
+      en grupos de filas para no acumular el lote completo en memoria. Todas las columnas se
+      guardan como texto (los valores anidados, serializados en JSON). Requiere `pyarrow`.
+    """
+
+    def __init__(
+        self,
+        directorio: str,
+        nombre: str,
+        formato: str = "jsonl",
+        columnas: Optional[List[str]] = None,
+        filas_por_grupo: int = 1000
+    ):
+        """
+        Args:
+            directorio (str): Carpeta raíz del dataset.
+            nombre (str): Nombre del fichero (JSONL) o de la carpeta de partes (Parquet).
+            formato (str): 'jsonl' o 'parquet'.
+            columnas (list, opcional): Columnas del fichero Parquet (obligatorio en ese formato).
+            filas_por_grupo (int): Filas por grupo de filas de Parquet.
+        """
+        if formato not in ("jsonl", "parquet"):
+            raise ValueError(f"Formato no soportado: {formato}")
+        if formato == "parquet" and not columnas:
+            raise ValueError("El formato Parquet necesita la lista de columnas")
+        if formato == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("El formato Parquet requiere pyarrow (pip install pyarrow)") from None
+
+        self.formato = formato
+        self.columnas = columnas
+        self.filas_por_grupo = filas_por_grupo
+        self.escritos = 0
+        self._pendientes: List[Dict[str, Any]] = []
+        self._fichero = None
+        self._escritor_parquet = None
+
+        if formato == "jsonl":
+            os.makedirs(directorio, exist_ok=True)
+            self.ruta = os.path.join(directorio, f"{nombre}.jsonl")
+        else:
+            carpeta = os.path.join(directorio, nombre)
+            os.makedirs(carpeta, exist_ok=True)
+            self.ruta = os.path.join(carpeta, f"part-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet")
+
+    def escribir(self, registro: Dict[str, Any]):
+        """Añade un registro al dataset."""
+        if self.formato == "jsonl":
+            if self._fichero is None:
+                self._fichero = open(self.ruta, "a", encoding="utf-8")
+            self._fichero.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        else:
+            self._pendientes.append(registro)
+            if len(self._pendientes) >= self.filas_por_grupo:
+                self._volcar_parquet()
+        self.escritos += 1
+
+    def _volcar_parquet(self):
+        if not self._pendientes:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        esquema = pa.schema([(columna, pa.string()) for columna in self.columnas])
+        columnas = {
+            columna: [
+                None if fila.get(columna) is None
+                else fila[columna] if isinstance(fila[columna], str)
+                else json.dumps(fila[columna], ensure_ascii=False)
+                for fila in self._pendientes
+            ]
+            for columna in self.columnas
+        }
+        if self._escritor_parquet is None:
+            # Se escribe en un temporal y se renombra al cerrar: nunca queda un Parquet a medias
+            self._escritor_parquet = pq.ParquetWriter(self.ruta + ".tmp", esquema)
+        self._escritor_parquet.write_table(pa.Table.from_pydict(columnas, schema=esquema))
+        self._pendientes = []
+
+    def cerrar(self):
+        """Vuelca lo pendiente y cierra el fichero."""
+        if self._fichero is not None:
+            self._fichero.close()
+            self._fichero = None
+        if self.formato == "parquet":
+            self._volcar_parquet()
+            if self._escritor_parquet is not None:
+                self._escritor_parquet.close()
+                self._escritor_parquet = None
+                os.replace(self.ruta + ".tmp", self.ruta)
+
+    def __enter__(self) -> "EscritorDataset":
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
@@ -0,0 +1,295 @@
+"""
+Sincronización Incremental de Informes de Google Ads por Fecha
+==============================================================
+
+Volver a descargar cada noche el rango completo de fechas de un informe es caro, y casi
+todo es idéntico a la noche anterior: solo cambian los últimos días, en los que las
+conversiones siguen llegando con retraso. Este módulo mantiene un manifiesto de las
+particiones (cuenta, fecha) ya descargadas y en cada ejecución pide únicamente:
+
+- las fechas del rango que aún no están en el manifiesto, y
+- las de la ventana de retraso de conversiones (los últimos `dias_retraso` días), que se
+  sobrescriben siempre.
+
+Cada partición se escribe en `<directorio>/customer_id=<id>/fecha=<AAAA-MM-DD>/datos.<ext>`
+de forma atómica (fichero temporal + `os.replace`), de modo que un lector nunca ve una
+partición a medias. El manifiesto de una cuenta solo se actualiza cuando todas sus
+particiones se han escrito.
+
+Uso típico:
+    sincronizador = SincronizadorInformesAds(DEV_TOKEN, MCC_ID, ACCESS_TOKEN, AlmacenEstado("estado.db"), "informes")
+    resumen = sincronizador.sincronizar(GAQL, ["1234567890", "2345678901"], fecha_inicio="2024-01-01")
+"""
+
+import json
+import os
+import shutil
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+from google_ads_api import GoogleAdsRestConnector, campos_select, limitador_developer_token
+from sincronizacion import AlmacenEstado
+
+FUENTE = "google_ads_informe"
+
+
+def _palabras_gaql(gaql: str) -> List[Tuple[int, str]]:
+    """(posición, palabra) de las palabras y campos de una consulta GAQL fuera de los literales."""
+    palabras = []
+    i = 0
+    while i < len(gaql):
+        caracter = gaql[i]
+        if caracter in "'\"":
+            # Literal de texto ('...' o "...", con escapes \'): se salta entero
+            i += 1
+            while i < len(gaql) and gaql[i] != caracter:
+                i += 2 if gaql[i] == "\\" else 1
+            i += 1
+        elif caracter.isalnum() or caracter in "_.":
+            inicio = i
+            while i < len(gaql) and (gaql[i].isalnum() or gaql[i] in "_."):
+                i += 1
+            palabras.append((inicio, gaql[inicio:i]))
+        else:
+            i += 1
+    return palabras
+
+
+def _partir_gaql(gaql: str) -> Tuple[str, str, bool, bool]:
+    """
+    Divide una consulta GAQL en (SELECT ... FROM ... [WHERE ...], [ORDER BY / LIMIT / PARAMETERS])
+    e indica si tiene WHERE y si esa cláusula ya filtra por segments.date. Las palabras clave se
+    buscan fuera de los literales de texto.
+    """
+    palabras = _palabras_gaql(gaql)
+    claves = [palabra.upper() for _, palabra in palabras]
+    fin = next(
+        (
+            posicion for k, (posicion, _) in enumerate(palabras)
+            if claves[k] in ("LIMIT", "PARAMETERS") or claves[k:k + 2] == ["ORDER", "BY"]
+        ),
+        len(gaql)
+    )
+    where = next((k for k, clave in enumerate(claves) if clave == "WHERE" and palabras[k][0] < fin), None)
+    filtra_fecha = where is not None and any(
+        clave == "SEGMENTS.DATE" and posicion < fin for (posicion, _), clave in zip(palabras[where:], claves[where:])
+    )
+    return gaql[:fin].rstrip(), gaql[fin:].strip(), where is not None, filtra_fecha
+
+
+def con_rango_fechas(gaql: str, desde: date, hasta: date) -> str:
+    """
+    Añade `segments.date BETWEEN desde AND hasta` a la cláusula WHERE de una consulta GAQL.
+
+    Raises:
+        ValueError: Si la consulta ya filtra por segments.date (el rango lo decide el sincronizador).
+    """
+    cabeza, cola, tiene_where, filtra_fecha = _partir_gaql(gaql)
+    if filtra_fecha:
+        raise ValueError("La consulta ya filtra por segments.date; el rango de fechas lo fija la sincronización")
+    condicion = f"segments.date BETWEEN '{desde.isoformat()}' AND '{hasta.isoformat()}'"
+    consulta = f"{cabeza} {'AND' if tiene_where else 'WHERE'} {condicion}"
+    return f"{consulta} {cola}" if cola else consulta
+
+
+def _rango(desde: date, hasta: date) -> List[date]:
+    return [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+
+class _FicherosTemporales:
+    """Ficheros JSONL temporales por fecha, con un máximo de ficheros abiertos a la vez."""
+
+    def __init__(self, carpeta: str, max_abiertos: int = 32):
+        self.carpeta = carpeta
+        self.max_abiertos = max_abiertos
+        self.filas: Dict[str, int] = {}
+        self._abiertos: "OrderedDict[str, object]" = OrderedDict()
+        os.makedirs(carpeta, exist_ok=True)
+
+    def ruta(self, fecha: str) -> str:
+        return os.path.join(self.carpeta, f"{fecha}.jsonl")
+
+    def escribir(self, fecha: str, fila: dict):
+        fichero = self._abiertos.pop(fecha, None)
+        if fichero is None:
+            if len(self._abiertos) >= self.max_abiertos:
+                self._abiertos.popitem(last=False)[1].close()
+            fichero = open(self.ruta(fecha), "a", encoding="utf-8")
+        self._abiertos[fecha] = fichero
+        fichero.write(json.dumps(fila, ensure_ascii=False) + "\n")
+        self.filas[fecha] = self.filas.get(fecha, 0) + 1
+
+    def cerrar(self):
+        for fichero in self._abiertos.values():
+            fichero.close()
+        self._abiertos.clear()
+
+
+class SincronizadorInformesAds:
+    """Sincroniza un informe GAQL por cuenta y fecha, descargando solo las particiones necesarias."""
+
+    def __init__(
+        self,
+        developer_token: str,
+        login_customer_id: str,
+        access_token: str,
+        almacen: AlmacenEstado,
+        directorio: str,
+        dias_retraso: int = 7,
+        formato: str = "parquet",
+        max_concurrencia: int = 5,
+        qps_developer_token: float = None
+    ):
+        """
+        Args:
+            developer_token (str): Token de desarrollador de Google Ads.
+            login_customer_id (str): ID de la cuenta de administrador (MCC).
+            access_token (str | ProveedorTokenOAuth2): Token OAuth2 (Bearer token) o proveedor que
+                lo renueva (recomendado: una sincronización larga puede durar más que el token).
+            almacen (AlmacenEstado): Estado local donde se guarda el manifiesto de particiones.
+            directorio (str): Carpeta raíz del dataset.
+            dias_retraso (int): Días más recientes que se vuelven a descargar siempre
+                (ventana de atribución / retraso de conversiones).
+            formato (str): 'parquet' (requiere pyarrow) o 'jsonl'.
+            max_concurrencia (int): Cuentas sincronizadas a la vez.
+            qps_developer_token (float, opcional): Peticiones/segundo máximas del developer token.
+        """
+        if formato not in ("parquet", "jsonl"):
+            raise ValueError(f"Formato no soportado: {formato}")
+        if formato == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("El formato Parquet requiere pyarrow (pip install pyarrow)") from None
+        self.developer_token = developer_token
+        self.login_customer_id = login_customer_id
+        self.access_token = access_token
+        self.almacen = almacen
+        self.directorio = directorio
+        self.dias_retraso = dias_retraso
+        self.formato = formato
+        self.max_concurrencia = max_concurrencia
+        self.limitador = limitador_developer_token(developer_token, qps_developer_token)
+
+    def fechas_pendientes(self, customer_id: str, desde: date, hasta: date) -> List[date]:
+        """Fechas del rango que hay que (re)descargar: las que faltan más la ventana de retraso."""
+        descargadas = self.almacen.particiones(FUENTE, customer_id)
+        inicio_ventana = hasta - timedelta(days=self.dias_retraso - 1)
+        return [f for f in _rango(desde, hasta) if f >= inicio_ventana or f.isoformat() not in descargadas]
+
+    def ruta_particion(self, customer_id: str, fecha: str) -> str:
+        return os.path.join(self.directorio, f"customer_id={customer_id}", f"fecha={fecha}", f"datos.{self.formato}")
+
+    def _publicar_particion(self, campos: List[str], temporales: _FicherosTemporales, customer_id: str, fecha: str):
+        """Convierte el temporal de una fecha al formato final y lo mueve a su sitio de forma atómica."""
+        destino = self.ruta_particion(customer_id, fecha)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        # Con punto inicial: los lectores de datasets (pyarrow, Spark...) ignoran esos ficheros
+        provisional = os.path.join(os.path.dirname(destino), f".{os.path.basename(destino)}.{uuid.uuid4().hex[:8]}.tmp")
+
+        if self.formato == "jsonl":
+            shutil.move(temporales.ruta(fecha), provisional)
+        else:
+            import pyarrow.parquet as pq
+            from resultados_columnares import ConstructorColumnar
+
+            constructor = ConstructorColumnar(campos, motor="arrow")
+            with open(temporales.ruta(fecha), encoding="utf-8") as f:
+                constructor.anadir_filas(json.loads(linea) for linea in f)
+            pq.write_table(constructor.a_arrow(), provisional)
+
+        os.replace(provisional, destino)
+
+    def _sincronizar_cuenta(self, gaql: str, customer_id: str, fechas: List[date]) -> Dict[str, int]:
+        """Descarga y publica las particiones de una cuenta. Devuelve {fecha: filas}."""
+        # En Parquet la cuenta ya va en la ruta (customer_id=...) y los lectores la añaden como columna
+        campos = campos_select(gaql)
+        conector = GoogleAdsRestConnector(
+            self.developer_token, customer_id, self.access_token, login_customer_id=self.login_customer_id
+        )
+        consulta = con_rango_fechas(gaql, fechas[0], fechas[-1])
+        pendientes = {f.isoformat() for f in fechas}
+        temporales = _FicherosTemporales(os.path.join(self.directorio, ".tmp", f"{customer_id}-{uuid.uuid4().hex[:8]}"))
+
+        try:
+            for fila in conector.search_stream(consulta, limitador=self.limitador, estricto=True):
+                fecha = fila.get("segments.date")
+                # El rango puede incluir fechas ya descargadas (huecos): solo se reescriben las pendientes
+                if fecha in pendientes:
+                    fila["customer_id"] = customer_id
+                    temporales.escribir(fecha, fila)
+            temporales.cerrar()
+
+            resultado = {}
+            for fecha in sorted(pendientes):
+                if temporales.filas.get(fecha):
+                    self._publicar_particion(campos, temporales, customer_id, fecha)
+                elif os.path.exists(self.ruta_particion(customer_id, fecha)):
+                    # La fecha ya no tiene filas: se retira la versión anterior de la partición
+                    os.remove(self.ruta_particion(customer_id, fecha))
+                resultado[fecha] = temporales.filas.get(fecha, 0)
+            self.almacen.registrar_particiones(FUENTE, customer_id, resultado)
+            return resultado
+        finally:
+            temporales.cerrar()
+            shutil.rmtree(temporales.carpeta, ignore_errors=True)
+            try:
+                os.rmdir(os.path.dirname(temporales.carpeta))  # Solo si ya no queda ninguna cuenta en curso
+            except OSError:
+                pass
+
+    def sincronizar(
+        self,
+        gaql: str,
+        customer_ids: List[str],
+        fecha_inicio,
+        fecha_fin=None
+    ) -> Dict[str, dict]:
+        """
+        Sincroniza el informe de varias cuentas en paralelo.
+
+        Args:
+            gaql (str): Consulta GAQL sin filtro de fechas; debe incluir `segments.date` en el SELECT
+                y no filtrar por él en el WHERE (el rango de cada cuenta lo fija la sincronización).
+            customer_ids (list): Cuentas a sincronizar.
+            fecha_inicio (date | str): Primera fecha del histórico que se quiere tener.
+            fecha_fin (date | str, opcional): Última fecha (por defecto, ayer).
+
+        Returns:
+            dict: {customer_id: {"particiones": n, "filas": m}} o {"error": mensaje} si la
+            cuenta falló (su manifiesto no cambia y se reintentará en la próxima ejecución).
+        """
+        if "segments.date" not in campos_select(gaql):
+            raise ValueError("La consulta debe seleccionar segments.date para particionar por fecha")
+        if _partir_gaql(gaql)[3]:
+            raise ValueError("La consulta ya filtra por segments.date; el rango de fechas lo fija la sincronización")
+
+        desde = date.fromisoformat(fecha_inicio) if isinstance(fecha_inicio, str) else fecha_inicio
+        hasta = fecha_fin or date.today() - timedelta(days=1)
+        hasta = date.fromisoformat(hasta) if isinstance(hasta, str) else hasta
+
+        tareas = {}
+        for customer_id in dict.fromkeys(c.replace("-", "") for c in customer_ids):
+            fechas = self.fechas_pendientes(customer_id, desde, hasta)
+            if fechas:
+                tareas[customer_id] = fechas
+
+        print(f"Sincronizando {len(tareas)} cuentas ({sum(len(f) for f in tareas.values())} particiones)...")
+
+        resumen = {c.replace("-", ""): {"particiones": 0, "filas": 0} for c in customer_ids}
+        with ThreadPoolExecutor(max_workers=self.max_concurrencia, thread_name_prefix="sync-google-ads") as executor:
+            futuros = {
+                customer_id: executor.submit(self._sincronizar_cuenta, gaql, customer_id, fechas)
+                for customer_id, fechas in tareas.items()
+            }
+            for customer_id, futuro in futuros.items():
+                try:
+                    particiones = futuro.result()
+                    resumen[customer_id] = {"particiones": len(particiones), "filas": sum(particiones.values())}
+                except Exception as error:
+                    print(f"Error sincronizando la cuenta {customer_id}: {error}")
+                    resumen[customer_id] = {"error": str(error)}
+        return resumen
@@ -0,0 +1,163 @@
+"""
+Deduplicación de Peticiones en Vuelo (Single-Flight)
+====================================================
+
+Cuando varios hilos o tareas piden exactamente la misma URL con los mismos parámetros al
+mismo tiempo, solo el primero ("líder") hace la llamada de red; el resto espera a que
+termine y recibe el mismo resultado.
+
+No es una caché: en cuanto la llamada termina la clave se libera y la siguiente petición
+idéntica vuelve a salir a la red. Solo elimina el trabajo duplicado simultáneo.
+
+Un seguidor puede fijar cuánto está dispuesto a esperar (`tiempo_maximo`): si la llamada
+compartida no termina a tiempo recibe TimeoutError, mientras el líder sigue con la suya.
+
+Uso típico:
+    grupo = GrupoSingleFlight()
+    resultado = grupo.ejecutar(clave, funcion, *args)              # desde hilos
+    resultado = await grupo.ejecutar_async(clave, fabrica_corutina) # desde asyncio
+"""
+
+import asyncio
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+def clave_peticion(
+    metodo: str,
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    opciones: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Clave que identifica una petición idéntica (método, URL, parámetros, cabeceras y opciones).
+    Las cabeceras se incluyen para no compartir respuestas entre credenciales distintas, y las
+    opciones de la llamada (reintentos, timeout, presupuesto...) para que nadie reciba el
+    resultado de una llamada con otras garantías que las que pidió.
+    """
+    return json.dumps(
+        [
+            metodo.upper(), url, sorted((params or {}).items()), sorted((headers or {}).items()),
+            sorted((opciones or {}).items())
+        ],
+        default=str
+    )
+
+
+class _Llamada:
+    """Estado de una llamada en vuelo compartida entre hilos."""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error: Optional[BaseException] = None
+
+
+class GrupoSingleFlight:
+    """Agrupa llamadas idénticas simultáneas en una sola ejecución (hilos y asyncio)."""
+
+    def __init__(self):
+        self._en_vuelo: Dict[str, _Llamada] = {}
+        self._en_vuelo_async: Dict[tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._contadores = {"ejecutadas": 0, "compartidas": 0}
+
+    def ejecutar(
+        self,
+        clave: str,
+        funcion: Callable[..., Any],
+        *args,
+        tiempo_maximo: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Ejecuta `funcion(*args, **kwargs)` salvo que ya haya una llamada en vuelo con la misma
+        clave, en cuyo caso espera a que termine y devuelve su resultado (o relanza su excepción).
+
+        Raises:
+            TimeoutError: Si este llamador es un seguidor y la llamada en vuelo no termina en
+                `tiempo_maximo` segundos (None espera sin límite).
+        """
+        with self._lock:
+            llamada = self._en_vuelo.get(clave)
+            es_lider = llamada is None
+            if es_lider:
+                llamada = _Llamada()
+                self._en_vuelo[clave] = llamada
+                self._contadores["ejecutadas"] += 1
+            else:
+                self._contadores["compartidas"] += 1
+
+        if not es_lider:
+            if not llamada.evento.wait(tiempo_maximo):
+                raise TimeoutError(f"La llamada en vuelo no terminó en {tiempo_maximo} s")
+            if llamada.error is not None:
+                raise llamada.error
+            return llamada.resultado
+
+        try:
+            llamada.resultado = funcion(*args, **kwargs)
+            return llamada.resultado
+        except BaseException as err:
+            llamada.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._en_vuelo[clave]
+            llamada.evento.set()
+
+    async def ejecutar_async(
+        self,
+        clave: str,
+        fabrica: Callable[[], Awaitable[Any]],
+        tiempo_maximo: Optional[float] = None
+    ) -> Any:
+        """
+        Versión asyncio de `ejecutar`. `fabrica` es una función sin argumentos que devuelve el
+        awaitable a ejecutar; solo se invoca en la tarea líder.
+        """
+        loop = asyncio.get_running_loop()
+        clave_loop = (id(loop), clave)
+
+        with self._lock:
+            futuro = self._en_vuelo_async.get(clave_loop)
+            es_lider = futuro is None
+            if es_lider:
+                futuro = loop.create_future()
+                self._en_vuelo_async[clave_loop] = futuro
+                self._contadores["ejecutadas"] += 1
+            else:
+                self._contadores["compartidas"] += 1
+
+        if not es_lider:
+            # shield: si cancelan a un seguidor no se cancela la llamada compartida
+            try:
+                return await asyncio.wait_for(asyncio.shield(futuro), tiempo_maximo)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"La llamada en vuelo no terminó en {tiempo_maximo} s") from None
+
+        try:
+            resultado = await fabrica()
+            futuro.set_result(resultado)
+            return resultado
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except BaseException as err:
+            futuro.set_exception(err)
+            futuro.exception()  # Marcamos la excepción como recuperada aunque no haya seguidores
+            raise
+        finally:
+            with self._lock:
+                del self._en_vuelo_async[clave_loop]
+
+    def estadisticas(self) -> Dict[str, int]:
+        """Llamadas realmente ejecutadas y llamadas que reutilizaron un resultado en vuelo."""
+        with self._lock:
+            return dict(self._contadores)
+
+
+# Grupo compartido para las peticiones GET de realizar_peticion_segura
+grupo_peticiones = GrupoSingleFlight()
@@ -0,0 +1,205 @@
+"""
+Decodificación Incremental de JSON (Streaming)
+==============================================
+
+`respuesta.json()` necesita el cuerpo completo en memoria y lo convierte de una vez en
+objetos Python: con respuestas grandes el pico de memoria es varias veces el tamaño del
+cuerpo. Este módulo recorre el cuerpo a trozos (`iter_content`) y entrega, uno a uno, los
+elementos de un array concreto del documento, por lo que la memoria usada depende del
+tamaño de un elemento y no del de la respuesta.
+
+La ruta del array se indica con claves separadas por puntos y '*' para "cada elemento":
+    'data.*'          -> cada elemento de {"data": [...]}               (Meta Graph API)
+    'results.*'       -> cada elemento de {"results": [...]}            (Google Ads search)
+    '*.results.*'     -> cada fila de [{"results": [...]}, ...]         (Google Ads searchStream)
+    '*'               -> cada elemento de un array raíz
+
+Uso típico:
+    for post in iterar_items_json(respuesta, "data.*"):
+        ...
+"""
+
+import codecs
+import json
+from typing import Any, Iterator, List
+
+import requests
+
+_ESPACIOS = " \t\n\r"
+_DELIMITADORES = _ESPACIOS + ",:]}"
+
+
+class ParserArrayJSON:
+    """
+    Parser incremental que extrae los elementos de un array situado en una ruta del documento.
+    Se alimenta con texto en trozos arbitrarios mediante `alimentar`.
+    """
+
+    def __init__(self, ruta: str):
+        """
+        Args:
+            ruta (str): Ruta del array terminada en '*', p.ej. 'data.*'.
+        """
+        self.ruta = ruta.split(".")
+        if self.ruta[-1] != "*":
+            raise ValueError(f"La ruta debe terminar en '*' (elementos de un array): {ruta}")
+
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        # Pila de contenedores abiertos: [tipo ('obj' | 'arr'), clave actual ('*' en arrays)]
+        self._pila: List[list] = []
+        self._esperando = "valor"
+
+    # --- Utilidades de ruta ---
+
+    def _ruta_actual(self) -> List[str]:
+        return [marco[1] for marco in self._pila]
+
+    def _coincide(self, actual: List[str], longitud: int) -> bool:
+        return all(actual[i] == self.ruta[i] for i in range(longitud))
+
+    # --- Máquina de estados ---
+
+    def _decodificar(self, final: bool):
+        """Decodifica un valor completo desde la posición actual. Devuelve (ok, valor)."""
+        try:
+            valor, fin = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return False, None
+        # Un número cortado ('-25' de '-2500.5') parece válido: exigimos ver el delimitador siguiente
+        if not final and (fin == len(self._buffer) or self._buffer[fin] not in _DELIMITADORES):
+            return False, None
+        self._pos = fin
+        return True, valor
+
+    def _despues_de_valor(self):
+        self._esperando = "coma_o_fin" if self._pila else "fin"
+
+    def _cerrar_contenedor(self):
+        self._pila.pop()
+        self._despues_de_valor()
+
+    def alimentar(self, texto: str, final: bool = False) -> List[Any]:
+        """
+        Procesa un nuevo trozo de texto.
+
+        Args:
+            texto (str): Siguiente fragmento del documento JSON.
+            final (bool): True si es el último fragmento.
+
+        Returns:
+            list: Elementos del array objetivo completados en este trozo.
+        """
+        self._buffer = self._buffer[self._pos:] + texto
+        self._pos = 0
+        elementos = []
+
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _ESPACIOS:
+                self._pos += 1
+            if self._pos >= len(self._buffer) or self._esperando == "fin":
+                break
+
+            caracter = self._buffer[self._pos]
+            estado = self._esperando
+
+            if estado in ("clave_o_fin", "valor_o_fin") and caracter in "}]":
+                self._pos += 1
+                self._cerrar_contenedor()
+
+            elif estado in ("clave_o_fin", "clave"):
+                if caracter != '"':
+                    raise ValueError(f"JSON inválido: se esperaba una clave en la posición {self._pos}")
+                ok, clave = self._decodificar(final)
+                if not ok:
+                    break
+                self._pila[-1][1] = clave
+                self._esperando = "dos_puntos"
+
+            elif estado == "dos_puntos":
+                if caracter != ":":
+                    raise ValueError(f"JSON inválido: se esperaba ':' en la posición {self._pos}")
+                self._pos += 1
+                self._esperando = "valor"
+
+            elif estado == "coma_o_fin":
+                if caracter == ",":
+                    self._pos += 1
+                    self._esperando = "clave" if self._pila[-1][0] == "obj" else "valor"
+                elif caracter in "}]":
+                    self._pos += 1
+                    self._cerrar_contenedor()
+                else:
+                    raise ValueError(f"JSON inválido: se esperaba ',' o cierre en la posición {self._pos}")
+
+            else:  # "valor" / "valor_o_fin"
+                actual = self._ruta_actual()
+                if len(actual) == len(self.ruta) and self._coincide(actual, len(actual)):
+                    # Elemento del array objetivo: lo decodificamos completo y lo entregamos
+                    ok, valor = self._decodificar(final)
+                    if not ok:
+                        break
+                    elementos.append(valor)
+                    self._despues_de_valor()
+                elif len(actual) < len(self.ruta) and self._coincide(actual, len(actual)) and caracter in "{[":
+                    # Contenedor en el camino hacia el array objetivo: entramos en él
+                    siguiente = self.ruta[len(actual)]
+                    if caracter == "{" and siguiente != "*":
+                        self._pila.append(["obj", None])
+                        self._esperando = "clave_o_fin"
+                        self._pos += 1
+                    elif caracter == "[" and siguiente == "*":
+                        self._pila.append(["arr", "*"])
+                        self._esperando = "valor_o_fin"
+                        self._pos += 1
+                    else:
+                        ok, _ = self._decodificar(final)
+                        if not ok:
+                            break
+                        self._despues_de_valor()
+                else:
+                    # Valor fuera de la ruta (p.ej. 'paging'): se decodifica y se descarta
+                    ok, _ = self._decodificar(final)
+                    if not ok:
+                        break
+                    self._despues_de_valor()
+
+        if final and self._esperando != "fin":
+            raise ValueError("JSON incompleto: la respuesta terminó antes de cerrar el documento")
+        return elementos
+
+
+def iterar_items_json(respuesta: requests.Response, ruta: str, tamano_chunk: int = 65536) -> Iterator[Any]:
+    """
+    Generador que entrega los elementos del array `ruta` de una respuesta abierta con stream=True.
+    La respuesta se cierra (y su conexión vuelve al pool) al agotar o abandonar el generador.
+
+    Args:
+        respuesta (requests.Response): Respuesta obtenida con `stream=True`.
+        ruta (str): Ruta del array, p.ej. 'data.*'.
+        tamano_chunk (int): Bytes leídos de la red en cada iteración.
+
+    Yields:
+        Cada elemento del array, ya convertido a objeto Python.
+    """
+    parser = ParserArrayJSON(ruta)
+    decodificador = codecs.getincrementaldecoder(respuesta.encoding or "utf-8")()
+    try:
+        for chunk in respuesta.iter_content(chunk_size=tamano_chunk):
+            yield from parser.alimentar(decodificador.decode(chunk))
+        yield from parser.alimentar(decodificador.decode(b"", final=True), final=True)
+    finally:
+        respuesta.close()
+
+
+if __name__ == "__main__":
+    documento = '{"data": [{"id": 1, "message": "hola"}, {"id": 2, "message": "adiós"}], "paging": {"next": null}}'
+    parser = ParserArrayJSON("data.*")
+    # Lo alimentamos de 7 en 7 caracteres para simular trozos de red
+    for inicio in range(0, len(documento), 7):
+        for elemento in parser.alimentar(documento[inicio:inicio + 7]):
+            print("Elemento:", elemento)
+    parser.alimentar("", final=True)
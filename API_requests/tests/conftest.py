@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos de API_requests se importan por su nombre, como en los scripts de la carpeta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servidor_stub import ConfiguracionStub, ServidorStub  # noqa: E402
+
+
+@pytest.fixture
+def servidor():
+    """Servidor stub local con un escenario normal ('api') y otro que exige token ('privado')."""
+    with ServidorStub({
+        "api": ConfiguracionStub(),
+        "privado": ConfiguracionStub(exigir_token=True, posts_por_pagina=3, tamano_payload=9),
+    }) as stub:
+        yield stub
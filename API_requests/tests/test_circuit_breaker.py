@@ -0,0 +1,68 @@
+import time
+
+from circuit_breaker import (
+    ABIERTO, CERRADO, CIRCUITO_ABIERTO, SEMIABIERTO, CircuitBreaker, RegistroCircuitos
+)
+
+
+def _abrir(circuito, fallos):
+    for _ in range(fallos):
+        assert circuito.permitir()
+        circuito.registrar_resultado(False)
+
+
+def test_se_abre_al_superar_el_umbral():
+    circuito = CircuitBreaker("host", umbral_fallos=0.5, minimo_peticiones=4)
+    circuito.registrar_resultado(True)
+    _abrir(circuito, 2)
+    assert circuito.estado == CERRADO  # Solo 3 resultados: aún no se evalúa
+    _abrir(circuito, 1)
+    assert circuito.estado == ABIERTO
+    assert not circuito.permitir()
+    assert circuito.estadisticas()["rechazadas"] == 1
+
+
+def test_semiabierto_limita_las_sondas_y_cierra_con_exito():
+    circuito = CircuitBreaker("host", minimo_peticiones=1, tiempo_apertura=0.05)
+    _abrir(circuito, 1)
+    time.sleep(0.06)
+
+    assert circuito.permitir()
+    assert circuito.estado == SEMIABIERTO
+    assert not circuito.permitir()  # Solo una sonda a la vez
+
+    circuito.cancelar_permiso()
+    assert circuito.permitir()
+    circuito.registrar_resultado(True)
+    assert circuito.estado == CERRADO
+
+
+def test_sonda_fallida_vuelve_a_abrir():
+    circuito = CircuitBreaker("host", minimo_peticiones=1, tiempo_apertura=0.05)
+    _abrir(circuito, 1)
+    time.sleep(0.06)
+    assert circuito.permitir()
+    circuito.registrar_resultado(False)
+    assert circuito.estado == ABIERTO
+
+
+def test_resultados_antiguos_no_cuentan():
+    circuito = CircuitBreaker("host", minimo_peticiones=2, ventana_segundos=0.05)
+    circuito.registrar_resultado(False)
+    time.sleep(0.06)
+    circuito.registrar_resultado(False)
+    assert circuito.estado == CERRADO
+
+
+def test_registro_notifica_transiciones():
+    registro = RegistroCircuitos(minimo_peticiones=1)
+    transiciones = []
+    registro.al_cambiar_estado(lambda nombre, anterior, nuevo: transiciones.append((nombre, anterior, nuevo)))
+    _abrir(registro.obtener("api.ejemplo.com"), 1)
+    assert transiciones == [("api.ejemplo.com", CERRADO, ABIERTO)]
+    assert registro.obtener("api.ejemplo.com") is registro.obtener("api.ejemplo.com")
+
+
+def test_circuito_abierto_es_falso():
+    assert not CIRCUITO_ABIERTO
+    assert CIRCUITO_ABIERTO is not None
@@ -0,0 +1,41 @@
+import pytest
+
+from conector_base import (
+    ApiKeyParametro, BaseConnector, PaginacionNextLink, _AutenticacionConCredencial, dividir_en_lotes
+)
+from tokens_oauth2 import ProveedorTokenOAuth2
+
+
+def test_estrategia_sin_formatear_es_abstracta():
+    class Incompleta(_AutenticacionConCredencial):
+        pass
+
+    with pytest.raises(TypeError):
+        Incompleta("token")
+
+
+def test_dividir_en_lotes():
+    assert dividir_en_lotes(list(range(5)), 2) == [[0, 1], [2, 3], [4]]
+
+
+def test_paginas_next_usan_el_token_vigente(servidor):
+    escenario = servidor.escenarios["privado"]
+    proveedor = ProveedorTokenOAuth2(
+        f"{servidor.url_base}/privado/token", "cliente", "secreto", renovar_en_segundo_plano=False
+    )
+
+    class Conector(BaseConnector):
+        BASE_URL = f"{servidor.url_base}/privado/v19.0"
+        PAGINACION = PaginacionNextLink("data", "paging.next")
+
+    conector = Conector(ApiKeyParametro(proveedor, "access_token"))
+    posts = []
+    for post in conector.paginar("GET", "pagina/posts", prefetch=False, estricto=True):
+        posts.append(post["id"])
+        if len(posts) == 3:
+            # El token rota a mitad del recorrido: el de los enlaces 'next' deja de valer
+            escenario.tokens.clear()
+            proveedor.invalidar()
+
+    assert posts == [f"post_{i}" for i in range(9)]
+    assert proveedor.renovaciones == 2
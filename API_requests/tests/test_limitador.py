@@ -0,0 +1,86 @@
+import time
+
+import requests
+
+from limitador import LimitadorTokenBucket, RegistroLimitadores, leer_retry_after, leer_uso_meta
+
+
+def _respuesta(codigo=200, **cabeceras):
+    respuesta = requests.Response()
+    respuesta.status_code = codigo
+    respuesta.headers.update(cabeceras)
+    return respuesta
+
+
+def test_cubo_limita_la_tasa():
+    limitador = LimitadorTokenBucket(tasa=20, capacidad=1)
+    inicio = time.monotonic()
+    for _ in range(5):
+        assert limitador.adquirir()
+    # El primer token está disponible; los otros 4 llegan a 20 por segundo
+    assert time.monotonic() - inicio >= 0.18
+
+
+def test_adquirir_no_espera_en_vano_si_no_alcanza_el_tiempo():
+    limitador = LimitadorTokenBucket(tasa=1, capacidad=1)
+    assert limitador.adquirir()
+    inicio = time.monotonic()
+    assert not limitador.adquirir(tiempo_maximo=0.1)
+    assert time.monotonic() - inicio < 0.05
+
+
+def test_hosts_sin_configurar_no_se_frenan():
+    registro = RegistroLimitadores()
+    limitador = registro.obtener("api.sin-limite.com")
+    inicio = time.monotonic()
+    for _ in range(1000):
+        assert limitador.adquirir(tiempo_maximo=0)
+    assert time.monotonic() - inicio < 0.5
+
+    # Las pausas que pide el proveedor se respetan igualmente
+    limitador.actualizar_desde_respuesta(_respuesta(429, **{"Retry-After": "5"}))
+    assert not limitador.adquirir(tiempo_maximo=0.1)
+    assert limitador.tasa is None
+
+
+def test_solo_se_frenan_los_hosts_configurados():
+    registro = RegistroLimitadores()
+    registro.configurar("api.limitada.com", tasa=1, capacidad=1)
+    assert registro.obtener("api.limitada.com").adquirir(tiempo_maximo=0)
+    assert not registro.obtener("api.limitada.com").adquirir(tiempo_maximo=0)
+    assert registro.obtener("otra.com").adquirir(tiempo_maximo=0)
+
+
+def test_aimd_reduce_a_la_mitad_y_aumenta():
+    limitador = LimitadorTokenBucket(tasa=8, tasa_maxima=10, incremento=0.5)
+    limitador.actualizar_desde_respuesta(_respuesta(429, **{"Retry-After": "0"}))
+    assert limitador.tasa == 4
+    limitador.actualizar_desde_respuesta(_respuesta(200))
+    assert limitador.tasa == 4.5
+
+
+def test_uso_de_meta_frena_en_proporcion():
+    limitador = LimitadorTokenBucket(tasa=10, uso_objetivo=80)
+    limitador.actualizar_desde_respuesta(_respuesta(200, **{"X-App-Usage": '{"call_count": 100, "total_time": 20}'}))
+    assert limitador.tasa == 5  # 100% de uso: se para el host y se reduce a la mitad
+    limitador.actualizar_desde_respuesta(_respuesta(200, **{"X-App-Usage": '{"call_count": 90}'}))
+    assert abs(limitador.tasa - 5 * 80 / 90) < 1e-9
+
+
+def test_leer_cabeceras():
+    assert leer_retry_after(_respuesta(429, **{"Retry-After": "3"})) == 3
+    assert leer_retry_after(_respuesta(429, **{"Retry-After": "no-es-fecha"})) is None
+    assert leer_retry_after(_respuesta(429, **{"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0
+    uso, espera = leer_uso_meta(_respuesta(200, **{
+        "X-Business-Use-Case-Usage": '{"1": [{"call_count": 50, "estimated_time_to_regain_access": 2}]}'
+    }))
+    assert (uso, espera) == (50, 120)
+
+
+def test_ajustar_conserva_los_tokens_gastados():
+    registro = RegistroLimitadores()
+    registro.ajustar("cuota", tasa=1, capacidad=1)
+    assert registro.obtener("cuota").adquirir(tiempo_maximo=0)
+    registro.ajustar("cuota", tasa=1, capacidad=1)
+    registro.ajustar("cuota", tasa=1, capacidad=2)
+    assert not registro.obtener("cuota").adquirir(tiempo_maximo=0)
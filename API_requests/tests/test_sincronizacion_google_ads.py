@@ -0,0 +1,45 @@
+from datetime import date
+
+import pytest
+
+from sincronizacion_google_ads import con_rango_fechas
+
+DESDE, HASTA = date(2024, 1, 1), date(2024, 1, 31)
+RANGO = "segments.date BETWEEN '2024-01-01' AND '2024-01-31'"
+
+
+def test_sin_where():
+    gaql = "SELECT campaign.id, segments.date, metrics.clicks FROM campaign"
+    assert con_rango_fechas(gaql, DESDE, HASTA) == f"{gaql} WHERE {RANGO}"
+
+
+def test_con_where_y_clausulas_finales():
+    gaql = "SELECT campaign.id, segments.date FROM campaign WHERE campaign.status = 'ENABLED' ORDER BY campaign.id LIMIT 10"
+    assert con_rango_fechas(gaql, DESDE, HASTA) == (
+        f"SELECT campaign.id, segments.date FROM campaign WHERE campaign.status = 'ENABLED' AND {RANGO}"
+        " ORDER BY campaign.id LIMIT 10"
+    )
+
+
+def test_palabras_clave_dentro_de_literales():
+    gaql = (
+        "SELECT campaign.id, segments.date FROM campaign"
+        " WHERE campaign.name = 'Promo ORDER BY LIMIT' AND ad_group.name LIKE \"%where segments.date%\""
+    )
+    assert con_rango_fechas(gaql, DESDE, HASTA) == f"{gaql} AND {RANGO}"
+
+    gaql = "SELECT campaign.id, segments.date FROM campaign WHERE campaign.name = 'it\\'s LIMIT' PARAMETERS include_drafts=true"
+    assert con_rango_fechas(gaql, DESDE, HASTA) == (
+        f"SELECT campaign.id, segments.date FROM campaign WHERE campaign.name = 'it\\'s LIMIT' AND {RANGO}"
+        " PARAMETERS include_drafts=true"
+    )
+
+
+def test_rechaza_consultas_que_ya_filtran_por_fecha():
+    with pytest.raises(ValueError):
+        con_rango_fechas("SELECT segments.date FROM campaign WHERE segments.date DURING LAST_7_DAYS", DESDE, HASTA)
+    with pytest.raises(ValueError):
+        con_rango_fechas(
+            "SELECT segments.date FROM campaign WHERE campaign.id = 1 AND SEGMENTS.DATE >= '2024-01-01' LIMIT 5",
+            DESDE, HASTA
+        )
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from single_flight import GrupoSingleFlight, clave_peticion
+from utils_requests import realizar_peticion_segura
+
+
+def test_llamadas_simultaneas_comparten_resultado():
+    grupo = GrupoSingleFlight()
+    liberar = threading.Event()
+    llamadas = []
+
+    def lenta():
+        llamadas.append(1)
+        liberar.wait(5)
+        return "resultado"
+
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(grupo.ejecutar("clave", lenta))) for _ in range(5)]
+    for hilo in hilos:
+        hilo.start()
+    time.sleep(0.1)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join()
+
+    assert resultados == ["resultado"] * 5
+    assert len(llamadas) == 1
+    assert grupo.estadisticas() == {"ejecutadas": 1, "compartidas": 4}
+
+
+def test_error_del_lider_llega_a_los_seguidores():
+    grupo = GrupoSingleFlight()
+    liberar = threading.Event()
+
+    def falla():
+        liberar.wait(5)
+        raise ValueError("fallo")
+
+    errores = []
+
+    def seguidor():
+        try:
+            grupo.ejecutar("clave", falla)
+        except ValueError as error:
+            errores.append(error)
+
+    lider = threading.Thread(target=seguidor)
+    lider.start()
+    time.sleep(0.05)
+    otro = threading.Thread(target=seguidor)
+    otro.start()
+    time.sleep(0.05)
+    liberar.set()
+    lider.join()
+    otro.join()
+    assert len(errores) == 2
+
+
+def test_seguidor_espera_como_mucho_tiempo_maximo():
+    grupo = GrupoSingleFlight()
+    liberar = threading.Event()
+    lider = threading.Thread(target=grupo.ejecutar, args=("clave", lambda: liberar.wait(5)))
+    lider.start()
+    time.sleep(0.05)
+
+    inicio = time.monotonic()
+    with pytest.raises(TimeoutError):
+        grupo.ejecutar("clave", lambda: None, tiempo_maximo=0.1)
+    assert time.monotonic() - inicio < 1
+
+    liberar.set()
+    lider.join()
+
+
+def test_seguidor_async_espera_como_mucho_tiempo_maximo():
+    grupo = GrupoSingleFlight()
+
+    async def principal():
+        lider = asyncio.ensure_future(grupo.ejecutar_async("clave", lambda: asyncio.sleep(1, "lider")))
+        await asyncio.sleep(0.01)
+        with pytest.raises(TimeoutError):
+            await grupo.ejecutar_async("clave", lambda: asyncio.sleep(0), tiempo_maximo=0.05)
+        assert await lider == "lider"
+
+    asyncio.run(principal())
+
+
+def test_la_clave_incluye_las_opciones():
+    base = clave_peticion("GET", "https://api.ejemplo.com/x", {"A": "1"}, {"p": 1}, {"timeout": 30})
+    assert base == clave_peticion("get", "https://api.ejemplo.com/x", {"A": "1"}, {"p": 1}, {"timeout": 30})
+    assert base != clave_peticion("GET", "https://api.ejemplo.com/x", {"A": "1"}, {"p": 1}, {"timeout": 5})
+    assert base != clave_peticion("GET", "https://api.ejemplo.com/x", {"A": "2"}, {"p": 1}, {"timeout": 30})
+
+
+def test_deduplicacion_desactivada_por_defecto(servidor):
+    url = f"{servidor.url_base}/api/eco"
+    escenario = servidor.escenarios["api"]
+    respuestas = []
+    hilos = [threading.Thread(target=lambda: respuestas.append(realizar_peticion_segura("GET", url))) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert all(respuestas)
+    assert len({id(r) for r in respuestas}) == 4
+    assert escenario.peticiones == 4
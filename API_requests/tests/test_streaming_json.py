@@ -0,0 +1,53 @@
+import json
+
+import pytest
+import requests
+
+from streaming_json import ParserArrayJSON, iterar_items_json
+from utils_requests import realizar_peticion_segura
+
+DOCUMENTO = json.dumps({
+    "data": [{"id": 1, "texto": "hola, [mundo]"}, {"id": 2, "importe": -2500.5, "texto": "adiós \"}\""}, 3],
+    "paging": {"next": None, "data": ["no", "es", "el", "array"]},
+})
+
+
+def _alimentar_a_trozos(parser, texto, tamano):
+    elementos = []
+    for inicio in range(0, len(texto), tamano):
+        elementos.extend(parser.alimentar(texto[inicio:inicio + tamano]))
+    elementos.extend(parser.alimentar("", final=True))
+    return elementos
+
+
+@pytest.mark.parametrize("tamano", [1, 2, 7, 1000])
+def test_elementos_iguales_con_cualquier_troceado(tamano):
+    esperado = json.loads(DOCUMENTO)["data"]
+    assert _alimentar_a_trozos(ParserArrayJSON("data.*"), DOCUMENTO, tamano) == esperado
+
+
+def test_rutas_anidadas_y_array_raiz():
+    stream = json.dumps([{"results": [1, 2]}, {"results": []}, {"results": [3]}])
+    assert _alimentar_a_trozos(ParserArrayJSON("*.results.*"), stream, 3) == [1, 2, 3]
+    assert _alimentar_a_trozos(ParserArrayJSON("*"), "[1, 2, 3]", 1) == [1, 2, 3]
+
+
+def test_errores():
+    with pytest.raises(ValueError):
+        ParserArrayJSON("data")
+    with pytest.raises(ValueError):
+        _alimentar_a_trozos(ParserArrayJSON("data.*"), '{"data": [1, 2', 4)
+
+
+def test_respuesta_en_streaming(servidor):
+    url = f"{servidor.url_base}/api/v19.0/pagina/posts"
+    elementos = realizar_peticion_segura("GET", url, ruta_stream="data.*")
+    assert [elemento["id"] for elemento in elementos] == [f"post_{i}" for i in range(10)]
+
+
+def test_iterar_items_cierra_la_respuesta(servidor):
+    respuesta = requests.get(f"{servidor.url_base}/api/v19.0/pagina/posts", stream=True)
+    elementos = iterar_items_json(respuesta, "data.*", tamano_chunk=16)
+    next(elementos)
+    elementos.close()
+    assert respuesta.raw.closed
@@ -0,0 +1,31 @@
+from conector_base import AutenticacionBearer, BaseConnector
+from tokens_oauth2 import ProveedorTokenOAuth2, proveedor_oauth2
+
+
+def test_proveedor_compartido_por_cuenta():
+    url = "https://login.ejemplo.com/token"
+    cuenta_a = proveedor_oauth2(url, "app", "secreto", refresh_token="refresh-a")
+    cuenta_b = proveedor_oauth2(url, "app", "secreto", refresh_token="refresh-b")
+
+    assert cuenta_a is not cuenta_b
+    assert proveedor_oauth2(url, "app", "secreto", refresh_token="refresh-a") is cuenta_a
+    assert proveedor_oauth2(url, "app", "secreto") is proveedor_oauth2(url, "app", "secreto")
+
+
+def test_401_invalida_el_token(servidor):
+    escenario = servidor.escenarios["privado"]
+    proveedor = ProveedorTokenOAuth2(
+        f"{servidor.url_base}/privado/token", "cliente", "secreto", renovar_en_segundo_plano=False
+    )
+
+    class Conector(BaseConnector):
+        BASE_URL = f"{servidor.url_base}/privado"
+
+    conector = Conector(AutenticacionBearer(proveedor))
+    assert conector.peticion("GET", "eco", intentos_maximos=1)
+
+    # El servidor revoca el token antes de que caduque
+    escenario.tokens.clear()
+    assert not conector.peticion("GET", "eco", intentos_maximos=1)
+    assert conector.peticion("GET", "eco", intentos_maximos=1)
+    assert proveedor.renovaciones == 2
@@ -0,0 +1,265 @@
+"""
+Proveedor de Tokens OAuth2 con Renovación Anticipada
+====================================================
+
+Los tokens de acceso OAuth2 (Google Ads, Microsoft Graph...) caducan al cabo de ~1 hora.
+Pasar a los conectores un token fijo obliga a elegir entre que un proceso largo falle a
+mitad o pedir un token nuevo para cada llamada. `ProveedorTokenOAuth2` guarda el token
+vigente y lo renueva él solo:
+
+- Antes de que caduque (`margen_renovacion` segundos antes) lo renueva en segundo plano,
+  sin bloquear a quien lo está usando.
+- Si aun así se llega a usar caducado (p.ej. tras una suspensión del equipo), quien lo pide
+  espera a la renovación.
+- Las renovaciones simultáneas (varios hilos, tareas asyncio o el temporizador de fondo)
+  se agrupan en una sola llamada al endpoint de tokens (single-flight).
+
+`proveedor_oauth2(...)` devuelve un proveedor compartido por (endpoint, client_id, scope y
+refresh token), de modo que todos los conectores de un proceso que actúan con la misma
+cuenta reutilizan el mismo token. Los conectores llaman a `invalidar()` cuando reciben un
+401, para que un token revocado no se siga usando hasta su caducidad.
+
+Los conectores aceptan indistintamente un token (str) o cualquier objeto con un método
+`obtener_token()` (ver `resolver_token`).
+
+Uso típico:
+    # Microsoft Graph (client credentials)
+    proveedor = proveedor_oauth2(
+        f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token",
+        CLIENT_ID, CLIENT_SECRET, scope="https://graph.microsoft.com/.default"
+    )
+    # Google Ads (refresh token)
+    proveedor = proveedor_oauth2(
+        "https://oauth2.googleapis.com/token", CLIENT_ID, CLIENT_SECRET, refresh_token=REFRESH_TOKEN
+    )
+    conector = GoogleAdsRestConnector(DEV_TOKEN, CUSTOMER_ID, proveedor)
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from single_flight import GrupoSingleFlight
+from utils_requests import realizar_peticion_segura
+
+logger = logging.getLogger(__name__)
+
+# Si el endpoint no indica la duración del token
+EXPIRACION_POR_DEFECTO = 3600
+
+
+@dataclass
+class TokenAcceso:
+    """Token vigente, su caducidad (en tiempo de `time.monotonic()`) y su margen de renovación."""
+
+    valor: str
+    expira: float
+    margen: float
+
+
+class ProveedorTokenOAuth2:
+    """Obtiene, cachea y renueva un token de acceso OAuth2. Seguro entre hilos y tareas asyncio."""
+
+    def __init__(
+        self,
+        url_token: str,
+        client_id: str,
+        client_secret: Optional[str] = None,
+        scope: Optional[str] = None,
+        refresh_token: Optional[str] = None,
+        margen_renovacion: float = 300,
+        renovar_en_segundo_plano: bool = True
+    ):
+        """
+        Args:
+            url_token (str): Endpoint de tokens del servidor de autorización.
+            client_id (str): ID de la aplicación (cliente OAuth2).
+            client_secret (str, opcional): Secreto de la aplicación.
+            scope (str, opcional): Ámbito(s) pedidos, separados por espacios.
+            refresh_token (str, opcional): Si se indica se usa el flujo 'refresh_token'; si no,
+                'client_credentials'.
+            margen_renovacion (float): Segundos antes de la caducidad a partir de los que el
+                token se renueva en segundo plano (como mucho, la mitad de la vida del token).
+            renovar_en_segundo_plano (bool): Si es True, un temporizador renueva el token antes
+                de que caduque aunque nadie lo esté pidiendo (útil en procesos largos con pausas).
+        """
+        self.url_token = url_token
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scope = scope
+        self.refresh_token = refresh_token
+        self.margen_renovacion = margen_renovacion
+        self.renovar_en_segundo_plano = renovar_en_segundo_plano
+        self.renovaciones = 0
+
+        self._token: Optional[TokenAcceso] = None
+        self._lock = threading.Lock()
+        self._grupo = GrupoSingleFlight()
+        self._temporizador: Optional[threading.Timer] = None
+        self._renovando_en_fondo = False
+
+    # --- Obtención del token ---
+
+    def obtener_token(self) -> str:
+        """
+        Devuelve un token válido. Solo bloquea si no hay token o ya ha caducado; si está a punto
+        de caducar devuelve el actual y lanza la renovación en segundo plano.
+
+        Raises:
+            ConnectionError: Si no se pudo obtener un token del endpoint.
+        """
+        token = self._token
+        if token is not None:
+            restante = token.expira - time.monotonic()
+            if restante > token.margen:
+                return token.valor
+            if restante > 0:
+                self._renovar_en_fondo()
+                return token.valor
+        return self._grupo.ejecutar("token", self._renovar).valor
+
+    async def obtener_token_async(self) -> str:
+        """Versión asyncio de `obtener_token`: si hay que esperar la renovación no bloquea el bucle."""
+        token = self._token
+        if token is not None and token.expira - time.monotonic() > token.margen:
+            return token.valor
+        # En un hilo del executor: así la renovación se comparte también con los hilos que la piden
+        return await asyncio.get_running_loop().run_in_executor(None, self.obtener_token)
+
+    def cabeceras(self) -> Dict[str, str]:
+        """Cabecera Authorization con el token vigente."""
+        return {"Authorization": f"Bearer {self.obtener_token()}"}
+
+    def invalidar(self):
+        """Descarta el token actual (p.ej. tras un 401): la próxima llamada pedirá uno nuevo."""
+        with self._lock:
+            self._token = None
+
+    def detener(self):
+        """Cancela la renovación programada en segundo plano."""
+        with self._lock:
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+            self.renovar_en_segundo_plano = False
+
+    # --- Renovación ---
+
+    def _renovar(self) -> TokenAcceso:
+        """Pide un token nuevo al endpoint (llamado siempre a través de single-flight)."""
+        formulario = {"client_id": self.client_id}
+        if self.client_secret:
+            formulario["client_secret"] = self.client_secret
+        if self.refresh_token:
+            formulario.update(grant_type="refresh_token", refresh_token=self.refresh_token)
+        else:
+            formulario["grant_type"] = "client_credentials"
+        if self.scope:
+            formulario["scope"] = self.scope
+
+        inicio = time.monotonic()
+        respuesta = realizar_peticion_segura("POST", self.url_token, data=formulario, deduplicar=False)
+        if not respuesta:
+            raise ConnectionError(f"No se pudo obtener un token de {self.url_token} para el cliente {self.client_id}")
+
+        datos = respuesta.json()
+        # La caducidad se cuenta desde que se envió la petición, no desde que llegó la respuesta
+        duracion = float(datos.get("expires_in") or EXPIRACION_POR_DEFECTO)
+        # Con tokens de vida corta el margen no puede cubrir toda la duración: se renovaría sin parar
+        token = TokenAcceso(datos["access_token"], inicio + duracion, min(self.margen_renovacion, duracion * 0.5))
+        with self._lock:
+            self._token = token
+            self.renovaciones += 1
+            # Algunos servidores rotan el refresh token en cada uso
+            if datos.get("refresh_token"):
+                self.refresh_token = datos["refresh_token"]
+        self._programar_renovacion(token)
+        return token
+
+    def _renovar_en_fondo(self):
+        """Lanza una renovación en un hilo aparte, salvo que ya haya una en marcha."""
+        with self._lock:
+            if self._renovando_en_fondo:
+                return
+            self._renovando_en_fondo = True
+
+        def _tarea():
+            try:
+                self._grupo.ejecutar("token", self._renovar)
+            except Exception as error:
+                # El token actual sigue valiendo hasta que caduque; entonces se reintentará en primer plano
+                logger.warning(f"No se pudo renovar en segundo plano el token de {self.client_id}: {error}")
+            finally:
+                with self._lock:
+                    self._renovando_en_fondo = False
+
+        threading.Thread(target=_tarea, name=f"renovacion-token-{self.client_id}", daemon=True).start()
+
+    def _programar_renovacion(self, token: TokenAcceso):
+        with self._lock:
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+            if not self.renovar_en_segundo_plano:
+                return
+            espera = max(0.0, token.expira - token.margen - time.monotonic())
+            self._temporizador = threading.Timer(espera, self._renovar_en_fondo)
+            self._temporizador.daemon = True
+            self._temporizador.start()
+
+
+def resolver_token(token: Any) -> str:
+    """Devuelve el token en texto tanto si se recibe un str como un proveedor con `obtener_token()`."""
+    return token.obtener_token() if hasattr(token, "obtener_token") else token
+
+
+async def resolver_token_async(token: Any) -> str:
+    """Versión asyncio de `resolver_token`."""
+    if hasattr(token, "obtener_token_async"):
+        return await token.obtener_token_async()
+    return resolver_token(token)
+
+
+# --- Registro global de proveedores ---
+
+_proveedores: Dict[Tuple[str, str, Optional[str], Optional[str]], ProveedorTokenOAuth2] = {}
+_lock_proveedores = threading.Lock()
+
+
+def proveedor_oauth2(
+    url_token: str,
+    client_id: str,
+    client_secret: Optional[str] = None,
+    scope: Optional[str] = None,
+    **opciones
+) -> ProveedorTokenOAuth2:
+    """
+    Devuelve el proveedor compartido para (url_token, client_id, scope, refresh_token), creándolo
+    la primera vez con el resto de argumentos (ver `ProveedorTokenOAuth2`). Dos cuentas que usan
+    la misma aplicación OAuth2 tienen refresh tokens distintos y, por tanto, proveedores distintos;
+    el refresh token entra en la clave solo como huella.
+    """
+    refresh_token = opciones.get("refresh_token")
+    huella = hashlib.sha256(refresh_token.encode("utf-8")).hexdigest() if refresh_token else None
+    clave = (url_token, client_id, scope, huella)
+    with _lock_proveedores:
+        proveedor = _proveedores.get(clave)
+        if proveedor is None:
+            proveedor = ProveedorTokenOAuth2(url_token, client_id, client_secret, scope, **opciones)
+            _proveedores[clave] = proveedor
+        return proveedor
+
+
+if __name__ == "__main__":
+    from servidor_stub import ConfiguracionStub, ServidorStub
+
+    with ServidorStub({"auth": ConfiguracionStub(expiracion_token=4)}) as servidor:
+        proveedor = ProveedorTokenOAuth2(f"{servidor.url_base}/auth/token", "cliente-demo", "secreto", margen_renovacion=2)
+        for _ in range(4):
+            print(f"Token: {proveedor.obtener_token()} (renovaciones: {proveedor.renovaciones})")
+            time.sleep(1.5)
+        proveedor.detener()
@@ -6,21 +6,70 @@ Este módulo proporciona una envoltura robusta alrededor de la librería `reques
 para manejar peticiones HTTP de manera segura, con reintentos automáticos,
 gestión de errores y logging detallado.
 
+Las peticiones reutilizan una sesión keep-alive por host (ver `sesiones_http.py`),
+por lo que llamadas sucesivas al mismo servicio no repiten el handshake TCP/TLS.
+Antes de cada intento se adquiere un token del limitador del host (ver `limitador.py`),
+que se adapta a las cabeceras `Retry-After` y de uso de cuota del proveedor.
+Opcionalmente, los GET pueden pasar por una caché con revalidación condicional (ver `cache_http.py`).
+Un circuit breaker por host (ver `circuit_breaker.py`) corta los reintentos contra servicios
+degradados y devuelve `CIRCUITO_ABIERTO` al instante mientras el host no se recupere.
+Con `deduplicar=True`, los GET idénticos que coinciden en el tiempo comparten una única llamada
+de red (ver `single_flight.py`).
+Se puede fijar un presupuesto total de tiempo que limita el timeout de cada intento y las esperas
+entre reintentos, y activar hedging en GET: si un intento supera el p95 de latencia de su endpoint
+(ver `metricas.py`), se lanza un segundo intento y se usa la primera respuesta que llegue.
+Para respuestas grandes existe un modo streaming que entrega los elementos de un array del JSON
+a medida que llegan (ver `streaming_json.py`), con memoria constante.
+
+Cada intento alimenta el registro de métricas (`metricas.py`): latencias por endpoint, intentos,
+reintentos, códigos de estado y bytes transferidos. El detalle por intento se escribe en DEBUG
+solo para una fracción muestreada de las peticiones (ver `configurar_muestreo_debug`).
+El módulo no configura el logging global: eso queda en manos del script que lo importa.
+
 Ideal para ser importado en otros scripts que requieran interactuar con APIs externas.
 """
 
 import requests
 import logging
+import random
 import time
-from typing import Dict, Any, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+from typing import Callable, Dict, Any, Iterator, Optional, Union
+from sesiones_http import obtener_sesion
+from limitador import obtener_limitador
+from cache_http import CacheHTTP
+from circuit_breaker import ABIERTO, CIRCUITO_ABIERTO, circuitos, obtener_circuito
+from single_flight import clave_peticion, grupo_peticiones
+from metricas import endpoint_de, registro_metricas
+from streaming_json import iterar_items_json
 
-# Configuración básica de logging para ver qué está pasando
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Fracción de peticiones cuyo detalle por intento se escribe en DEBUG
+_fraccion_debug = 0.01
+
+# Los cambios de estado de los circuitos también quedan reflejados en las métricas
+circuitos.al_cambiar_estado(registro_metricas.registrar_transicion_circuito)
+
+def configurar_muestreo_debug(fraccion: float):
+    """
+    Define qué fracción (0-1) de las peticiones escribe su detalle por intento en el log DEBUG.
+    Con 1.0 se registran todas (útil al depurar); con 0.0 ninguna.
+    """
+    global _fraccion_debug
+    _fraccion_debug = fraccion
+
+def _debug_muestreado(mensaje: str, *args: Any):
+    """Escribe en DEBUG solo para la fracción muestreada y sin formatear si no se va a emitir."""
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < _fraccion_debug:
+        logger.debug(mensaje, *args)
+
+# Percentil de latencia a partir del cual se lanza el intento de cobertura (hedging)
+PERCENTIL_HEDGING = 95
+# Pool compartido para los intentos con hedging (primario + cobertura)
+_executor_hedging = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedging")
+
 def realizar_peticion_segura(
     metodo: str,
     url: str,
@@ -29,8 +78,15 @@ def realizar_peticion_segura(
     data: Optional[Dict[str, Any]] = None,
     json_data: Optional[Dict[str, Any]] = None,
     intentos_maximos: int = 3,
-    espera_inicial: int = 2
-) -> Optional[requests.Response]:
+    espera_inicial: int = 2,
+    cache: Optional[CacheHTTP] = None,
+    deduplicar: bool = False,
+    timeout: float = 30,
+    presupuesto_total: Optional[float] = None,
+    hedging: bool = False,
+    ruta_stream: Optional[str] = None,
+    al_no_autorizado: Optional[Callable[[], Any]] = None
+) -> Optional[Union[requests.Response, Iterator[Any]]]:
     """
     Realiza una petición HTTP manejando posibles errores de conexión y timeouts.
     
@@ -43,10 +99,30 @@ def realizar_peticion_segura(
         json_data (dict, opcional): Datos para enviar en el cuerpo como JSON.
         intentos_maximos (int): Número máximo de reintentos en caso de fallo.
         espera_inicial (int): Segundos a esperar antes del primer reintento. El tiempo se duplica en cada fallo (backoff exponencial).
+            Ante un 429 no se aplica este backoff: se espera lo que indique `Retry-After` a través del limitador del host.
+        cache (CacheHTTP, opcional): Caché para peticiones GET. Si hay una entrada fresca no se accede a la red;
+            si está caducada se revalida con If-None-Match / If-Modified-Since.
+        deduplicar (bool): Si es True, un GET idéntico (URL, params, headers y opciones de reintento,
+            timeout y presupuesto) a otro que ya está en vuelo no sale a la red: espera y recibe el
+            mismo objeto respuesta. Con `presupuesto_total` la espera no pasa del presupuesto.
+        timeout (float): Timeout máximo de cada intento, en segundos.
+        presupuesto_total (float, opcional): Segundos totales disponibles para la petición, incluidos
+            reintentos y esperas. El tiempo restante limita el timeout de cada intento y el backoff;
+            si se agota, se devuelve None sin más intentos.
+        hedging (bool): Solo para GET (idempotentes). Si el intento supera el p95 de latencia del
+            endpoint, se envía un segundo intento en paralelo y se usa la primera respuesta.
+        ruta_stream (str, opcional): Activa el modo streaming. Ruta del array JSON a recorrer (p.ej. 'data.*',
+            'results.*'). En lugar de la respuesta se devuelve un generador de sus elementos, que se
+            decodifican a medida que llegan de la red. No usa caché ni deduplicación; los reintentos
+            cubren hasta recibir las cabeceras, no los errores a mitad de la descarga.
+        al_no_autorizado (callable, opcional): Función que se llama si el servidor responde 401
+            (p.ej. `ProveedorTokenOAuth2.invalidar`), para que un token revocado no se siga usando.
         
     Returns:
         response (requests.Response): Objeto de respuesta si la petición fue exitosa.
+        generador: En modo streaming (`ruta_stream`), generador de los elementos del array.
         None: Si la petición falló después de todos los intentos.
+        CIRCUITO_ABIERTO: Si el circuito del host está abierto (valor falso, igual que None).
     """
     
     intentos = 0
@@ -55,53 +131,248 @@ def realizar_peticion_segura(
     # Aseguramos que el método esté en mayúsculas
     metodo = metodo.upper()
     
-    while intentos < intentos_maximos:
+    # Opciones que se propagan cuando la petición pasa por single-flight o por la caché
+    opciones = {
+        "intentos_maximos": intentos_maximos, "espera_inicial": espera_inicial,
+        "timeout": timeout, "presupuesto_total": presupuesto_total, "hedging": hedging
+    }
+    
+    streaming = ruta_stream is not None
+    
+    if deduplicar and metodo == "GET" and data is None and json_data is None and not streaming:
         try:
-            logger.info(f"Iniciando petición {metodo} a: {url} (Intento {intentos + 1}/{intentos_maximos})")
-            
-            # Ejecutamos la petición usando requests.request que cubre todos los métodos
-            response = requests.request(
+            return grupo_peticiones.ejecutar(
+                clave_peticion(metodo, url, headers, params, opciones),
+                realizar_peticion_segura, metodo, url, headers=headers, params=params,
+                cache=cache, deduplicar=False, al_no_autorizado=al_no_autorizado,
+                tiempo_maximo=presupuesto_total, **opciones
+            )
+        except TimeoutError:
+            # Solo lo lanza un seguidor: la llamada compartida no terminó dentro de su presupuesto
+            logger.error(f"Presupuesto de tiempo agotado esperando la petición en vuelo a {url}.")
+            return None
+    
+    if cache is not None and metodo == "GET" and not streaming:
+        return _realizar_peticion_cacheada(cache, url, headers, params, al_no_autorizado=al_no_autorizado, **opciones)
+    
+    # Momento límite (reloj monotónico) a partir del presupuesto total
+    fecha_limite = None if presupuesto_total is None else time.monotonic() + presupuesto_total
+    endpoint = endpoint_de(url)
+    host = urlsplit(url).hostname or ""
+    
+    # Sesión compartida para el host: reutiliza conexiones entre intentos y entre llamadas
+    sesion = obtener_sesion(url)
+    # Limitador compartido del host: todos los hilos y tareas se reparten su cuota
+    limitador = obtener_limitador(url)
+    # Circuit breaker del host: si está caído no gastamos reintentos ni esperas
+    circuito = obtener_circuito(url)
+    
+    def _restante() -> Optional[float]:
+        return None if fecha_limite is None else fecha_limite - time.monotonic()
+    
+    def _enviar(timeout_intento: float) -> requests.Response:
+        # Ejecutamos la petición con la sesión del host (cubre todos los métodos)
+        inicio = time.perf_counter()
+        try:
+            response = sesion.request(
                 method=metodo,
                 url=url,
                 headers=headers,
                 params=params,
                 data=data,
                 json=json_data,
-                timeout=30  # Timeout de 30 segundos para evitar bloqueos infinitos
+                timeout=timeout_intento,  # Nunca esperamos más de lo que queda de presupuesto
+                stream=streaming
             )
+        except requests.exceptions.Timeout:
+            registro_metricas.registrar_error(url, endpoint, "timeout")
+            raise
+        except requests.exceptions.ConnectionError:
+            registro_metricas.registrar_error(url, endpoint, "conexion")
+            raise
+        except requests.exceptions.RequestException:
+            registro_metricas.registrar_error(url, endpoint, "otro")
+            raise
+        registro_metricas.registrar_respuesta(url, endpoint, response, time.perf_counter() - inicio, streaming)
+        return response
+    
+    registro_metricas.incrementar("peticiones_total", (host, endpoint, metodo))
+    
+    while intentos < intentos_maximos:
+        restante = _restante()
+        if restante is not None and restante <= 0:
+            logger.error(f"Presupuesto de tiempo agotado para {url} tras {intentos} intentos.")
+            return None
+        
+        if not circuito.permitir():
+            logger.warning(f"Circuito abierto para el host de {url}. Petición descartada sin esperar.")
+            return CIRCUITO_ABIERTO
+        
+        if not limitador.adquirir(tiempo_maximo=restante):
+            # No llegamos a enviar nada: devolvemos el permiso del circuito sin registrar resultado
+            circuito.cancelar_permiso()
+            logger.error(f"Presupuesto de tiempo agotado esperando turno para {url}.")
+            return None
+        if intentos > 0:
+            registro_metricas.incrementar("reintentos_total", (host, endpoint))
+        try:
+            _debug_muestreado("Iniciando petición %s a: %s (Intento %d/%d)", metodo, url, intentos + 1, intentos_maximos)
+            
+            restante = _restante()
+            timeout_intento = timeout if restante is None else max(0.001, min(timeout, restante))
+            
+            if hedging and metodo == "GET":
+                response = _enviar_con_hedging(_enviar, timeout_intento, endpoint, limitador)
+            else:
+                response = _enviar(timeout_intento)
+            limitador.actualizar_desde_respuesta(response, espera_por_defecto=espera)
+            # Solo los 5xx indican que el host está degradado; un 4xx es culpa de la petición
+            circuito.registrar_resultado(response.status_code < 500)
             
             # verificamos el código de estado
             # raise_for_status() lanzará una excepción si el código es 4xx o 5xx
             response.raise_for_status()
             
-            logger.info(f"Petición exitosa. Código de estado: {response.status_code}")
+            _debug_muestreado("Petición exitosa. Código de estado: %d", response.status_code)
+            if streaming:
+                return iterar_items_json(response, ruta_stream)
             return response
             
         except requests.exceptions.Timeout:
+            circuito.registrar_resultado(False)
             logger.warning(f"Timeout al conectar con {url}. Reintentando en {espera} segundos...")
         except requests.exceptions.ConnectionError:
+            circuito.registrar_resultado(False)
             logger.warning(f"Error de conexión con {url}. Reintentando en {espera} segundos...")
         except requests.exceptions.HTTPError as err:
             logger.error(f"Error HTTP: {err}")
+            if streaming:
+                response.close()  # Liberamos la conexión: el cuerpo de error no se va a leer
+            if response.status_code == 429:
+                # El limitador ya ha pausado el host según Retry-After; el siguiente
+                # limitador.adquirir() esperará lo justo, sin backoff fijo adicional.
+                logger.warning("Límite de peticiones (429). Se reintentará cuando el host lo permita.")
+                intentos += 1
+                espera *= 2
+                continue
             # Si es un error 404 (Not Found) o 400 (Bad Request), a veces no queremos reintentar
             # pero para este ejemplo genérico, simplemente logueamos y decidimos si continuar.
             # Un 503 (Service Unavailable) o 500 (Server Error) son buenos candidatos para reintentar.
+            if response.status_code == 401 and al_no_autorizado is not None:
+                al_no_autorizado()
             if response.status_code in [400, 401, 403, 404]:
                  logger.error("Error de cliente, no se reintentará.")
                  return None
             
         except requests.exceptions.RequestException as err:
+            circuito.registrar_resultado(False)
             logger.error(f"Error inesperado: {err}")
             
         # Lógica de reintento (Backoff exponencial)
         intentos += 1
+        if circuito.estado == ABIERTO:
+            logger.warning(f"El circuito del host de {url} se ha abierto. Se cancelan los reintentos.")
+            return CIRCUITO_ABIERTO
+        
+        restante = _restante()
+        if restante is not None and restante <= espera:
+            logger.error(f"Presupuesto de tiempo agotado para {url} tras {intentos} intentos.")
+            return None
         time.sleep(espera)
         espera *= 2 # Duplicamos el tiempo de espera para el siguiente intento
         
     logger.error(f"Fallo al realizar la petición a {url} después de {intentos_maximos} intentos.")
     return None
 
+def _enviar_con_hedging(
+    enviar: Callable[[float], requests.Response],
+    timeout_intento: float,
+    endpoint: str,
+    limitador
+) -> requests.Response:
+    """
+    Envía un intento y, si no ha respondido al alcanzar el p95 del endpoint, lanza uno de
+    cobertura. Devuelve la primera respuesta válida; si ambos fallan relanza el primer error.
+    """
+    umbral = registro_metricas.latencias.percentil(endpoint, PERCENTIL_HEDGING)
+    if umbral is None or umbral >= timeout_intento:
+        # Sin histórico suficiente (o sin margen) no tiene sentido cubrir
+        return enviar(timeout_intento)
+    
+    inicio = time.monotonic()
+    primario = _executor_hedging.submit(enviar, timeout_intento)
+    hecho, _ = wait([primario], timeout=umbral)
+    # Solo cubrimos si hay cuota libre en este momento: no queremos agravar una saturación
+    if hecho or not limitador.adquirir(tiempo_maximo=0):
+        return primario.result()
+    
+    _debug_muestreado("Intento lento (> p%d = %.3fs) en %s. Lanzando intento de cobertura.", PERCENTIL_HEDGING, umbral, endpoint)
+    cobertura = _executor_hedging.submit(enviar, max(0.001, timeout_intento - (time.monotonic() - inicio)))
+    pendientes = {primario, cobertura}
+    
+    while pendientes:
+        hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+        for futuro in hechos:
+            if futuro.exception() is None:
+                # Cerramos la respuesta perdedora cuando llegue para liberar su conexión
+                for perdedor in pendientes:
+                    perdedor.add_done_callback(
+                        lambda f: f.result().close() if f.exception() is None else None
+                    )
+                return futuro.result()
+    
+    # Ambos intentos fallaron: propagamos el error del primario a la lógica de reintentos
+    return primario.result()
+
+def _realizar_peticion_cacheada(
+    cache: CacheHTTP,
+    url: str,
+    headers: Optional[Dict[str, str]],
+    params: Optional[Dict[str, Any]],
+    **opciones: Any
+) -> Optional[requests.Response]:
+    """
+    GET a través de la caché: sirve entradas frescas y revalida las caducadas.
+    El resto de opciones (reintentos, timeout, presupuesto...) se pasan a realizar_peticion_segura.
+    """
+    clave = cache.clave(url, params, headers)
+    entrada = cache.obtener(clave)
+    
+    if entrada is not None and cache.es_fresca(entrada):
+        cache.registrar_acierto(entrada)
+        _debug_muestreado("Respuesta servida desde caché: %s", url)
+        return cache.a_respuesta(entrada)
+    
+    cache.registrar_fallo()
+    if entrada is not None:
+        # Entrada caducada: pedimos al servidor que confirme si ha cambiado
+        headers = {**(headers or {}), **cache.cabeceras_revalidacion(entrada)}
+    
+    response = realizar_peticion_segura(
+        "GET", url, headers=headers, params=params, deduplicar=False, **opciones
+    )
+    
+    if response is CIRCUITO_ABIERTO and entrada is not None:
+        # Host caído: mejor una copia caducada que nada
+        logger.warning(f"Circuito abierto, se sirve la copia caducada de la caché: {url}")
+        return cache.a_respuesta(entrada)
+    if not response:
+        return response
+    if response.status_code == 304 and entrada is not None:
+        _debug_muestreado("Contenido sin cambios (304), se reutiliza la caché: %s", url)
+        return cache.a_respuesta(cache.refrescar(clave, entrada, response))
+    if response.status_code == 200:
+        cache.guardar(clave, response)
+    return response
+
 if __name__ == "__main__":
+    # Configuración básica de logging para ver qué está pasando (solo al ejecutar el script)
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    configurar_muestreo_debug(1.0)
+    
     # Bloque de prueba simple
     print("Probando script de utilidades...")
     
@@ -113,3 +384,5 @@ if __name__ == "__main__":
     if respuesta:
         print("Datos recibidos:")
         print(respuesta.json())
+    
+    print(registro_metricas.exportar_prometheus())
@@ -5,35 +5,164 @@ Ejemplo de Conexión a OpenWeatherMap API
 Este script muestra cómo conectar a una API pública sencilla de clima.
 Perfecto para probar conexiones sin una configuración OAuth compleja.
 
+Para paneles que consultan muchas ciudades a la vez, `obtener_clima_lote` deduplica las
+ubicaciones, reutiliza las respuestas recientes (caché con TTL por ciudad normalizada o por
+coordenadas redondeadas) y pide el resto en paralelo sin pasar de la cuota por minuto.
+Devuelve una tabla compacta (dict de columnas o array estructurado de NumPy).
+
 Documentación: https://openweathermap.org/api
 """
 
-from utils_requests import realizar_peticion_segura
+from cache_http import CacheHTTP
+from conector_base import ApiKeyParametro, BaseConnector
+from limitador import limitadores
 import os
+import re
+import unicodedata
+from urllib.parse import urlsplit
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Columnas de la tabla de `obtener_clima_lote` (una fila por ubicación distinta)
+COLUMNAS_CLIMA = (
+    "consulta", "nombre", "lat", "lon", "temperatura", "sensacion_termica",
+    "humedad", "presion", "viento", "descripcion", "dt", "ok"
+)
+
+# Caché compartida de las consultas en lote: el tiempo apenas cambia en 10 minutos
+cache_clima = CacheHTTP(capacidad_memoria=4096, ttl_por_defecto=600)
 
-def obtener_clima_actual(ciudad: str, api_key: str):
+
+def normalizar_ubicacion(ubicacion, decimales: int = 2) -> tuple:
     """
-    Obtiene el clima actual para una ciudad específica.
+    Clave y parámetros de consulta de una ubicación, para que variantes de la misma
+    compartan la entrada de caché.
+    
+    - Texto ('Cádiz', ' madrid, ES '): sin tildes, en minúsculas y sin espacios sobrantes.
+    - (lat, lon): redondeadas a `decimales` (2 decimales ~ 1 km).
+    
+    Returns:
+        tuple: (clave, parametros) p.ej. ('madrid,es', {'q': 'madrid,es'})
     """
+    if isinstance(ubicacion, str):
+        texto = unicodedata.normalize("NFKD", ubicacion)
+        texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+        texto = re.sub(r"\s*,\s*", ",", re.sub(r"\s+", " ", texto.strip()))
+        return texto, {"q": texto}
+    lat, lon = (f"{float(valor):.{decimales}f}" for valor in ubicacion)
+    return f"{lat},{lon}", {"lat": lat, "lon": lon}
+
+
+def _fila_clima(consulta: str, datos) -> tuple:
+    """Fila de la tabla (en el orden de COLUMNAS_CLIMA) a partir del JSON de la API."""
+    if not datos:
+        nan = float("nan")
+        return (consulta, "", nan, nan, nan, nan, nan, nan, nan, "", 0, False)
+    principal = datos.get("main", {})
+    coordenadas = datos.get("coord", {})
+    return (
+        consulta,
+        datos.get("name", ""),
+        float(coordenadas.get("lat", "nan")),
+        float(coordenadas.get("lon", "nan")),
+        float(principal.get("temp", "nan")),
+        float(principal.get("feels_like", "nan")),
+        float(principal.get("humidity", "nan")),
+        float(principal.get("pressure", "nan")),
+        float(datos.get("wind", {}).get("speed", "nan")),
+        (datos.get("weather") or [{}])[0].get("description", ""),
+        int(datos.get("dt", 0)),
+        True,
+    )
+
+
+class OpenWeatherConnector(BaseConnector):
+    """Conector de OpenWeatherMap (API Key en el parámetro `appid`)."""
+    
+    BASE_URL = "https://api.openweathermap.org/data/2.5"
+    # Plan gratuito: 60 llamadas/minuto (se permite gastar el minuto de golpe)
+    LIMITE_TASA = {"tasa": 1.0, "capacidad": 60, "tasa_maxima": 1.0}
     
-    # Endpoint base de la API
-    # NOTA: Usar unidades 'metric' para Celsius
-    base_url = "https://api.openweathermap.org/data/2.5/weather"
+    def __init__(self, api_key: str, cache: CacheHTTP = None):
+        """
+        Args:
+            api_key (str): API Key de openweathermap.org.
+            cache (CacheHTTP, opcional): Caché de las consultas (el tiempo cambia poco en minutos).
+        """
+        super().__init__(ApiKeyParametro(api_key, "appid"), cache=cache)
     
-    parametros = {
-        "q": ciudad,
-        "appid": api_key,
-        "units": "metric",
-        "lang": "es" # Respuestas en español
-    }
+    def clima_actual(self, ciudad: str):
+        """
+        Clima actual de una ciudad (JSON de la API) o None si la petición falla.
+        GET /weather?q=<ciudad>
+        """
+        # NOTA: Usar unidades 'metric' para Celsius
+        parametros = {
+            "q": ciudad,
+            "units": "metric",
+            "lang": "es" # Respuestas en español
+        }
+        
+        respuesta = self.peticion("GET", "weather", params=parametros)
+        return respuesta.json() if respuesta else None
     
+    def clima_lote(self, ubicaciones: list, max_concurrencia: int = 10, como_numpy: bool = False):
+        """
+        Clima actual de muchas ubicaciones (ver `obtener_clima_lote`).
+        
+        Las ubicaciones repetidas (tras normalizarlas) se piden una sola vez. Las que tienen una
+        respuesta fresca en la caché del conector no salen a la red; el resto se piden en paralelo
+        y el limitador del host las reparte dentro de la cuota por minuto.
+        """
+        unicas = {}  # clave normalizada -> (consulta original, parámetros)
+        for ubicacion in ubicaciones:
+            clave, parametros = normalizar_ubicacion(ubicacion)
+            if clave not in unicas:
+                consulta = ubicacion if isinstance(ubicacion, str) else clave
+                unicas[clave] = (consulta, parametros)
+        
+        claves = list(unicas)
+        peticiones = [
+            self.construir_peticion("GET", "weather", params={**unicas[clave][1], "units": "metric", "lang": "es"})
+            for clave in claves
+        ]
+        filas = [None] * len(claves)
+        for indice, respuesta in self.en_paralelo(peticiones, max_concurrencia):
+            try:
+                datos = respuesta.json() if respuesta else None
+            except ValueError:
+                datos = None
+            filas[indice] = _fila_clima(unicas[claves[indice]][0], datos)
+        
+        if como_numpy:
+            if np is None:
+                raise ImportError("como_numpy=True requiere numpy (pip install numpy)")
+            # Cadenas de ancho fijo ajustado al contenido: el array queda contiguo y compacto
+            anchos = {
+                nombre: max([1] + [len(fila[i]) for fila in filas])
+                for i, nombre in enumerate(COLUMNAS_CLIMA) if nombre in ("consulta", "nombre", "descripcion")
+            }
+            tipos = [
+                (nombre, f"U{anchos[nombre]}" if nombre in anchos else "i8" if nombre == "dt" else "?" if nombre == "ok" else "f8")
+                for nombre in COLUMNAS_CLIMA
+            ]
+            return np.array(filas, dtype=tipos)
+        return {nombre: [fila[i] for fila in filas] for i, nombre in enumerate(COLUMNAS_CLIMA)}
+
+def obtener_clima_actual(ciudad: str, api_key: str, cache: CacheHTTP = None):
+    """
+    Obtiene el clima actual para una ciudad específica.
+    Si se pasa una `cache`, las consultas repetidas de la misma ciudad no salen a la red
+    mientras la entrada siga fresca.
+    """
     print(f"Consultando clima para: {ciudad}...")
     
-    respuesta = realizar_peticion_segura("GET", base_url, params=parametros)
+    datos = OpenWeatherConnector(api_key, cache=cache).clima_actual(ciudad)
     
-    if respuesta:
-        datos = respuesta.json()
-        
+    if datos:
         # Extracción segura de datos anidados
         temp = datos.get("main", {}).get("temp")
         descripcion = datos.get("weather", [{}])[0].get("description")
@@ -49,7 +178,45 @@ def obtener_clima_actual(ciudad: str, api_key: str):
         print(f"No se pudo obtener el clima para {ciudad}.")
         return None
 
+def obtener_clima_lote(
+    ciudades: list,
+    api_key: str,
+    cache: CacheHTTP = cache_clima,
+    max_concurrencia: int = 10,
+    llamadas_por_minuto: int = None,
+    como_numpy: bool = False
+):
+    """
+    Obtiene el clima actual de muchas ciudades a la vez, sin imprimir nada por ciudad.
+    
+    Args:
+        ciudades (list): Nombres ('Madrid', 'Sevilla,ES') y/o tuplas (lat, lon), con repeticiones o no.
+        api_key (str): API Key de openweathermap.org.
+        cache (CacheHTTP): Caché de respuestas (por defecto la compartida del módulo, TTL 10 min).
+        max_concurrencia (int): Peticiones en vuelo a la vez.
+        llamadas_por_minuto (int, opcional): Cuota del plan contratado. Por defecto, la del plan
+            gratuito (60/min) o la ya configurada en `limitadores` para el host.
+        como_numpy (bool): Si es True devuelve un array estructurado de NumPy en lugar de un dict.
+    
+    Returns:
+        dict | np.ndarray: Tabla con las columnas de COLUMNAS_CLIMA y una fila por ubicación
+        distinta, en el orden de su primera aparición. Las que fallan tienen ok=False y NaN.
+    """
+    conector = OpenWeatherConnector(api_key, cache=cache)
+    if llamadas_por_minuto:
+        # Sin reponer el cubo en cada llamada: un panel que refresca cada pocos segundos no debe
+        # disponer de una ráfaga completa cada vez
+        limitadores.ajustar(
+            urlsplit(conector.BASE_URL).hostname, tasa=llamadas_por_minuto / 60,
+            capacidad=llamadas_por_minuto, tasa_maxima=llamadas_por_minuto / 60
+        )
+    return conector.clima_lote(ciudades, max_concurrencia=max_concurrencia, como_numpy=como_numpy)
+
 if __name__ == "__main__":
+    import logging
+    # Los módulos de utilidades no configuran el logging: lo hacemos aquí para ver avisos y errores
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
     # --- ZONA DE CONFIGURACIÓN ---
     # Regístrate gratis en openweathermap.org para obtener una API Key
     API_KEY = "TU_API_KEY_AQUI" 
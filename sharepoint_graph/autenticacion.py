@@ -1,15 +1,22 @@
 import requests
 
+# URL base de Microsoft Graph (v1.0)
+GRAPH_URL = "https://graph.microsoft.com/v1.0"
+
 def obtener_headers_auth(token_acceso):
     """
     Genera los encabezados de autenticación necesarios para las llamadas a Microsoft Graph API.
 
     Args:
-        token_acceso (str): El token de acceso de Microsoft Graph (Bearer token).
+        token_acceso (str | objeto): El token de acceso de Microsoft Graph (Bearer token), o un
+            proveedor con método `obtener_token()` (p.ej. `ProveedorTokenOAuth2` de API_requests)
+            que lo renueva antes de que caduque. Con un proveedor, cada llamada usa el token vigente.
 
     Returns:
         dict: Diccionario con los encabezados HTTP, incluyendo 'Authorization'.
     """
+    if hasattr(token_acceso, "obtener_token"):
+        token_acceso = token_acceso.obtener_token()
     return {
         "Authorization": f"Bearer {token_acceso}",
         "Content-Type": "application/json"
@@ -1,18 +1,26 @@
+import json
 import os
+import time
 import requests
-from .autenticacion import obtener_headers_auth
+from .autenticacion import GRAPH_URL, obtener_headers_auth
+from .utilidades import segundos_retry_after
+
+# Graph exige fragmentos múltiplos de 320 KiB y de como mucho 60 MiB
+MULTIPLO_FRAGMENTO = 320 * 1024
+FRAGMENTO_MAXIMO = 192 * MULTIPLO_FRAGMENTO
+FRAGMENTO_INICIAL = 16 * MULTIPLO_FRAGMENTO  # 5 MiB
 
 def subir_archivo(drive_id, parent_id, ruta_archivo_local, token_acceso):
     """
     Sube un archivo local a una carpeta específica de SharePoint.
     Esta función usa el método simple (PUT) adecuado para archivos menores a 4MB.
-    Para archivos más grandes, se debería usar una sesión de carga (Upload Session).
+    Para archivos más grandes, usa `subir_archivo_grande` (sesión de carga por fragmentos).
 
     Args:
         drive_id (str): ID del Drive destino.
         parent_id (str): ID de la carpeta padre donde se subirá el archivo (usar 'root' para la raíz).
         ruta_archivo_local (str): Ruta absoluta del archivo a subir.
-        token_acceso (str): Token de acceso.
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
 
     Returns:
         dict: Respuesta JSON de Graph API con los metadatos del archivo creado, o None si falla.
@@ -47,3 +55,278 @@ def subir_archivo(drive_id, parent_id, ruta_archivo_local, token_acceso):
         except:
             pass
         return None
+
+
+def _alinear_fragmento(tamano):
+    """Redondea un tamaño de fragmento a múltiplo de 320 KiB, entre 320 KiB y 60 MiB."""
+    return max(MULTIPLO_FRAGMENTO, min(FRAGMENTO_MAXIMO, int(tamano) // MULTIPLO_FRAGMENTO * MULTIPLO_FRAGMENTO))
+
+
+class _Fragmento:
+    """
+    Vista de solo lectura de `longitud` bytes de un archivo, desde su posición actual.
+    requests la envía por bloques con su Content-Length, sin cargar el fragmento en memoria.
+    """
+
+    def __init__(self, archivo, longitud):
+        self._archivo = archivo
+        self._restante = longitud
+        self.len = longitud
+
+    def __len__(self):
+        return self.len
+
+    def read(self, n=-1):
+        if self._restante <= 0:
+            return b""
+        n = self._restante if n is None or n < 0 else min(n, self._restante)
+        datos = self._archivo.read(n)
+        self._restante -= len(datos)
+        return datos
+
+    def __iter__(self):
+        while True:
+            bloque = self.read(64 * 1024)
+            if not bloque:
+                return
+            yield bloque
+
+
+def crear_sesion_carga(drive_id, parent_id, nombre_archivo, token_acceso, conflicto="replace"):
+    """
+    Crea una sesión de carga (createUploadSession) para subir un archivo por fragmentos.
+
+    Args:
+        drive_id (str): ID del Drive destino.
+        parent_id (str): ID de la carpeta padre ('root' para la raíz).
+        nombre_archivo (str): Nombre del archivo en SharePoint.
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
+        conflicto (str): Qué hacer si ya existe: 'replace', 'rename' o 'fail'.
+
+    Returns:
+        dict: Sesión con 'uploadUrl', 'expirationDateTime' y 'nextExpectedRanges', o None si falla.
+    """
+    endpoint = f"{GRAPH_URL}/drives/{drive_id}/items/{parent_id}:/{nombre_archivo}:/createUploadSession"
+    cuerpo = {"item": {"@microsoft.graph.conflictBehavior": conflicto}}
+
+    try:
+        respuesta = requests.post(endpoint, headers=obtener_headers_auth(token_acceso), json=cuerpo)
+        respuesta.raise_for_status()
+        return respuesta.json()
+    except requests.exceptions.RequestException as e:
+        print(f"Error al crear la sesión de carga: {e}")
+        return None
+
+
+def _offset_pendiente(url_sesion):
+    """
+    Primer byte que el servidor espera en la sesión (según 'nextExpectedRanges'), o None si la
+    sesión ya no existe (caducada o cancelada).
+    """
+    # La URL de la sesión ya va firmada: no se envía el token
+    respuesta = requests.get(url_sesion, timeout=30)
+    if respuesta.status_code in (404, 410):
+        return None
+    respuesta.raise_for_status()
+    rangos = respuesta.json().get("nextExpectedRanges") or ["0-"]
+    return int(rangos[0].split("-")[0])
+
+
+def _leer_estado_carga(ruta_estado, clave):
+    """URL de una sesión anterior para el mismo archivo y destino, si la hay."""
+    try:
+        with open(ruta_estado, encoding="utf-8") as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return estado.get("uploadUrl") if estado.get("clave") == clave else None
+
+
+def _guardar_estado_carga(ruta_estado, clave, url_sesion):
+    try:
+        with open(ruta_estado, "w", encoding="utf-8") as f:
+            json.dump({"clave": clave, "uploadUrl": url_sesion}, f)
+    except OSError:
+        pass  # Sin estado local la carga funciona igual; solo no se podrá reanudar en otra ejecución
+
+
+def _borrar_estado_carga(ruta_estado):
+    if ruta_estado and os.path.exists(ruta_estado):
+        os.remove(ruta_estado)
+
+
+def subir_archivo_grande(
+    drive_id,
+    parent_id,
+    origen,
+    token_acceso,
+    nombre_archivo=None,
+    tamano_fragmento=FRAGMENTO_INICIAL,
+    adaptativo=True,
+    segundos_por_fragmento=5,
+    conflicto="replace",
+    url_sesion=None,
+    intentos_maximos=5
+):
+    """
+    Sube un archivo de cualquier tamaño con una sesión de carga de Graph (createUploadSession).
+
+    El archivo se lee del disco fragmento a fragmento (nunca entero en memoria). Los fragmentos
+    son múltiplos de 320 KiB, como exige Graph; con `adaptativo` su tamaño se ajusta al
+    rendimiento medido para que cada uno tarde unos `segundos_por_fragmento`, y se reduce a la
+    mitad tras un fallo.
+
+    Si un fragmento falla, se pregunta al servidor qué bytes le faltan ('nextExpectedRanges') y
+    se continúa desde ahí en lugar de empezar de nuevo. Cuando `origen` es una ruta, la URL de
+    la sesión se guarda junto al archivo (`<archivo>.carga.json`) y una ejecución posterior
+    reanuda la misma carga mientras la sesión no haya caducado.
+
+    Args:
+        drive_id (str): ID del Drive destino.
+        parent_id (str): ID de la carpeta padre ('root' para la raíz).
+        origen (str | archivo): Ruta local o archivo binario abierto que admita seek (se sube
+            completo, desde el principio). Los flujos sin seek (tuberías, cuerpos HTTP...) se
+            rechazan: Graph necesita el tamaño total por adelantado y, tras un fallo, hay que
+            volver a enviar desde el byte que indique el servidor.
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
+        nombre_archivo (str, opcional): Nombre en SharePoint (por defecto, el del archivo local).
+        tamano_fragmento (int): Tamaño inicial de fragmento en bytes (se alinea a 320 KiB).
+        adaptativo (bool): Ajustar el tamaño de fragmento al rendimiento medido.
+        segundos_por_fragmento (float): Duración objetivo de cada fragmento en modo adaptativo.
+        conflicto (str): Qué hacer si ya existe: 'replace', 'rename' o 'fail'.
+        url_sesion (str, opcional): 'uploadUrl' de una sesión anterior a reanudar (útil con
+            archivos abiertos, que no guardan estado local).
+        intentos_maximos (int): Fallos seguidos permitidos antes de abandonar (la sesión sigue
+            abierta y se puede reanudar más tarde).
+
+    Returns:
+        dict: Metadatos del archivo creado (driveItem), o None si falla.
+    """
+    es_ruta = isinstance(origen, (str, os.PathLike))
+    if es_ruta and not os.path.exists(origen):
+        print(f"El archivo local no existe: {origen}")
+        return None
+
+    nombre_archivo = nombre_archivo or os.path.basename(origen if es_ruta else getattr(origen, "name", ""))
+    if not nombre_archivo:
+        print("Indica nombre_archivo: el origen no tiene nombre.")
+        return None
+
+    if not es_ruta and not (hasattr(origen, "seekable") and origen.seekable()):
+        print("El origen no admite seek (tubería, cuerpo HTTP...): guárdalo antes en un archivo temporal.")
+        return None
+
+    if es_ruta and os.path.getsize(origen) == 0:
+        # Las sesiones de carga no admiten archivos vacíos
+        return subir_archivo(drive_id, parent_id, origen, token_acceso)
+
+    archivo = open(origen, "rb") if es_ruta else origen
+    ruta_estado = f"{origen}.carga.json" if es_ruta else None
+    try:
+        archivo.seek(0, os.SEEK_END)
+        tamano = archivo.tell()
+        if tamano == 0:
+            # Las sesiones de carga no admiten archivos vacíos (Content-Range 'bytes 0--1/0')
+            print("El origen está vacío: usa subir_archivo con una ruta para crear un archivo vacío.")
+            return None
+
+        # La sesión guardada solo vale si el archivo no ha cambiado y el destino es el mismo
+        clave = None
+        if es_ruta:
+            clave = f"{drive_id}/{parent_id}/{nombre_archivo}:{tamano}:{os.path.getmtime(origen)}"
+            url_sesion = url_sesion or _leer_estado_carga(ruta_estado, clave)
+
+        offset = 0
+        if url_sesion:
+            try:
+                offset = _offset_pendiente(url_sesion)
+            except requests.exceptions.RequestException as e:
+                print(f"No se pudo consultar la sesión anterior ({e}); se crea una nueva.")
+                offset = None
+            if offset is None:
+                url_sesion = None
+                offset = 0
+            else:
+                print(f"Reanudando la carga de {nombre_archivo} desde el byte {offset} de {tamano}")
+
+        if not url_sesion:
+            sesion = crear_sesion_carga(drive_id, parent_id, nombre_archivo, token_acceso, conflicto)
+            if not sesion:
+                return None
+            url_sesion = sesion["uploadUrl"]
+            if ruta_estado:
+                _guardar_estado_carga(ruta_estado, clave, url_sesion)
+
+        with requests.Session() as http:  # Keep-alive entre fragmentos
+            tamano_fragmento = _alinear_fragmento(tamano_fragmento)
+            rendimiento = None  # Bytes/segundo, media móvil
+            fallos = 0
+
+            while True:
+                longitud = min(tamano_fragmento, tamano - offset)
+                archivo.seek(offset)
+                cabeceras = {
+                    "Content-Length": str(longitud),
+                    "Content-Range": f"bytes {offset}-{offset + longitud - 1}/{tamano}"
+                }
+
+                inicio = time.monotonic()
+                try:
+                    # La URL de la sesión ya va firmada: no se envía el token
+                    respuesta = http.put(url_sesion, headers=cabeceras, data=_Fragmento(archivo, longitud), timeout=(10, 120))
+                    error = None
+                except requests.exceptions.RequestException as e:
+                    respuesta, error = None, e
+                duracion = time.monotonic() - inicio
+
+                if respuesta is not None and respuesta.status_code in (200, 201):
+                    _borrar_estado_carga(ruta_estado)
+                    print(f"Archivo subido exitosamente: {nombre_archivo} ({tamano} bytes)")
+                    return respuesta.json()
+
+                if respuesta is not None and respuesta.status_code == 202:
+                    fallos = 0
+                    if adaptativo and duracion > 0:
+                        medido = longitud / duracion
+                        rendimiento = medido if rendimiento is None else 0.7 * rendimiento + 0.3 * medido
+                        tamano_fragmento = _alinear_fragmento(rendimiento * segundos_por_fragmento)
+                    rangos = respuesta.json().get("nextExpectedRanges") or []
+                    offset = int(rangos[0].split("-")[0]) if rangos else offset + longitud
+                    continue
+
+                # --- Fallo del fragmento ---
+                codigo = respuesta.status_code if respuesta is not None else None
+                if codigo in (404, 410):
+                    print(f"La sesión de carga de {nombre_archivo} ha caducado o se ha cancelado.")
+                    _borrar_estado_carga(ruta_estado)
+                    return None
+                if codigo is not None and 400 <= codigo < 500 and codigo not in (408, 416, 429):
+                    print(f"Error al subir el fragmento ({codigo}): {respuesta.text}")
+                    return None
+
+                fallos += 1
+                if fallos > intentos_maximos:
+                    print(f"Carga de {nombre_archivo} interrumpida en el byte {offset} de {tamano}; se puede reanudar.")
+                    return None
+
+                espera = min(60, 2 ** fallos)
+                if codigo == 429 or codigo == 503:
+                    espera = segundos_retry_after(respuesta.headers.get("Retry-After"), espera)
+                print(f"Fallo al subir el fragmento en el byte {offset} ({error or codigo}). Reintentando en {espera} segundos...")
+                time.sleep(espera)
+                if adaptativo:
+                    tamano_fragmento = _alinear_fragmento(tamano_fragmento // 2)
+
+                # Se continúa desde lo que el servidor confirma tener (puede haber recibido parte)
+                try:
+                    pendiente = _offset_pendiente(url_sesion)
+                except requests.exceptions.RequestException:
+                    pendiente = offset
+                if pendiente is None:
+                    print(f"La sesión de carga de {nombre_archivo} ha caducado o se ha cancelado.")
+                    _borrar_estado_carga(ruta_estado)
+                    return None
+                offset = pendiente
+    finally:
+        if es_ruta:
+            archivo.close()
@@ -1,9 +1,17 @@
+import json
+import mmap
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from .autenticacion import obtener_headers_auth
+from .autenticacion import GRAPH_URL, obtener_headers_auth
 from .utilidades import resolver_url_a_drive_item
 
-def descargar_archivo_por_id(drive_id, item_id, ruta_destino, token_acceso):
+# Tamaño por defecto de cada rango en la descarga en paralelo
+FRAGMENTO_DESCARGA = 8 * 1024 * 1024
+
+def descargar_archivo_por_id(drive_id, item_id, ruta_destino, token_acceso, conexiones=1, tamano_fragmento=FRAGMENTO_DESCARGA):
     """
     Descarga un archivo de SharePoint usando su Drive ID e Item ID.
 
@@ -11,11 +19,18 @@ def descargar_archivo_por_id(drive_id, item_id, ruta_destino, token_acceso):
         drive_id (str): ID de la unidad (Drive) donde está el archivo.
         item_id (str): ID del archivo (Item).
         ruta_destino (str): Ruta local completa donde se guardará el archivo.
-        token_acceso (str): Token de acceso.
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
+        conexiones (int): Con más de 1, descarga por rangos en paralelo (ver `descargar_archivo_paralelo`).
+        tamano_fragmento (int): Bytes de cada rango en la descarga en paralelo.
     
     Returns:
         bool: True si la descarga fue exitosa, False en caso contrario.
     """
+    if conexiones > 1:
+        return descargar_archivo_paralelo(
+            drive_id, item_id, ruta_destino, token_acceso, conexiones=conexiones, tamano_fragmento=tamano_fragmento
+        )
+
     # Endpoint: /drives/{drive-id}/items/{item-id}/content
     endpoint = f"https://graph.microsoft.com/v1.0/drives/{drive_id}/items/{item_id}/content"
     headers = obtener_headers_auth(token_acceso)
@@ -39,7 +54,7 @@ def descargar_archivo_por_id(drive_id, item_id, ruta_destino, token_acceso):
         print(f"Error al descargar el archivo: {e}")
         return False
 
-def descargar_desde_url(url_compartida, ruta_destino, token_acceso):
+def descargar_desde_url(url_compartida, ruta_destino, token_acceso, conexiones=1):
     """
     Descarga un archivo directamente desde una URL pública/compartida de SharePoint.
     Primero resuelve el item y luego lo descarga.
@@ -47,7 +62,8 @@ def descargar_desde_url(url_compartida, ruta_destino, token_acceso):
     Args:
         url_compartida (str): URL de SharePoint.
         ruta_destino (str): Ruta local de guardado.
-        token_acceso (str): Token de acceso.
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
+        conexiones (int): Con más de 1, descarga por rangos en paralelo.
 
     Returns:
         bool: True si éxito, False si error.
@@ -85,4 +101,236 @@ def descargar_desde_url(url_compartida, ruta_destino, token_acceso):
         return False
         
     print(f"Item resuelto. Drive ID: {drive_id}, Item ID: {item_id}")
-    return descargar_archivo_por_id(drive_id, item_id, ruta_destino, token_acceso)
+    return descargar_archivo_por_id(drive_id, item_id, ruta_destino, token_acceso, conexiones=conexiones)
+
+
+def _obtener_metadatos_descarga(drive_id, item_id, token_acceso):
+    """Tamaño, versión y URL de descarga directa ('@microsoft.graph.downloadUrl') de un archivo."""
+    endpoint = f"{GRAPH_URL}/drives/{drive_id}/items/{item_id}"
+    respuesta = requests.get(endpoint, headers=obtener_headers_auth(token_acceso), timeout=30)
+    respuesta.raise_for_status()
+    return respuesta.json()
+
+
+class _EscritorPosicional:
+    """
+    Escribe bloques en posiciones arbitrarias de un archivo ya preasignado, desde varios hilos.
+    Usa `os.pwrite` (no comparte el puntero de posición entre hilos) y, donde no existe
+    (Windows), un mmap del archivo completo.
+    """
+
+    def __init__(self, ruta, tamano):
+        self._fd = os.open(ruta, os.O_RDWR | getattr(os, "O_BINARY", 0))
+        self._mapa = None
+        if not hasattr(os, "pwrite"):
+            self._mapa = mmap.mmap(self._fd, tamano)
+
+    def escribir(self, offset, datos):
+        if self._mapa is not None:
+            self._mapa[offset:offset + len(datos)] = datos
+            return
+        vista = memoryview(datos)
+        while vista:
+            escritos = os.pwrite(self._fd, vista, offset)
+            vista = vista[escritos:]
+            offset += escritos
+
+    def cerrar(self):
+        if self._mapa is not None:
+            self._mapa.flush()
+            self._mapa.close()
+            self._mapa = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def _preasignar(ruta, tamano):
+    """Crea (o ajusta) el archivo con su tamaño final, reservando el espacio en disco si se puede."""
+    modo = "r+b" if os.path.exists(ruta) else "wb"
+    with open(ruta, modo) as f:
+        f.truncate(tamano)
+        if hasattr(os, "posix_fallocate") and tamano:
+            try:
+                os.posix_fallocate(f.fileno(), 0, tamano)
+            except OSError:
+                pass  # Sistemas de archivos sin soporte: basta con el truncate
+
+
+def _leer_estado_descarga(ruta_estado, clave):
+    try:
+        with open(ruta_estado, encoding="utf-8") as f:
+            estado = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return estado if estado.get("clave") == clave else None
+
+
+def _guardar_estado_descarga(ruta_estado, estado):
+    try:
+        with open(ruta_estado + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(estado, f)
+        os.replace(ruta_estado + ".tmp", ruta_estado)
+    except OSError:
+        pass  # Sin estado local la descarga funciona igual; solo no se podrá reanudar
+
+
+def descargar_archivo_paralelo(
+    drive_id,
+    item_id,
+    ruta_destino,
+    token_acceso,
+    conexiones=8,
+    tamano_fragmento=FRAGMENTO_DESCARGA,
+    intentos_maximos=5
+):
+    """
+    Descarga un archivo de SharePoint por rangos de bytes con varias conexiones a la vez.
+
+    Se resuelve la URL de descarga directa del archivo ('@microsoft.graph.downloadUrl'), se
+    preasigna el archivo local con su tamaño final y cada rango se escribe en su posición
+    (`os.pwrite`, o mmap donde no existe) según va llegando. Un rango que falla se reintenta
+    él solo, desde el último byte recibido.
+
+    Mientras dura, la descarga se escribe en `<ruta_destino>.parcial` y los rangos terminados
+    se anotan en `<ruta_destino>.descarga.json`: si se interrumpe, la siguiente llamada con la
+    misma ruta solo pide los rangos que faltan (siempre que el archivo remoto no haya cambiado).
+
+    Args:
+        drive_id (str): ID de la unidad (Drive) donde está el archivo.
+        item_id (str): ID del archivo (Item).
+        ruta_destino (str): Ruta local completa donde se guardará el archivo.
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
+        conexiones (int): Rangos descargados a la vez.
+        tamano_fragmento (int): Bytes de cada rango.
+        intentos_maximos (int): Fallos permitidos por rango antes de abandonar la descarga.
+
+    Returns:
+        bool: True si la descarga fue exitosa, False en caso contrario.
+    """
+    try:
+        item = _obtener_metadatos_descarga(drive_id, item_id, token_acceso)
+    except requests.exceptions.RequestException as e:
+        print(f"Error al obtener los datos del archivo: {e}")
+        return False
+
+    tamano = item.get("size")
+    if "@microsoft.graph.downloadUrl" not in item or tamano is None:
+        # Carpetas, notebooks de OneNote...: no tienen contenido descargable por rangos
+        print("El item no tiene URL de descarga directa; se descarga con una sola conexión.")
+        return descargar_archivo_por_id(drive_id, item_id, ruta_destino, token_acceso)
+
+    directorio = os.path.dirname(ruta_destino)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    ruta_parcial = f"{ruta_destino}.parcial"
+    ruta_estado = f"{ruta_destino}.descarga.json"
+    if tamano == 0:
+        open(ruta_destino, "wb").close()
+        # Restos de una descarga anterior del mismo destino, cuando el archivo aún tenía contenido
+        for ruta in (ruta_parcial, ruta_estado):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        return True
+
+    # Si el archivo cambia en SharePoint cambia su cTag: lo ya descargado no sirve
+    clave = f"{drive_id}/{item_id}:{item.get('cTag') or item.get('eTag')}:{tamano}"
+
+    estado = _leer_estado_descarga(ruta_estado, clave) if os.path.exists(ruta_parcial) else None
+    if estado and os.path.getsize(ruta_parcial) == tamano:
+        tamano_fragmento = estado["tamano_fragmento"]
+        completos = set(estado["completos"])
+        print(f"Reanudando la descarga de {item.get('name')}: {len(completos)} rangos ya descargados")
+    else:
+        completos = set()
+    estado = {"clave": clave, "tamano_fragmento": tamano_fragmento, "completos": sorted(completos)}
+
+    rangos = [
+        (indice, inicio, min(inicio + tamano_fragmento, tamano) - 1)
+        for indice, inicio in enumerate(range(0, tamano, tamano_fragmento))
+        if indice not in completos
+    ]
+
+    _preasignar(ruta_parcial, tamano)
+    _guardar_estado_descarga(ruta_estado, estado)
+
+    url = {"actual": item["@microsoft.graph.downloadUrl"]}
+    lock = threading.Lock()
+    abortar = threading.Event()
+    local = threading.local()
+    sesiones = []  # Una por hilo; se cierran al terminar para liberar sus conexiones
+    escritor = _EscritorPosicional(ruta_parcial, tamano)
+
+    def _renovar_url(caducada):
+        # La URL de descarga caduca al cabo de un rato: un solo hilo la renueva para todos
+        with lock:
+            if url["actual"] == caducada:
+                nueva = _obtener_metadatos_descarga(drive_id, item_id, token_acceso).get("@microsoft.graph.downloadUrl")
+                if not nueva:
+                    # Mismo tipo de error que el resto de fallos: el rango lo reintenta
+                    raise requests.exceptions.RequestException("Graph no ha devuelto una URL de descarga nueva")
+                url["actual"] = nueva
+
+    def _descargar_rango(indice, inicio, fin):
+        if not hasattr(local, "http"):
+            local.http = requests.Session()  # Keep-alive entre rangos del mismo hilo
+            with lock:
+                sesiones.append(local.http)
+        posicion = inicio
+        fallos = 0
+        while not abortar.is_set():
+            url_actual = url["actual"]
+            try:
+                # La URL de descarga ya va firmada: no se envía el token
+                with local.http.get(
+                    url_actual, headers={"Range": f"bytes={posicion}-{fin}"}, stream=True, timeout=(10, 60)
+                ) as respuesta:
+                    if respuesta.status_code in (401, 403):
+                        _renovar_url(url_actual)
+                        raise requests.exceptions.HTTPError(f"URL de descarga caducada ({respuesta.status_code})")
+                    respuesta.raise_for_status()
+                    if respuesta.status_code != 206 and (posicion, fin) != (0, tamano - 1):
+                        raise requests.exceptions.HTTPError("El servidor no admite descargas por rangos")
+                    for bloque in respuesta.iter_content(chunk_size=1024 * 1024):
+                        escritor.escribir(posicion, bloque)
+                        posicion += len(bloque)
+                if posicion <= fin:
+                    raise requests.exceptions.ConnectionError(f"Rango incompleto: faltan {fin - posicion + 1} bytes")
+                break
+            except requests.exceptions.RequestException as e:
+                fallos += 1
+                if fallos > intentos_maximos:
+                    print(f"Error al descargar el rango {inicio}-{fin}: {e}")
+                    abortar.set()
+                    return False
+                espera = min(30, 2 ** fallos)
+                print(f"Fallo en el rango {inicio}-{fin} en el byte {posicion} ({e}). Reintentando en {espera} segundos...")
+                time.sleep(espera)
+        else:
+            return False
+
+        with lock:
+            completos.add(indice)
+            estado["completos"] = sorted(completos)
+            _guardar_estado_descarga(ruta_estado, estado)
+        return True
+
+    inicio_descarga = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, conexiones), thread_name_prefix="descarga-sharepoint") as executor:
+            resultados = list(executor.map(lambda rango: _descargar_rango(*rango), rangos))
+    finally:
+        escritor.cerrar()
+        for sesion in sesiones:
+            sesion.close()
+
+    if not all(resultados):
+        print(f"Descarga de {item.get('name')} interrumpida; se puede reanudar con la misma ruta de destino.")
+        return False
+
+    os.replace(ruta_parcial, ruta_destino)
+    if os.path.exists(ruta_estado):
+        os.remove(ruta_estado)
+    duracion = max(time.monotonic() - inicio_descarga, 1e-6)
+    print(f"Archivo descargado exitosamente en: {ruta_destino} ({tamano / duracion / 1e6:.1f} MB/s)")
+    return True
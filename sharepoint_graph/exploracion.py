@@ -1,5 +1,21 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from .autenticacion import obtener_headers_auth
+from .autenticacion import GRAPH_URL, obtener_headers_auth
+from .utilidades import peticion_con_reintentos
+
+# Campos que necesita el rastreador para descender por las carpetas si se pide un $select
+CAMPOS_RASTREO = ("id", "name", "folder")
+
+
+class CarpetasNoListadas(requests.exceptions.RequestException):
+    """Carpetas que `rastrear_carpeta` no pudo listar: sus subárboles faltan en lo entregado."""
+
+    def __init__(self, fallos):
+        rutas = ", ".join(f"'{ruta}'" for ruta in list(fallos)[:5])
+        super().__init__(f"No se pudieron listar {len(fallos)} carpetas ({rutas}{', ...' if len(fallos) > 5 else ''})")
+        self.fallos = fallos
 
 def listar_contenido_carpeta(drive_id, folder_id, token_acceso):
     """
@@ -8,7 +24,7 @@ def listar_contenido_carpeta(drive_id, folder_id, token_acceso):
     Args:
         drive_id (str): ID del Drive.
         folder_id (str): ID de la carpeta (o 'root' para la raíz).
-        token_acceso (str): Token de acceso.
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
 
     Returns:
         list: Lista de diccionarios, donde cada diccionario es un item (archivo o carpeta).
@@ -40,11 +56,12 @@ def listar_contenido_carpeta(drive_id, folder_id, token_acceso):
 def explorar_carpeta_recursiva(drive_id, folder_id, token_acceso, nivel=0):
     """
     Generador que recorre recursivamente una estructura de carpetas.
+    Para árboles grandes o profundos, usa `rastrear_carpeta` (concurrente y sin recursión).
     
     Args:
         drive_id (str): ID del Drive.
         folder_id (str): ID de la carpeta inicial.
-        token_acceso (str): Token de acceso.
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
         nivel (int): Nivel de profundidad actual (para indentación visual si se desea).
     
     Yields:
@@ -62,6 +79,108 @@ def explorar_carpeta_recursiva(drive_id, folder_id, token_acceso, nivel=0):
             # Llamada recursiva (yield from)
             yield from explorar_carpeta_recursiva(drive_id, nuevo_folder_id, token_acceso, nivel + 1)
 
+def rastrear_carpeta(
+    drive_id,
+    folder_id,
+    token_acceso,
+    campos=None,
+    max_concurrencia=8,
+    tamano_pagina=999,
+    intentos_maximos=5
+):
+    """
+    Generador que recorre una estructura de carpetas en anchura, listando varias carpetas a
+    la vez.
+
+    Las carpetas pendientes forman una cola de trabajo que atiende un pool de
+    `max_concurrencia` hilos; cada página de resultados se entrega en cuanto llega, sin esperar
+    a que termine su carpeta ni las demás. No usa recursión, así que la profundidad del árbol
+    no está limitada por Python. El orden de los items entre carpetas no está garantizado.
+
+    Las páginas descargadas pasan por una cola acotada: si quien consume va más lento que la
+    red, los hilos esperan en lugar de acumular el árbol en memoria. Una carpeta que no se
+    puede listar no detiene el recorrido del resto; al terminar se lanza `CarpetasNoListadas`
+    con todas las que fallaron, para que un recorrido incompleto no pase por completo.
+
+    Args:
+        drive_id (str): ID del Drive.
+        folder_id (str): ID de la carpeta inicial (o 'root' para la raíz).
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
+        campos (list, opcional): Propiedades del driveItem a pedir ($select), p.ej.
+            ['size', 'lastModifiedDateTime']. Se añaden siempre 'id', 'name' y 'folder'.
+        max_concurrencia (int): Carpetas listadas a la vez.
+        tamano_pagina (int): Items por página ($top).
+        intentos_maximos (int): Reintentos por página ante 429, 5xx o errores de conexión.
+
+    Yields:
+        tuple: (item, nivel, ruta) por cada archivo o carpeta encontrado, donde `ruta` es la
+        ruta del item relativa a la carpeta inicial (p.ej. 'Informes/2024/enero.xlsx').
+
+    Raises:
+        CarpetasNoListadas: Si alguna carpeta no se pudo listar (tras entregar todo lo demás).
+            Su atributo `fallos` es un diccionario {ruta: error}.
+    """
+    parametros = {"$top": tamano_pagina}
+    if campos:
+        parametros["$select"] = ",".join(dict.fromkeys([*CAMPOS_RASTREO, *campos]))
+
+    # Unas pocas páginas por hilo: la descarga va por delante de quien consume, pero acotada
+    resultados = queue.Queue(maxsize=2 * max_concurrencia)
+    cancelado = threading.Event()
+
+    def _publicar(elemento):
+        # Espera a que haya hueco en la cola, salvo que quien consume haya abandonado el generador
+        while not cancelado.is_set():
+            try:
+                resultados.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _listar(carpeta_id, nivel, ruta):
+        # Se publica cada página en la cola; (None, ..., error) marca el final de la carpeta
+        endpoint = f"{GRAPH_URL}/drives/{drive_id}/items/{carpeta_id}/children"
+        params = parametros
+        error = None
+        try:
+            while endpoint and not cancelado.is_set():
+                respuesta = peticion_con_reintentos("GET", endpoint, token_acceso, intentos_maximos, params=params)
+                respuesta.raise_for_status()
+                data = respuesta.json()
+                if not _publicar((data.get("value", []), nivel, ruta, None)):
+                    return
+                # El nextLink ya incluye $top, $select y el token de la página siguiente
+                endpoint, params = data.get("@odata.nextLink"), None
+        except Exception as e:  # También respuestas que no son JSON: se informa al terminar
+            error = e
+        _publicar((None, nivel, ruta, error))
+
+    executor = ThreadPoolExecutor(max_workers=max_concurrencia, thread_name_prefix="rastreo-sharepoint")
+    fallos = {}
+    try:
+        executor.submit(_listar, folder_id, 0, "")
+        pendientes = 1
+        while pendientes:
+            items, nivel, ruta, error = resultados.get()
+            if items is None:
+                pendientes -= 1
+                if error is not None:
+                    fallos[ruta or folder_id] = error
+                continue
+            for item in items:
+                ruta_item = f"{ruta}/{item.get('name')}" if ruta else item.get("name")
+                yield item, nivel, ruta_item
+                if "folder" in item:
+                    pendientes += 1
+                    executor.submit(_listar, item["id"], nivel + 1, ruta_item)
+        if fallos:
+            raise CarpetasNoListadas(fallos)
+    finally:
+        # Si quien consume abandona el generador, se descartan las carpetas aún en cola
+        cancelado.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
 if __name__ == "__main__":
     # Ejemplo de uso (simulado, requiere token real)
     pass
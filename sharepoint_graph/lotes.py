@@ -0,0 +1,256 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+import requests
+from .autenticacion import GRAPH_URL
+from .utilidades import CODIGOS_REINTENTABLES, codificar_url_compartida, peticion_con_reintentos, segundos_retry_after
+
+# Máximo de peticiones por llamada a $batch que admite Graph
+MAXIMO_POR_LOTE = 20
+
+
+def _url_relativa(url):
+    """Las peticiones de un lote llevan la URL relativa a la versión de Graph ('/drives/...')."""
+    return url[len(GRAPH_URL):] if url.startswith(GRAPH_URL) else url
+
+
+def _cabecera(respuesta, nombre):
+    for clave, valor in (respuesta.get("headers") or {}).items():
+        if clave.lower() == nombre.lower():
+            return valor
+    return None
+
+
+def _agrupar_en_lotes(peticiones):
+    """
+    Reparte las peticiones en lotes de como mucho 20. Graph solo resuelve 'dependsOn' dentro del
+    mismo lote, así que cada cadena de dependencias va entera en un lote.
+    """
+    # Componentes conexos del grafo de dependencias (union-find)
+    padre = {p["id"]: p["id"] for p in peticiones}
+
+    def raiz(x):
+        while padre[x] != x:
+            padre[x] = padre[padre[x]]
+            x = padre[x]
+        return x
+
+    for peticion in peticiones:
+        for dependencia in peticion.get("dependsOn", []):
+            if dependencia in padre:
+                padre[raiz(peticion["id"])] = raiz(dependencia)
+
+    grupos = {}
+    for peticion in peticiones:
+        grupos.setdefault(raiz(peticion["id"]), []).append(peticion)
+
+    lotes = []
+    for grupo in grupos.values():
+        if len(grupo) > MAXIMO_POR_LOTE:
+            raise ValueError(f"Una cadena de dependencias tiene {len(grupo)} peticiones; $batch admite {MAXIMO_POR_LOTE}")
+        destino = next((lote for lote in lotes if len(lote) + len(grupo) <= MAXIMO_POR_LOTE), None)
+        if destino is None:
+            lotes.append(list(grupo))
+        else:
+            destino.extend(grupo)
+    return lotes
+
+
+def _enviar_lote(lote, token_acceso, intentos_maximos):
+    """POST a /$batch. Devuelve {id: respuesta}; si el lote entero falla, una respuesta de error por petición."""
+    try:
+        respuesta = peticion_con_reintentos(
+            "POST", f"{GRAPH_URL}/$batch", token_acceso, intentos_maximos, json={"requests": lote}
+        )
+        respuesta.raise_for_status()
+        return {r["id"]: r for r in respuesta.json().get("responses", [])}
+    except requests.exceptions.RequestException as e:
+        print(f"Error al enviar el lote a Graph: {e}")
+        return {p["id"]: {"id": p["id"], "status": None, "body": {"error": {"message": str(e)}}} for p in lote}
+
+
+def ejecutar_lote(peticiones, token_acceso, max_concurrencia=4, intentos_maximos=5):
+    """
+    Ejecuta peticiones a Graph agrupadas en llamadas JSON $batch (hasta 20 por llamada).
+
+    Cada petición es un diccionario con el formato de $batch: 'method', 'url' (relativa a la
+    versión, p.ej. '/drives/{id}/items/{id}', o completa) y opcionalmente 'id', 'body',
+    'headers' y 'dependsOn' (lista de ids que deben ejecutarse antes). Las peticiones que
+    dependen unas de otras se envían en el mismo lote.
+
+    Solo se reenvían las peticiones que fallan de forma transitoria (429 o 5xx, esperando lo que
+    indique su 'Retry-After') y las que fallaron (424) porque dependían de una de ellas; las
+    que ya tuvieron éxito no se repiten.
+
+    Args:
+        peticiones (list): Peticiones en formato $batch. Sin 'id', se numeran por su posición.
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
+        max_concurrencia (int): Lotes enviados a la vez.
+        intentos_maximos (int): Rondas de reintento de las peticiones fallidas.
+
+    Returns:
+        dict: {id: respuesta} con la última respuesta de cada petición ('status', 'headers' y
+        'body'). Si un lote no se pudo enviar, sus peticiones tienen 'status' None.
+    """
+    preparadas = {}
+    for posicion, peticion in enumerate(peticiones):
+        peticion = dict(peticion, id=str(peticion.get("id", posicion)), url=_url_relativa(peticion["url"]))
+        if "body" in peticion and not any(c.lower() == "content-type" for c in peticion.get("headers", {})):
+            peticion["headers"] = {**peticion.get("headers", {}), "Content-Type": "application/json"}
+        preparadas[peticion["id"]] = peticion
+
+    resultados = {}
+    pendientes = list(preparadas.values())
+    ronda = 0
+    while pendientes:
+        with ThreadPoolExecutor(max_workers=max_concurrencia, thread_name_prefix="lote-graph") as executor:
+            for respuestas in executor.map(
+                lambda lote: _enviar_lote(lote, token_acceso, intentos_maximos), _agrupar_en_lotes(pendientes)
+            ):
+                resultados.update(respuestas)
+
+        reintentar = {
+            p["id"] for p in pendientes if resultados.get(p["id"], {}).get("status") in CODIGOS_REINTENTABLES
+        }
+        # Las que fallaron (424) porque dependían de una petición que se va a reintentar
+        hay_nuevas = True
+        while hay_nuevas:
+            hay_nuevas = False
+            for peticion in pendientes:
+                if (
+                    peticion["id"] not in reintentar
+                    and resultados.get(peticion["id"], {}).get("status") == 424
+                    and any(d in reintentar for d in peticion.get("dependsOn", []))
+                ):
+                    reintentar.add(peticion["id"])
+                    hay_nuevas = True
+
+        ronda += 1
+        if not reintentar or ronda > intentos_maximos:
+            break
+
+        # La espera la marcan las peticiones con throttling, no las 424 que dependían de ellas
+        por_defecto = min(60, 2 ** ronda)
+        espera = max(
+            segundos_retry_after(_cabecera(resultados[i], "Retry-After"), por_defecto)
+            for i in reintentar if resultados[i].get("status") in CODIGOS_REINTENTABLES
+        )
+        print(f"{len(reintentar)} peticiones del lote han fallado. Reintentando en {espera} segundos...")
+        time.sleep(espera)
+
+        # Las dependencias que ya tuvieron éxito no se repiten: se quitan de 'dependsOn'
+        pendientes = []
+        for id_peticion in (i for i in preparadas if i in reintentar):  # En el orden original
+            peticion = dict(preparadas[id_peticion])
+            if "dependsOn" in peticion:
+                peticion["dependsOn"] = [d for d in peticion["dependsOn"] if d in reintentar]
+                if not peticion["dependsOn"]:
+                    del peticion["dependsOn"]
+            pendientes.append(peticion)
+
+    return resultados
+
+
+def _cuerpo_si_exito(respuesta, descripcion):
+    """Cuerpo de una respuesta del lote si fue correcta; si no, informa del error y devuelve None."""
+    if respuesta and respuesta.get("status") and 200 <= respuesta["status"] < 300:
+        return respuesta.get("body")
+    error = ((respuesta or {}).get("body") or {}).get("error", {})
+    print(f"Error en {descripcion}: {(respuesta or {}).get('status')} {error.get('message', '')}")
+    return None
+
+
+def resolver_urls_a_drive_items(urls_compartidas, token_acceso, max_concurrencia=4):
+    """
+    Versión por lotes de `resolver_url_a_drive_item`: resuelve muchas URLs compartidas de
+    SharePoint con una llamada $batch por cada 20.
+
+    Args:
+        urls_compartidas (list): URLs de SharePoint.
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
+        max_concurrencia (int): Lotes enviados a la vez.
+
+    Returns:
+        dict: {url: driveItem} con None en las URLs que no se pudieron resolver.
+    """
+    urls = list(dict.fromkeys(urls_compartidas))
+    peticiones = [
+        {"id": str(i), "method": "GET", "url": f"/shares/{codificar_url_compartida(url)}/driveItem"}
+        for i, url in enumerate(urls)
+    ]
+    respuestas = ejecutar_lote(peticiones, token_acceso, max_concurrencia)
+    return {url: _cuerpo_si_exito(respuestas.get(str(i)), f"la URL {url}") for i, url in enumerate(urls)}
+
+
+def obtener_metadatos_items(drive_id, item_ids, token_acceso, campos=None, max_concurrencia=4):
+    """
+    Obtiene los metadatos (driveItem) de muchos items de un mismo Drive por lotes.
+
+    Args:
+        drive_id (str): ID del Drive.
+        item_ids (list): IDs de los items.
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
+        campos (list, opcional): Propiedades a pedir ($select), p.ej. ['id', 'name', 'size'].
+        max_concurrencia (int): Lotes enviados a la vez.
+
+    Returns:
+        dict: {item_id: driveItem} con None en los items que no se pudieron obtener.
+    """
+    ids = list(dict.fromkeys(item_ids))
+    seleccion = f"?$select={','.join(campos)}" if campos else ""
+    peticiones = [
+        {"id": str(i), "method": "GET", "url": f"/drives/{drive_id}/items/{quote(item_id)}{seleccion}"}
+        for i, item_id in enumerate(ids)
+    ]
+    respuestas = ejecutar_lote(peticiones, token_acceso, max_concurrencia)
+    return {item_id: _cuerpo_si_exito(respuestas.get(str(i)), f"el item {item_id}") for i, item_id in enumerate(ids)}
+
+
+def listar_contenido_carpetas(drive_id, folder_ids, token_acceso, campos=None, tamano_pagina=999, max_concurrencia=4):
+    """
+    Versión por lotes de `listar_contenido_carpeta`: lista los hijos de muchas carpetas
+    conocidas. Las páginas siguientes ('@odata.nextLink') de todas las carpetas se piden
+    también por lotes, en rondas sucesivas.
+
+    Args:
+        drive_id (str): ID del Drive.
+        folder_ids (list): IDs de las carpetas ('root' para la raíz).
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
+        campos (list, opcional): Propiedades de cada item a pedir ($select).
+        tamano_pagina (int): Items por página ($top).
+        max_concurrencia (int): Lotes enviados a la vez.
+
+    Returns:
+        dict: {folder_id: [items]}. Si una carpeta falla se informa del error y se devuelve lo
+        obtenido hasta entonces.
+    """
+    ids = list(dict.fromkeys(folder_ids))
+    parametros = f"?$top={tamano_pagina}" + (f"&$select={','.join(campos)}" if campos else "")
+    contenido = {folder_id: [] for folder_id in ids}
+    pendientes = {
+        str(i): f"/drives/{drive_id}/items/{quote(folder_id)}/children{parametros}" for i, folder_id in enumerate(ids)
+    }
+
+    while pendientes:
+        peticiones = [{"id": clave, "method": "GET", "url": url} for clave, url in pendientes.items()]
+        respuestas = ejecutar_lote(peticiones, token_acceso, max_concurrencia)
+        siguientes = {}
+        for clave in pendientes:
+            folder_id = ids[int(clave)]
+            data = _cuerpo_si_exito(respuestas.get(clave), f"la carpeta {folder_id}")
+            if data is None:
+                continue
+            contenido[folder_id].extend(data.get("value", []))
+            if data.get("@odata.nextLink"):
+                siguientes[clave] = _url_relativa(data["@odata.nextLink"])
+        pendientes = siguientes
+
+    return contenido
+
+
+if __name__ == "__main__":
+    # Ejemplo de uso (requiere token real)
+    # items = resolver_urls_a_drive_items(["https://tu-organizacion.sharepoint.com/:x:/s/sitio/EjemPl0..."], "TU_TOKEN_AQUI")
+    # for url, item in items.items():
+    #     print(url, item and item.get("id"))
+    pass
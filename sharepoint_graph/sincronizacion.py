@@ -0,0 +1,253 @@
+import sqlite3
+from datetime import datetime, timezone
+import requests
+from .autenticacion import GRAPH_URL
+from .utilidades import peticion_con_reintentos
+
+# Tipos de cambio emitidos por `sincronizar_cambios_drive`
+CREADO = "creado"
+MODIFICADO = "modificado"
+ELIMINADO = "eliminado"
+
+# Campos mínimos que necesita la sincronización si se pide un $select
+CAMPOS_NECESARIOS = ("id", "name", "eTag", "parentReference", "deleted", "file", "folder", "root")
+
+# Resincronizaciones (410) seguidas que se aceptan en una misma ejecución
+RESINCRONIZACIONES_MAXIMAS = 3
+
+
+class _ResyncRequerido(Exception):
+    """Graph ha invalidado el token de delta (410 Gone): hay que enumerar el drive de nuevo."""
+
+    def __init__(self, url):
+        super().__init__(url)
+        self.url = url
+
+
+def abrir_estado_sincronizacion(ruta_estado="sincronizacion_sharepoint.db"):
+    """
+    Abre (o crea) la base de datos SQLite donde se guarda, por drive, el último 'deltaLink', un
+    índice de los items conocidos (id, carpeta padre, nombre y eTag) y el progreso de una
+    sincronización que se quedó a medias.
+
+    Args:
+        ruta_estado (str): Ruta del archivo SQLite.
+
+    Returns:
+        sqlite3.Connection: Conexión lista para `sincronizar_cambios_drive`.
+    """
+    conexion = sqlite3.connect(ruta_estado)
+    with conexion:
+        conexion.execute(
+            "CREATE TABLE IF NOT EXISTS enlaces_delta ("
+            " drive_id TEXT PRIMARY KEY, delta_link TEXT NOT NULL, actualizado TEXT)"
+        )
+        conexion.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " drive_id TEXT NOT NULL, id TEXT NOT NULL, parent_id TEXT, nombre TEXT, etag TEXT,"
+            " es_carpeta INTEGER, PRIMARY KEY (drive_id, id))"
+        )
+        conexion.execute("CREATE INDEX IF NOT EXISTS items_padre ON items (drive_id, parent_id)")
+        # Página por la que seguir una sincronización interrumpida, y si era una resincronización
+        conexion.execute(
+            "CREATE TABLE IF NOT EXISTS progreso_delta ("
+            " drive_id TEXT PRIMARY KEY, enlace TEXT NOT NULL, resincronizando INTEGER NOT NULL)"
+        )
+        # Items vistos durante una resincronización en curso (los demás se habrán eliminado)
+        conexion.execute(
+            "CREATE TABLE IF NOT EXISTS vistos_resync (drive_id TEXT NOT NULL, id TEXT NOT NULL, PRIMARY KEY (drive_id, id))"
+        )
+    return conexion
+
+
+def _pedir_pagina_delta(url, token_acceso, intentos_maximos):
+    """GET de una página de delta. Un 410 indica que hay que volver a enumerar el drive."""
+    # Con un proveedor, cada página usa el token vigente (la enumeración inicial puede durar horas)
+    respuesta = peticion_con_reintentos("GET", url, token_acceso, intentos_maximos)
+    if respuesta.status_code == 410:
+        raise _ResyncRequerido(respuesta.headers.get("Location"))
+    respuesta.raise_for_status()
+    return respuesta.json()
+
+
+def _descendientes(conexion, drive_id, folder_id):
+    """Items conocidos bajo una carpeta (a cualquier profundidad), sin recursión en Python."""
+    return conexion.execute(
+        "WITH RECURSIVE sub(id) AS ("
+        " SELECT id FROM items WHERE drive_id = ? AND parent_id = ?"
+        " UNION SELECT i.id FROM items i JOIN sub ON i.parent_id = sub.id WHERE i.drive_id = ?)"
+        " SELECT i.id, i.parent_id, i.nombre FROM items i JOIN sub ON i.id = sub.id WHERE i.drive_id = ?",
+        (drive_id, folder_id, drive_id, drive_id)
+    ).fetchall()
+
+
+def sincronizar_cambios_drive(
+    drive_id,
+    token_acceso,
+    estado,
+    campos=None,
+    intentos_maximos=5,
+    resincronizaciones_maximas=RESINCRONIZACIONES_MAXIMAS
+):
+    """
+    Generador con los cambios de un drive desde la sincronización anterior, usando la consulta
+    delta de Graph (`/drives/{drive-id}/root/delta`).
+
+    La primera vez enumera el drive completo (todos los items salen como 'creado'); a partir de
+    ahí solo pide lo ocurrido desde el último 'deltaLink' guardado. Cada cambio se emite como
+    una tupla (tipo, item):
+        - 'creado': item que no estaba en el índice local.
+        - 'modificado': item conocido cuyo eTag ha cambiado (las carpetas también cambian
+          cuando cambia su contenido).
+        - 'eliminado': item conocido con la faceta 'deleted'. Al borrar una carpeta se emiten
+          también sus descendientes conocidos, que Graph no siempre incluye.
+
+    Si Graph responde 410 (token caducado o 'resyncRequired'), se enumera el drive de nuevo y
+    los items conocidos que ya no aparecen se emiten como 'eliminado'. Si lo vuelve a pedir
+    más de `resincronizaciones_maximas` veces en la misma ejecución, se abandona con un error.
+
+    El índice se guarda página a página, junto con el enlace de la página siguiente, en cuanto
+    quien consume ha procesado todos los cambios de la página; al terminar se guarda el nuevo
+    'deltaLink'. Si la ejecución se interrumpe (o el código que consume los cambios falla), la
+    siguiente continúa por la página en la que se quedó y vuelve a emitir solo sus cambios
+    (entrega "al menos una vez"). La base de datos solo se bloquea mientras se procesa una
+    página, no durante toda la sincronización.
+
+    Args:
+        drive_id (str): ID del Drive.
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
+        estado (sqlite3.Connection | str): Conexión de `abrir_estado_sincronizacion` o ruta
+            del archivo SQLite.
+        campos (list, opcional): Propiedades del driveItem a pedir ($select) para reducir el
+            tamaño de las respuestas. Se añaden siempre las que necesita la sincronización.
+        intentos_maximos (int): Reintentos por página ante 429, 5xx o errores de conexión.
+        resincronizaciones_maximas (int): Respuestas 410 que se aceptan en una misma ejecución.
+
+    Yields:
+        tuple: (tipo, item) por cada cambio.
+
+    Raises:
+        RuntimeError: Si Graph pide resincronizar más de `resincronizaciones_maximas` veces.
+    """
+    conexion = abrir_estado_sincronizacion(estado) if isinstance(estado, str) else estado
+    propia = isinstance(estado, str)
+
+    url_inicial = f"{GRAPH_URL}/drives/{drive_id}/root/delta"
+    if campos:
+        url_inicial += "?$select=" + ",".join(dict.fromkeys([*CAMPOS_NECESARIOS, *campos]))
+
+    fila = conexion.execute("SELECT delta_link FROM enlaces_delta WHERE drive_id = ?", (drive_id,)).fetchone()
+    progreso = conexion.execute(
+        "SELECT enlace, resincronizando FROM progreso_delta WHERE drive_id = ?", (drive_id,)
+    ).fetchone()
+    if progreso is not None:
+        # Una ejecución anterior se quedó a medias: se sigue por la última página guardada
+        url, resincronizando = progreso[0], bool(progreso[1])
+    else:
+        url, resincronizando = (fila[0] if fila else url_inicial), False
+    resincronizaciones = 0
+    emitidos = 0
+
+    try:
+        while True:
+            try:
+                datos = _pedir_pagina_delta(url, token_acceso, intentos_maximos)
+            except _ResyncRequerido as resync:
+                resincronizaciones += 1
+                if resincronizaciones > resincronizaciones_maximas:
+                    raise RuntimeError(
+                        f"Graph ha pedido resincronizar el drive {drive_id} {resincronizaciones} veces seguidas"
+                    ) from None
+                print(f"Graph pide resincronizar el drive {drive_id}; se enumera de nuevo.")
+                # Se anotan los items vistos en la nueva enumeración para detectar los que ya no existen
+                url = resync.url or url_inicial
+                resincronizando = True
+                conexion.execute("DELETE FROM vistos_resync WHERE drive_id = ?", (drive_id,))
+                continue
+
+            for item in datos.get("value", []):
+                if "root" in item:
+                    continue
+                item_id = item["id"]
+                conocido = conexion.execute(
+                    "SELECT etag, es_carpeta FROM items WHERE drive_id = ? AND id = ?", (drive_id, item_id)
+                ).fetchone()
+
+                if "deleted" in item:
+                    if resincronizando:
+                        conexion.execute("DELETE FROM vistos_resync WHERE drive_id = ? AND id = ?", (drive_id, item_id))
+                    if conocido is None:
+                        continue  # Creado y borrado entre dos sincronizaciones
+                    eliminados = [(item_id, item)]
+                    if conocido[1]:
+                        eliminados += [
+                            (hijo_id, {"id": hijo_id, "name": nombre, "parentReference": {"driveId": drive_id, "id": padre}, "deleted": {}})
+                            for hijo_id, padre, nombre in _descendientes(conexion, drive_id, item_id)
+                        ]
+                    for eliminado_id, eliminado in eliminados:
+                        conexion.execute("DELETE FROM items WHERE drive_id = ? AND id = ?", (drive_id, eliminado_id))
+                        emitidos += 1
+                        yield ELIMINADO, eliminado
+                    continue
+
+                if resincronizando:
+                    conexion.execute("INSERT OR IGNORE INTO vistos_resync (drive_id, id) VALUES (?, ?)", (drive_id, item_id))
+                etag = item.get("eTag")
+                if conocido is not None and etag is not None and conocido[0] == etag:
+                    continue  # Sin cambios desde la última vez (p.ej. durante una resincronización)
+                conexion.execute(
+                    "INSERT OR REPLACE INTO items (drive_id, id, parent_id, nombre, etag, es_carpeta) VALUES (?, ?, ?, ?, ?, ?)",
+                    (drive_id, item_id, item.get("parentReference", {}).get("id"), item.get("name"), etag, "folder" in item)
+                )
+                emitidos += 1
+                yield (CREADO if conocido is None else MODIFICADO), item
+
+            if "@odata.nextLink" in datos:
+                # Quien consume ya ha procesado la página: se guarda junto con el punto de continuación
+                url = datos["@odata.nextLink"]
+                conexion.execute(
+                    "INSERT OR REPLACE INTO progreso_delta (drive_id, enlace, resincronizando) VALUES (?, ?, ?)",
+                    (drive_id, url, resincronizando)
+                )
+                conexion.commit()
+                continue
+            delta_link = datos.get("@odata.deltaLink")
+            break
+
+        if resincronizando:
+            # Resincronización: lo que estaba en el índice y no ha aparecido ya no existe
+            desaparecidos = conexion.execute(
+                "SELECT id, parent_id, nombre FROM items WHERE drive_id = ?"
+                " AND id NOT IN (SELECT id FROM vistos_resync WHERE drive_id = ?)",
+                (drive_id, drive_id)
+            ).fetchall()
+            for item_id, padre, nombre in desaparecidos:
+                conexion.execute("DELETE FROM items WHERE drive_id = ? AND id = ?", (drive_id, item_id))
+                emitidos += 1
+                yield ELIMINADO, {"id": item_id, "name": nombre, "parentReference": {"driveId": drive_id, "id": padre}, "deleted": {}}
+
+        if delta_link:
+            actualizado = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            conexion.execute(
+                "INSERT OR REPLACE INTO enlaces_delta (drive_id, delta_link, actualizado) VALUES (?, ?, ?)",
+                (drive_id, delta_link, actualizado)
+            )
+        conexion.execute("DELETE FROM progreso_delta WHERE drive_id = ?", (drive_id,))
+        conexion.execute("DELETE FROM vistos_resync WHERE drive_id = ?", (drive_id,))
+        conexion.commit()
+        print(f"Sincronización del drive {drive_id} completada: {emitidos} cambios.")
+
+    except requests.exceptions.RequestException as e:
+        print(f"Error al sincronizar el drive {drive_id}: {e}. Se reintentará desde la última página guardada.")
+    finally:
+        # Lo que no llegó a guardarse (la página en curso) se descarta y se repetirá
+        conexion.rollback()
+        if propia:
+            conexion.close()
+
+
+if __name__ == "__main__":
+    # Ejemplo de uso (requiere token real)
+    # for tipo, item in sincronizar_cambios_drive("DRIVE_ID", "TU_TOKEN_AQUI", "sincronizacion_sharepoint.db", campos=["size", "lastModifiedDateTime"]):
+    #     print(tipo, item.get("name"))
+    pass
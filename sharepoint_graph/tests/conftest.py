@@ -0,0 +1,29 @@
+import json
+import os
+import sys
+
+import pytest
+import requests
+
+# sharepoint_graph se importa como paquete desde la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+@pytest.fixture
+def respuesta_json():
+    """Fábrica de requests.Response con un cuerpo JSON, como las que devuelve Graph."""
+
+    def _crear(cuerpo, codigo=200, cabeceras=None):
+        respuesta = requests.Response()
+        respuesta.status_code = codigo
+        respuesta._content = json.dumps(cuerpo).encode("utf-8")
+        respuesta.headers.update(cabeceras or {})
+        return respuesta
+
+    return _crear
+
+
+@pytest.fixture
+def sin_esperas(monkeypatch):
+    """Anula las esperas entre reintentos."""
+    monkeypatch.setattr("sharepoint_graph.utilidades.time.sleep", lambda segundos: None)
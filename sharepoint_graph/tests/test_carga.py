@@ -0,0 +1,25 @@
+import io
+import os
+
+from sharepoint_graph import carga
+
+
+def test_rechaza_origen_sin_seek(monkeypatch, capsys):
+    sesiones = []
+    monkeypatch.setattr(carga, "crear_sesion_carga", lambda *args: sesiones.append(args))
+
+    lectura, escritura = os.pipe()
+    os.write(escritura, b"datos")
+    os.close(escritura)
+    with os.fdopen(lectura, "rb") as tuberia:
+        assert carga.subir_archivo_grande("drive", "root", tuberia, "token", nombre_archivo="x.bin") is None
+
+    assert sesiones == []  # Se rechaza antes de abrir una sesión de carga
+    assert "no admite seek" in capsys.readouterr().out
+
+
+def test_rechaza_origen_vacio(monkeypatch):
+    sesiones = []
+    monkeypatch.setattr(carga, "crear_sesion_carga", lambda *args: sesiones.append(args))
+    assert carga.subir_archivo_grande("drive", "root", io.BytesIO(), "token", nombre_archivo="x.bin") is None
+    assert sesiones == []
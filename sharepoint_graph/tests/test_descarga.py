@@ -0,0 +1,55 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from sharepoint_graph import descarga
+
+
+class _Caducada(BaseHTTPRequestHandler):
+    """Servidor de descargas cuya URL firmada ya no vale: responde siempre 403."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(403)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def url_caducada():
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Caducada)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}/descarga"
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def test_renovacion_sin_url_se_reintenta_como_otro_fallo(monkeypatch, tmp_path, sin_esperas, url_caducada):
+    metadatos = [{"name": "x.bin", "size": 10, "cTag": "c1", "@microsoft.graph.downloadUrl": url_caducada}]
+    # Al renovar, Graph ya no devuelve la URL de descarga (p.ej. el archivo se ha vuelto a subir)
+    monkeypatch.setattr(
+        descarga, "_obtener_metadatos_descarga",
+        lambda drive_id, item_id, token_acceso: metadatos.pop(0) if metadatos else {"name": "x.bin", "size": 10}
+    )
+    destino = tmp_path / "x.bin"
+    assert descarga.descargar_archivo_paralelo("d", "i", str(destino), "token", conexiones=2, intentos_maximos=2) is False
+    assert not destino.exists()
+
+
+def test_archivo_vacio_borra_restos_de_otra_descarga(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        descarga, "_obtener_metadatos_descarga",
+        lambda drive_id, item_id, token_acceso: {"size": 0, "@microsoft.graph.downloadUrl": "http://no-se-usa"}
+    )
+    destino = tmp_path / "vacio.bin"
+    (tmp_path / "vacio.bin.parcial").write_bytes(b"\0" * 100)
+    (tmp_path / "vacio.bin.descarga.json").write_text('{"clave": "antigua"}')
+
+    assert descarga.descargar_archivo_paralelo("d", "i", str(destino), "token")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["vacio.bin"]
+    assert destino.read_bytes() == b""
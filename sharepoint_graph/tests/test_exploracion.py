@@ -0,0 +1,60 @@
+import pytest
+import requests
+
+from sharepoint_graph import exploracion
+from sharepoint_graph.exploracion import CarpetasNoListadas, rastrear_carpeta
+
+
+def _arbol_falso(monkeypatch, respuesta_json, carpetas, rotas=()):
+    """Sirve {carpeta_id: [items]} como páginas de /children; las carpetas `rotas` dan error."""
+
+    def peticion(metodo, url, token_acceso, intentos_maximos, params=None):
+        carpeta_id = url.split("/items/")[1].split("/")[0]
+        if carpeta_id in rotas:
+            raise requests.exceptions.RetryError(f"{url} fallida")
+        return respuesta_json({"value": carpetas.get(carpeta_id, [])})
+
+    monkeypatch.setattr(exploracion, "peticion_con_reintentos", peticion)
+
+
+def _carpeta(item_id):
+    return {"id": item_id, "name": item_id, "folder": {}}
+
+
+def test_recorre_todo_el_arbol(monkeypatch, respuesta_json):
+    _arbol_falso(monkeypatch, respuesta_json, {
+        "root": [_carpeta("a"), _carpeta("b"), {"id": "f1", "name": "f1.txt"}],
+        "a": [{"id": "f2", "name": "f2.txt"}, _carpeta("c")],
+        "c": [{"id": "f3", "name": "f3.txt"}],
+    })
+    rutas = {ruta for _, _, ruta in rastrear_carpeta("drive", "root", "token", max_concurrencia=2)}
+    assert rutas == {"a", "b", "f1.txt", "a/f2.txt", "a/c", "a/c/f3.txt"}
+
+
+def test_carpeta_fallida_se_informa_al_terminar(monkeypatch, respuesta_json):
+    _arbol_falso(monkeypatch, respuesta_json, {
+        "root": [_carpeta("a"), _carpeta("b")],
+        "b": [{"id": "f1", "name": "f1.txt"}],
+    }, rotas={"a"})
+
+    entregados = []
+    with pytest.raises(CarpetasNoListadas) as error:
+        for _, _, ruta in rastrear_carpeta("drive", "root", "token"):
+            entregados.append(ruta)
+    assert sorted(entregados) == ["a", "b", "b/f1.txt"]
+    assert list(error.value.fallos) == ["a"]
+
+
+def test_cola_acotada_no_bloquea_a_los_hilos(monkeypatch, respuesta_json):
+    # Muchas más páginas que huecos en la cola: los hilos esperan sin bloquearse para siempre
+    carpetas = {"root": [_carpeta(f"c{i}") for i in range(50)]}
+    carpetas.update({f"c{i}": [{"id": f"f{i}", "name": "f.txt"}] for i in range(50)})
+    _arbol_falso(monkeypatch, respuesta_json, carpetas)
+
+    recorrido = rastrear_carpeta("drive", "root", "token", max_concurrencia=2)
+    assert len(list(recorrido)) == 100
+
+    # Abandonar el generador a mitad no deja hilos bloqueados en la cola
+    recorrido = rastrear_carpeta("drive", "root", "token", max_concurrencia=2)
+    next(recorrido)
+    recorrido.close()
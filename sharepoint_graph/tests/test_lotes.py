@@ -0,0 +1,61 @@
+import pytest
+
+from sharepoint_graph import lotes
+from sharepoint_graph.lotes import MAXIMO_POR_LOTE, _agrupar_en_lotes, ejecutar_lote
+
+
+def _peticiones(n, dependencias=None):
+    dependencias = dependencias or {}
+    return [
+        {"id": str(i), "method": "GET", "url": f"/items/{i}", **({"dependsOn": dependencias[i]} if i in dependencias else {})}
+        for i in range(n)
+    ]
+
+
+def test_lotes_de_como_mucho_20():
+    grupos = _agrupar_en_lotes(_peticiones(45))
+    assert [len(lote) for lote in grupos] == [20, 20, 5]
+    assert [p["id"] for lote in grupos for p in lote] == [str(i) for i in range(45)]
+
+
+def test_cadenas_de_dependencias_en_el_mismo_lote():
+    # 0 <- 25 <- 30 y 19 <- 20: cada cadena tiene que ir entera en un lote
+    grupos = _agrupar_en_lotes(_peticiones(40, {25: ["0"], 30: ["25"], 20: ["19"]}))
+    lote_de = {p["id"]: n for n, lote in enumerate(grupos) for p in lote}
+    assert lote_de["0"] == lote_de["25"] == lote_de["30"]
+    assert lote_de["19"] == lote_de["20"]
+    assert all(len(lote) <= MAXIMO_POR_LOTE for lote in grupos)
+
+
+def test_cadena_demasiado_larga():
+    dependencias = {i: [str(i - 1)] for i in range(1, 21)}
+    with pytest.raises(ValueError):
+        _agrupar_en_lotes(_peticiones(21, dependencias))
+
+
+def test_solo_se_reintentan_las_fallidas_y_sus_dependientes(monkeypatch, respuesta_json, sin_esperas):
+    enviados = []
+
+    def peticion(metodo, url, token_acceso, intentos_maximos, json):
+        enviados.append([(p["id"], p.get("dependsOn")) for p in json["requests"]])
+        primera = len(enviados) == 1
+        respuestas = []
+        for p in json["requests"]:
+            if primera and p["id"] == "1":
+                respuestas.append({"id": "1", "status": 429, "headers": {"Retry-After": "0"}, "body": {}})
+            elif primera and p["id"] == "2":
+                respuestas.append({"id": "2", "status": 424, "body": {}})
+            else:
+                respuestas.append({"id": p["id"], "status": 200, "body": {"id": p["id"]}})
+        return respuesta_json({"responses": respuestas})
+
+    monkeypatch.setattr(lotes, "peticion_con_reintentos", peticion)
+    resultados = ejecutar_lote(
+        [{"method": "GET", "url": "/a"}, {"method": "GET", "url": "/b", "dependsOn": ["0"]},
+         {"method": "GET", "url": "/c", "dependsOn": ["0", "1"]}],
+        "token"
+    )
+
+    assert {id_: r["status"] for id_, r in resultados.items()} == {"0": 200, "1": 200, "2": 200}
+    # La segunda ronda no repite '0' (ya tuvo éxito) ni la conserva en 'dependsOn'
+    assert enviados[1] == [("1", None), ("2", ["1"])]
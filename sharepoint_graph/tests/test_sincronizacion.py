@@ -0,0 +1,68 @@
+import pytest
+
+from sharepoint_graph import sincronizacion
+from sharepoint_graph.sincronizacion import CREADO, ELIMINADO, abrir_estado_sincronizacion, sincronizar_cambios_drive
+
+DELTA = "https://graph.microsoft.com/v1.0/drives/drive/root/delta"
+
+
+@pytest.fixture
+def graph(monkeypatch, respuesta_json):
+    """Graph falso: {url: (código, cuerpo)}, con las URLs pedidas anotadas en `pedidas`."""
+    paginas = {}
+    pedidas = []
+
+    def peticion(metodo, url, token_acceso, intentos_maximos):
+        pedidas.append(url)
+        codigo, cuerpo = paginas[url]
+        return respuesta_json(cuerpo, codigo, {"Location": cuerpo.get("location", "")} if codigo == 410 else None)
+
+    monkeypatch.setattr(sincronizacion, "peticion_con_reintentos", peticion)
+    return paginas, pedidas
+
+
+def _item(item_id, etag="1"):
+    return {"id": item_id, "name": item_id, "eTag": etag, "parentReference": {"id": "raiz"}, "file": {}}
+
+
+def test_progreso_guardado_por_pagina(graph):
+    paginas, pedidas = graph
+    paginas[DELTA] = (200, {"value": [_item("a"), _item("b")], "@odata.nextLink": "pagina-2"})
+    paginas["pagina-2"] = (200, {"value": [_item("c")], "@odata.deltaLink": "delta-1"})
+    estado = abrir_estado_sincronizacion(":memory:")
+
+    # Quien consume se detiene a mitad de la segunda página
+    cambios = sincronizar_cambios_drive("drive", "token", estado)
+    assert [item["id"] for _, item in (next(cambios), next(cambios))] == ["a", "b"]
+    next(cambios)
+    cambios.close()
+
+    # Solo se repite la página que no llegó a guardarse
+    assert [item["id"] for _, item in sincronizar_cambios_drive("drive", "token", estado)] == ["c"]
+    assert pedidas == [DELTA, "pagina-2", "pagina-2"]
+
+    paginas["delta-1"] = (200, {"value": [], "@odata.deltaLink": "delta-2"})
+    assert list(sincronizar_cambios_drive("drive", "token", estado)) == []
+    assert pedidas[-1] == "delta-1"
+
+
+def test_resincronizacion_elimina_lo_que_ya_no_existe(graph):
+    paginas, _ = graph
+    paginas[DELTA] = (200, {"value": [_item("a"), _item("b")], "@odata.deltaLink": "delta-1"})
+    estado = abrir_estado_sincronizacion(":memory:")
+    assert [tipo for tipo, _ in sincronizar_cambios_drive("drive", "token", estado)] == [CREADO, CREADO]
+
+    paginas["delta-1"] = (410, {"location": "resync"})
+    paginas["resync"] = (200, {"value": [_item("a")], "@odata.deltaLink": "delta-2"})
+    cambios = [(tipo, item["id"]) for tipo, item in sincronizar_cambios_drive("drive", "token", estado)]
+    assert cambios == [(ELIMINADO, "b")]
+
+
+def test_resincronizaciones_limitadas(graph):
+    paginas, pedidas = graph
+    paginas[DELTA] = (410, {"location": DELTA})
+    estado = abrir_estado_sincronizacion(":memory:")
+
+    with pytest.raises(RuntimeError):
+        list(sincronizar_cambios_drive("drive", "token", estado, resincronizaciones_maximas=2))
+    assert len(pedidas) == 3
@@ -1,7 +1,12 @@
 import base64
+import time
+from email.utils import parsedate_to_datetime
 import requests
 from .autenticacion import obtener_headers_auth
 
+# Respuestas transitorias de Graph que conviene reintentar (throttling y errores de servidor)
+CODIGOS_REINTENTABLES = (429, 500, 502, 503, 504)
+
 def codificar_url_compartida(url_compartida):
     """
     Codifica una URL de SharePoint para usarla con la API de 'shares' de Microsoft Graph.
@@ -27,7 +32,7 @@ def resolver_url_a_drive_item(url_compartida, token_acceso):
 
     Args:
         url_compartida (str): La URL de SharePoint.
-        token_acceso (str): Token de acceso válido.
+        token_acceso (str | proveedor): Token de acceso válido, o proveedor con `obtener_token()`.
 
     Returns:
         dict: El objeto JSON de la respuesta de Graph (driveItem) o None si falla.
@@ -47,6 +52,67 @@ def resolver_url_a_drive_item(url_compartida, token_acceso):
         print(respuesta.text)
         return None
 
+def segundos_retry_after(valor, por_defecto):
+    """
+    Interpreta una cabecera Retry-After, que puede venir en segundos o como fecha HTTP.
+
+    Args:
+        valor (str): Valor de la cabecera (o None si no vino).
+        por_defecto (float): Espera a usar si falta o no es válida.
+
+    Returns:
+        float: Segundos a esperar.
+    """
+    if not valor:
+        return por_defecto
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return por_defecto
+
+def peticion_con_reintentos(metodo, url, token_acceso, intentos_maximos=5, **kwargs):
+    """
+    Hace una petición a Graph reintentando el throttling (429), los errores 5xx transitorios y
+    los fallos de conexión, respetando la cabecera Retry-After.
+
+    Args:
+        metodo (str): Método HTTP ('GET', 'POST'...).
+        url (str): URL completa.
+        token_acceso (str | proveedor): Token de acceso, o proveedor con `obtener_token()` que lo renueva.
+        intentos_maximos (int): Reintentos antes de abandonar.
+        **kwargs: Argumentos adicionales para `requests.request` (json, params...).
+
+    Returns:
+        requests.Response: La primera respuesta no reintentable (puede ser un error 4xx que
+        debe tratar quien llama).
+
+    Raises:
+        requests.exceptions.RetryError: Si se agotan los reintentos.
+    """
+    kwargs.setdefault("timeout", 60)
+    fallos = 0
+    while True:
+        try:
+            # Se piden las cabeceras en cada intento: con un proveedor, el token puede haberse renovado
+            respuesta = requests.request(metodo, url, headers=obtener_headers_auth(token_acceso), **kwargs)
+            if respuesta.status_code not in CODIGOS_REINTENTABLES:
+                return respuesta
+            error = f"HTTP {respuesta.status_code}"
+            espera = respuesta.headers.get("Retry-After")
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            error, espera = e, None
+
+        fallos += 1
+        if fallos > intentos_maximos:
+            raise requests.exceptions.RetryError(f"{metodo} {url} fallida tras {intentos_maximos} reintentos: {error}")
+        espera = segundos_retry_after(espera, min(60, 2 ** fallos))
+        print(f"Error en la petición a Graph ({error}). Reintentando en {espera} segundos...")
+        time.sleep(espera)
+
 if __name__ == "__main__":
     # Ejemplo de uso
     url_ejemplo = "https://tu-organizacion.sharepoint.com/:x:/s/sitio/EjemPl0..."